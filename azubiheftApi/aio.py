@@ -0,0 +1,408 @@
+# asyncio variant of azubiheftApi.Session, based on aiohttp
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import urllib.parse
+import logging
+import time
+
+from . import parsing
+from .azubiheftApi import Entry, Session, SubjectCatalog, TimeHelper, WriteResult
+from .errors import AuthError, NotLoggedInError
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Response(NamedTuple):
+    status_code: int
+    text: str
+    urls: List[str]
+
+
+class AsyncSession:
+    """Non-blocking counterpart of Session with the same methods as coroutines.
+
+    Every AsyncSession keeps its own cookies. To serve many accounts over one
+    connection pool, pass the same aiohttp.TCPConnector to all of them.
+    """
+
+    BASE_URL = Session.BASE_URL
+
+    def __init__(
+        self,
+        connector: Optional["aiohttp.BaseConnector"] = None,
+        auto_relogin: bool = False,
+        week_cache_ttl: float = 300.0,
+        max_workers: int = 4,
+        base_url: Optional[str] = None,
+    ):
+        """Initializes the async Azubiheft session.
+        - Parameters:
+            connector: Shared aiohttp connector, by default every session has its own.
+            auto_relogin: Log in again with the last credentials when the server
+                rejects the session, instead of raising NotLoggedInError.
+            week_cache_ttl: Seconds the parsed report overview is reused.
+            max_workers: Default number of concurrent requests for batch operations.
+            base_url: Address of the Azubiheft server, defaults to BASE_URL.
+        """
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncSession requires aiohttp, install it with 'pip install azubiheftApi[async]'."
+            )
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/")
+        self.connector = connector
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.auto_relogin = auto_relogin
+        self.max_workers = max_workers
+        self.week_cache_ttl = week_cache_ttl
+        self._logged_in = False
+        self._credentials: Optional[Tuple[str, str]] = None
+        # Incremented by every successful login, see _request
+        self._login_generation = 0
+        self._login_lock: Optional[asyncio.Lock] = None
+        # Requests in flight per client; a client replaced by a new login is
+        # retired and closed by the last of them, see _send
+        self._active_requests: Dict["aiohttp.ClientSession", int] = {}
+        self._retired_clients: Set["aiohttp.ClientSession"] = set()
+        self._weeks: Optional[Dict[Tuple[int, int], Dict[str, Optional[str]]]] = None
+        self._weeks_loaded_at = 0.0
+        self._subjects: Optional[SubjectCatalog] = None
+
+    async def __aenter__(self) -> "AsyncSession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the HTTP client without logging out."""
+        clients, self._retired_clients = list(self._retired_clients), set()
+        if self.session is not None:
+            clients.append(self.session)
+            self.session = None
+        for client in clients:
+            await client.close()
+        self._logged_in = False
+
+    def _new_client(self) -> "aiohttp.ClientSession":
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=self.connector is None,
+            # Also keep cookies of servers addressed by IP, e.g. a local test server
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        )
+
+    async def _send(
+        self, method: str, url: str, client: Optional["aiohttp.ClientSession"] = None, **kwargs
+    ) -> _Response:
+        client = client or self.session
+        self._active_requests[client] = self._active_requests.get(client, 0) + 1
+        try:
+            async with client.request(method, url, **kwargs) as response:
+                text = await response.text()
+                urls = [str(r.url) for r in response.history] + [str(response.url)]
+                return _Response(response.status, text, urls)
+        finally:
+            self._active_requests[client] -= 1
+            if not self._active_requests[client]:
+                del self._active_requests[client]
+                if client in self._retired_clients:
+                    self._retired_clients.discard(client)
+                    await client.close()
+
+    async def _retire(self, client: "aiohttp.ClientSession") -> None:
+        """Close a client replaced by a new login once no request uses it."""
+        if client in self._active_requests:
+            self._retired_clients.add(client)
+        else:
+            await client.close()
+
+    async def login(self, username: str, password: str) -> None:
+        """Log in the user with the provided username and password."""
+        if self._logged_in:
+            raise AuthError("Already logged in. Logout first.")
+
+        self._weeks = None
+        self._subjects = None
+        await self._login(username, password)
+        if self.auto_relogin:
+            self._credentials = (username, password)
+
+    async def _login(self, username: str, password: str) -> None:
+        """Run the login handshake on a fresh HTTP client.
+        The client replaces the current one only once the login succeeded.
+        The old one is closed as soon as the requests other tasks are still
+        sending with it are done.
+        """
+        self._logged_in = False
+        client = self._new_client()
+        try:
+            login_url = urllib.parse.urljoin(self.BASE_URL, "/Login.aspx")
+            login_page = await self._send("GET", login_url, client=client)
+            tokens = parsing.extract_form_tokens(login_page.text)
+
+            response = await self._send(
+                "POST",
+                login_url,
+                client=client,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                data=parsing.login_form(tokens, username, password),
+            )
+            if not parsing.has_logout_marker(response.text):
+                raise AuthError("Login failed.")
+        except BaseException:
+            await client.close()
+            raise
+
+        retired, self.session = self.session, client
+        self._logged_in = True
+        self._login_generation += 1
+        if retired is not None:
+            await self._retire(retired)
+
+    async def logout(self) -> None:
+        """Log out the current user."""
+        if not self.session:
+            raise NotLoggedInError("Not logged in. Login first.")
+        await self._send("GET", urllib.parse.urljoin(self.BASE_URL, "/Azubi/Abmelden.aspx"))
+        await self.close()
+        self._credentials = None
+        self._weeks = None
+        self._subjects = None
+
+    async def isLoggedIn(self, verify: bool = False) -> bool:
+        """Check if the user is currently logged in.
+        - Parameters:
+            verify: Ask the server instead of trusting the local login state.
+        """
+        if not self.session:
+            return False
+        if not verify:
+            return self._logged_in
+
+        response = await self._send(
+            "GET", urllib.parse.urljoin(self.BASE_URL, "/Azubi/Default.aspx")
+        )
+        self._logged_in = parsing.has_logout_marker(response.text)
+        return self._logged_in
+
+    def _require_login(self) -> None:
+        if not (self.session and self._logged_in):
+            raise NotLoggedInError("Not logged in. Login first.")
+
+    async def _request(self, method: str, url: str, **kwargs) -> _Response:
+        """Send a request and handle an expired login like Session._request.
+        When several tasks run into the expired session at once, only one of
+        them logs in again; the others repeat their request with its login.
+        """
+        if not self.session:
+            raise NotLoggedInError("Not logged in. Login first.")
+
+        generation = self._login_generation
+        response = await self._send(method, url, **kwargs)
+        if not parsing.is_login_page(response.urls, response.text):
+            return response
+
+        if self._login_lock is None:
+            self._login_lock = asyncio.Lock()
+        async with self._login_lock:
+            if generation == self._login_generation:
+                self._logged_in = False
+                if not (self.auto_relogin and self._credentials):
+                    raise NotLoggedInError("Session expired. Login again.")
+
+                logger.info("Session expired, logging in again.")
+                await self._login(*self._credentials)
+            elif not self._logged_in:
+                raise NotLoggedInError("Session expired. Login again.")
+        response = await self._send(method, url, **kwargs)
+        if parsing.is_login_page(response.urls, response.text):
+            self._logged_in = False
+            raise NotLoggedInError("Session expired and login was rejected.")
+        return response
+
+    async def getWeeks(self, refresh: bool = False) -> Dict[Tuple[int, int], Dict[str, Optional[str]]]:
+        """Get all report weeks of the overview, see Session.getWeeks."""
+        self._require_login()
+
+        if refresh or self._weeks_expired():
+            url = urllib.parse.urljoin(self.BASE_URL, "/Azubi/Ausbildungsnachweise.aspx")
+            response = await self._request("GET", url)
+            self._weeks = parsing.parse_weeks(response.text)
+            self._weeks_loaded_at = time.monotonic()
+        return dict(self._weeks)
+
+    def _weeks_expired(self) -> bool:
+        return (
+            self._weeks is None
+            or time.monotonic() - self._weeks_loaded_at > self.week_cache_ttl
+        )
+
+    async def getReportWeekId(self, date: datetime) -> str:
+        """Get the week ID for a given date."""
+        self._require_login()
+
+        year, calendar_week = date.isocalendar()[:2]
+        fetched = self._weeks_expired()
+        weeks = await self.getWeeks()
+        if (year, calendar_week) not in weeks and not fetched:
+            weeks = await self.getWeeks(refresh=True)
+
+        if (year, calendar_week) in weeks:
+            return weeks[(year, calendar_week)]["id"]
+        raise ValueError("No report found for the specified week.")
+
+    async def getSubjects(self, refresh: bool = False) -> List[Dict[str, str]]:
+        """Get the complete list of subjects, including both static and user-defined subjects."""
+        self._require_login()
+
+        if refresh or self._subjects is None:
+            response = await self._request(
+                "GET", urllib.parse.urljoin(self.BASE_URL, "/Azubi/SetupSchulfach.aspx")
+            )
+            self._subjects = SubjectCatalog(
+                parsing.STATIC_SUBJECTS + parsing.parse_subjects(response.text)
+            )
+        return [dict(subject) for subject in self._subjects.subjects]
+
+    async def get_art_id_from_text(self, subject_name: str) -> Optional[str]:
+        """Get the subject ID from its name, see SubjectCatalog.find_id."""
+        if self._subjects is None:
+            await self.getSubjects()
+        return self._subjects.find_id(subject_name)
+
+    async def getReport(
+        self, date: datetime, include_formatting: bool = False
+    ) -> List[Dict[str, str]]:
+        """Retrieve a report for a given date, optionally including HTML formatting."""
+        self._require_login()
+
+        url = f"{self.BASE_URL}/Azubi/Tagesbericht.aspx?Datum={TimeHelper.dateTimeToString(date)}"
+        response = await self._request("GET", url)
+        return parsing.parse_report(response.text, include_formatting)
+
+    def _entry_url(self, date: datetime, week_id: str) -> str:
+        return f"{self.BASE_URL}/Azubi/XMLHttpRequest.ashx?Datum={TimeHelper.dateTimeToString(date)}&BrNr={week_id}&BrSt=1&BrVorh=Yes&T={TimeHelper.getActualTimestamp()}"
+
+    async def writeReports(
+        self, entries: List[Entry], max_workers: Optional[int] = None
+    ) -> List[WriteResult]:
+        """Write a list of reports to the Azubiheft, see Session.writeReports."""
+        self._require_login()
+
+        results: List[Optional[WriteResult]] = [None] * len(entries)
+        week_ids = {}
+        missing_weeks = {}
+        days: Dict[str, List[Tuple[int, Entry]]] = {}
+        for index, entry in enumerate(entries):
+            week = tuple(entry.date.isocalendar()[:2])
+            if week not in week_ids and week not in missing_weeks:
+                try:
+                    week_ids[week] = await self.getReportWeekId(entry.date)
+                except ValueError as e:
+                    missing_weeks[week] = str(e)
+            if week in missing_weeks:
+                # Entries of weeks without a report fail on their own, the rest is written
+                results[index] = WriteResult(entry, None, 0.0, missing_weeks[week])
+                continue
+            days.setdefault(TimeHelper.dateTimeToString(entry.date), []).append(
+                (index, entry)
+            )
+
+        headers = parsing.ajax_headers(self.BASE_URL)
+        semaphore = asyncio.Semaphore(max_workers or self.max_workers)
+
+        async def write_day(day_entries: List[Tuple[int, Entry]]) -> None:
+            async with semaphore:
+                for index, entry in day_entries:
+                    week = tuple(entry.date.isocalendar()[:2])
+                    results[index] = await self._write_entry(entry, week_ids[week], headers)
+
+        await asyncio.gather(*(write_day(day) for day in days.values()))
+        return results
+
+    async def _write_entry(
+        self, entry: Entry, week_id: str, headers: Dict[str, str]
+    ) -> WriteResult:
+        date_str = TimeHelper.dateTimeToString(entry.date)
+        formData = parsing.entry_form(entry.message, entry.time_spent, entry.type)
+
+        started = time.perf_counter()
+        try:
+            response = await self._request(
+                "POST", self._entry_url(entry.date, week_id), headers=headers, data=formData
+            )
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to add entry for date {date_str}: {e}")
+            return WriteResult(entry, None, time.perf_counter() - started, str(e))
+
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to add entry for date {date_str}. Response code: {response.status_code}"
+            )
+        return WriteResult(entry, response.status_code, time.perf_counter() - started)
+
+    async def writeReport(
+        self, date: datetime, message: str, time_spent: str, entry_type: int
+    ) -> None:
+        """Write a single report to the Azubiheft."""
+        if time_spent.strip() != "00:00":
+            await self.writeReports([Entry(date, message, time_spent, entry_type)])
+
+    async def deleteReport(
+        self, date: datetime, entry_number: Optional[int] = None
+    ) -> List[WriteResult]:
+        """Delete one or all reports for a given date, see Session.deleteReport."""
+        self._require_login()
+
+        report_entries = await self.getReport(date)
+        if not report_entries:
+            logger.info("No report entries found for this date.")
+            return []
+
+        week_number = await self.getReportWeekId(date)
+        headers = parsing.ajax_headers(self.BASE_URL)
+
+        entries_to_delete = (
+            report_entries
+            if entry_number is None or entry_number == "all"
+            else [report_entries[entry_number - 1]]
+        )
+
+        return [
+            await self._delete_entry(date, entry, week_number, headers)
+            for entry in entries_to_delete
+        ]
+
+    async def _delete_entry(
+        self, date: datetime, entry: Dict[str, str], week_id: str, headers: Dict[str, str]
+    ) -> WriteResult:
+        formData = parsing.delete_entry_form(
+            entry, await self.get_art_id_from_text(entry["type"])
+        )
+
+        started = time.perf_counter()
+        try:
+            response = await self._request(
+                "POST", self._entry_url(date, week_id), headers=headers, data=formData
+            )
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to delete entry: {entry['text']}: {e}")
+            return WriteResult(
+                entry, None, time.perf_counter() - started, str(e), action="delete", date=date
+            )
+
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to delete entry: {entry['text']}. Response code: {response.status_code}"
+            )
+        return WriteResult(
+            entry, response.status_code, time.perf_counter() - started, action="delete", date=date
+        )
@@ -1,306 +1,1052 @@
 #!/usr/bin/python3
 # azubiheft.com web-api
 
-import requests
-from bs4 import BeautifulSoup, NavigableString
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date as Date, datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Iterator, List, NamedTuple, Optional, Dict, Tuple, Union
+import copy
+import itertools
 import urllib.parse
-import re
 import logging
+import threading
 import time
 
-from .errors import AuthError, ValueTooLargeError, NotLoggedInError
-
-# Configure the logging
-logging.basicConfig(level=logging.INFO)
+from . import parsing
+from .errors import (
+    AuthError,
+    HTTPStatusError,
+    NotLoggedInError,
+    TransportError,
+    ValueTooLargeError,
+)
+from .cache import PageCache
+from .instrumentation import Instrumentation, instrumented
+
+# requests, bs4 and sqlite3 are imported on first use, so importing the
+# package stays cheap for short-lived processes
+if TYPE_CHECKING:
+    import requests
+    from .journal import WriteJournal
+    from .transport import Transport
+
+# The library only logs; configuring handlers is left to the application
 logger = logging.getLogger(__name__)
 
 class Entry:
+    __slots__ = ("date", "message", "time_spent", "type")
+
     def __init__(self, date: datetime, message: str, time_spent: str, entry_type: int):
         self.date = date
         self.message = message
         self.time_spent = time_spent
         self.type = entry_type
 
-class Session:
-    BASE_URL = "https://www.azubiheft.de"
+class ReportEntry(NamedTuple):
+    """One entry of a day report, see Session.getReport(records=True)."""
+
+    date: Date
+    seq: Optional[int]
+    art_id: Optional[int]
+    type: str
+    duration: timedelta
+    text: str
+
+    def to_dict(self) -> Dict[str, str]:
+        """The entry as the dict getReport returns by default."""
+        return {
+            "seq": None if self.seq is None else str(self.seq),
+            "type": self.type,
+            "duration": TimeHelper.durationToString(self.duration),
+            "text": self.text,
+        }
+
+    @classmethod
+    def from_dict(
+        cls, entry: Dict[str, str], date: datetime, art_id: Optional[str] = None
+    ) -> "ReportEntry":
+        """Build the record from a dict as returned by getReport.
+        - Parameters:
+            entry: The entry dict.
+            date: Day of the entry.
+            art_id: Subject id of the entry type, if known.
+        """
+        seq = entry.get("seq")
+        return cls(
+            TimeHelper.toDate(date),
+            int(seq) if seq else None,
+            int(art_id) if art_id else None,
+            entry["type"],
+            TimeHelper.parseDuration(entry["duration"]),
+            entry["text"],
+        )
+
+class Report(NamedTuple):
+    """The entries of one day, see Session.getReport(records=True)."""
+
+    date: Date
+    entries: Tuple[ReportEntry, ...]
+
+    @property
+    def duration(self) -> timedelta:
+        return sum((entry.duration for entry in self.entries), timedelta())
+
+    def to_dict(self) -> List[Dict[str, str]]:
+        """The entries as the list of dicts getReport returns by default."""
+        return [entry.to_dict() for entry in self.entries]
+
+    @classmethod
+    def from_dict(
+        cls,
+        entries: List[Dict[str, str]],
+        date: datetime,
+        art_id: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> "Report":
+        """Build the record from the list of dicts returned by getReport.
+        - Parameters:
+            entries: The entry dicts.
+            date: Day of the report.
+            art_id: Looks up the subject id of an entry type, e.g.
+                Session.get_art_id_from_text.
+        """
+        date = TimeHelper.toDate(date)
+        return cls(
+            date,
+            tuple(
+                ReportEntry.from_dict(entry, date, art_id(entry["type"]) if art_id else None)
+                for entry in entries
+            ),
+        )
+
+class WriteResult:
+    """Outcome of sending a single entry to the Azubiheft.
+    entry is the added Entry, or the entry dict (as returned by getReport)
+    for deletions.
+    """
+
+    def __init__(
+        self,
+        entry,
+        status_code: Optional[int],
+        latency: float,
+        error: Optional[str] = None,
+        action: str = "add",
+        date: Optional[datetime] = None,
+    ):
+        self.entry = entry
+        self.date = date if date is not None else entry.date
+        self.status_code = status_code
+        self.latency = latency
+        self.error = error
+        self.action = action
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status_code == 200
+
+    def __repr__(self) -> str:
+        status = "ok" if self.ok else self.error or self.status_code
+        return f"<WriteResult {self.action} {TimeHelper.dateTimeToString(self.date)} {status} {self.latency:.3f}s>"
+
+class UpsertPlan:
+    """The requests needed to make days match the wanted entries, see Session.upsertReports."""
 
     def __init__(self):
-        """Initializes the Azubiheft session."""
-        self.session: Optional[requests.sessions.Session] = None
+        self.inserts: List[Entry] = []
+        self.deletes: List[Tuple[Date, Dict[str, str]]] = []
+        self.unchanged: List[Tuple[Date, Dict[str, str]]] = []
+        self.results: List[WriteResult] = []
+        self.dry_run = True
+
+    @property
+    def requests(self) -> int:
+        """Number of write requests the plan needs."""
+        return len(self.inserts) + len(self.deletes)
+
+    def __repr__(self) -> str:
+        return f"<UpsertPlan inserts={len(self.inserts)} deletes={len(self.deletes)} unchanged={len(self.unchanged)} dry_run={self.dry_run}>"
+
+class SubjectCatalog:
+    """The subjects of an account, indexed by id and by name."""
+
+    def __init__(self, subjects: List[Dict[str, str]]):
+        self.subjects = subjects
+        self.by_id: Dict[str, Dict[str, str]] = {}
+        self.by_name: Dict[str, Dict[str, str]] = {}
+        self.by_normalized_name: Dict[str, Dict[str, str]] = {}
+        for subject in subjects:
+            self.by_id[subject["id"]] = subject
+            self.by_name.setdefault(subject["name"], subject)
+            self.by_normalized_name.setdefault(self.normalize(subject["name"]), subject)
+
+    @staticmethod
+    def normalize(name: Optional[str]) -> str:
+        return " ".join((name or "").split()).casefold()
+
+    def find_id(self, subject_name: str) -> Optional[str]:
+        """Get the subject ID from its name.
+        Exact and case/whitespace-insensitive matches are looked up directly,
+        a substring match is only tried if neither exists.
+        """
+        subject = self.by_name.get(subject_name)
+        if subject is None:
+            subject = self.by_normalized_name.get(self.normalize(subject_name))
+        if subject is not None:
+            return subject["id"]
+
+        for subject in self.subjects:
+            if subject_name in subject['name']:
+                return subject['id']
+        return None
 
+    def without(self, subject_id: str) -> "SubjectCatalog":
+        return SubjectCatalog([s for s in self.subjects if s["id"] != subject_id])
+
+class SingleFlight:
+    """Lets concurrent calls for the same key share a single execution.
+    The first caller runs the function, callers arriving while it runs wait
+    for it and get its result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class Session:
+    BASE_URL = "https://www.azubiheft.de"
+
+    def __init__(
+        self,
+        auto_relogin: bool = False,
+        week_cache_ttl: float = 300.0,
+        max_workers: int = 4,
+        transport: Optional["Transport"] = None,
+        limiter=None,
+        base_url: Optional[str] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        cache: Optional[PageCache] = None,
+        parser_pool: Optional[parsing.ParserPool] = None,
+    ):
+        """Initializes the Azubiheft session.
+        - Parameters:
+            auto_relogin: Log in again with the last credentials when the server
+                rejects the session, instead of raising NotLoggedInError.
+            week_cache_ttl: Seconds the parsed report overview is reused.
+            max_workers: Default number of concurrent requests for batch operations.
+            transport: Timeouts, retries and connection pool of the requests,
+                may be shared between sessions to share their connections.
+            limiter: Context manager held during every request, e.g. a
+                semaphore shared between sessions to cap requests in flight,
+                or a RequestScheduler to limit the request rate and send
+                interactive requests before bulk operations.
+            base_url: Address of the Azubiheft server, defaults to BASE_URL.
+            instrumentation: Collects request and parse statistics, see stats().
+                May be shared between sessions.
+            cache: Cache for the overview, subject and day report pages,
+                invalidated by the writes of this session. By default pages
+                are always fetched.
+            parser_pool: Worker processes parsing the fetched pages, so
+                concurrent reads are not limited to one core. May be shared
+                between sessions. By default pages are parsed in the thread
+                that fetched them.
+        """
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/")
+        self.instrumentation = instrumentation or Instrumentation()
+        self.cache = cache
+        self.parser_pool = parser_pool
+        self.session: Optional["requests.sessions.Session"] = None
+        self.auto_relogin = auto_relogin
+        self.max_workers = max_workers
+        if transport is None:
+            from .transport import Transport
+
+            transport = Transport()
+        self.transport = transport
+        self.limiter = limiter
+        self._logged_in = False
+        self._credentials: Optional[Tuple[str, str]] = None
+        self.username: Optional[str] = None
+        self.logged_in_at: Optional[float] = None
+        self.week_cache_ttl = week_cache_ttl
+        self._weeks: Optional[Dict[Tuple[int, int], Dict[str, Optional[str]]]] = None
+        self._weeks_loaded_at = 0.0
+        self._subjects: Optional[SubjectCatalog] = None
+        # Guards login state transitions. The generations count logins and
+        # account changes, so a thread can tell whether the session was
+        # renewed or the cached pages were reset while it waited.
+        self._state_lock = threading.RLock()
+        self._login_generation = 0
+        self._account_generation = 0
+        self._weeks_generation = 0
+        self._subjects_lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    @instrumented
     def login(self, username: str, password: str) -> None:
         """Log in the user with the provided username and password."""
-        if self.isLoggedIn():
-            raise AuthError("Already logged in. Logout first.")
-
-        self.session = requests.session()
-        login_page_html = self.session.get(
-            urllib.parse.urljoin(self.BASE_URL, "/Login.aspx")
+        with self._state_lock:
+            if self.isLoggedIn():
+                raise AuthError("Already logged in. Logout first.")
+
+            self._reset_caches()
+            self._login(username, password)
+            self.username = username
+            if self.auto_relogin:
+                self._credentials = (username, password)
+
+    def _reset_caches(self) -> None:
+        """Forget everything cached for the current account."""
+        self._account_generation += 1
+        self._weeks = None
+        self._subjects = None
+        if self.cache is not None and self.username is not None:
+            self.cache.invalidate(self.username)
+
+    def _login(self, username: str, password: str) -> None:
+        """Run the login handshake on a fresh HTTP session.
+        The session replaces the current one only once the login succeeded,
+        requests of other threads keep using the old one until then.
+        """
+        self._logged_in = False
+        http_session = self._new_http_session()
+        login_page_html = self._send(
+            "GET", urllib.parse.urljoin(self.BASE_URL, "/Login.aspx"), http_session=http_session
         )
-        soup = BeautifulSoup(login_page_html.text, "html.parser")
-
-        tokens = self._extract_form_tokens(soup)
+        tokens = self._parse("login", parsing.extract_form_tokens, login_page_html.text)
 
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        formData = {
-            "__VIEWSTATE": tokens["__VIEWSTATE"],
-            "__VIEWSTATEGENERATOR": tokens["__VIEWSTATEGENERATOR"],
-            "__EVENTVALIDATION": tokens["__EVENTVALIDATION"],
-            "ctl00$ContentPlaceHolder1$txt_Benutzername": username,
-            "ctl00$ContentPlaceHolder1$txt_Passwort": password,
-            "ctl00$ContentPlaceHolder1$chk_Persistent": "on",
-            "ctl00$ContentPlaceHolder1$cmd_Login": "Anmelden",
-            "ctl00$ContentPlaceHolder1$HiddenField_isMobile": "false",
-        }
+        formData = parsing.login_form(tokens, username, password)
 
-        self.session.post(
+        # A successful login redirects to the start page, which carries the
+        # logout link; no extra request is needed to confirm it.
+        response = self._send(
+            "POST",
             urllib.parse.urljoin(self.BASE_URL, "/Login.aspx"),
             headers=headers,
             data=formData,
+            http_session=http_session,
         )
 
-        if not self.isLoggedIn():
+        if not self._parse("start", parsing.has_logout_marker, response.text):
             raise AuthError("Login failed.")
+        with self._state_lock:
+            self.session = http_session
+            self._logged_in = True
+            self._login_generation += 1
+            self.logged_in_at = time.time()
+
+    def _new_http_session(self) -> "requests.sessions.Session":
+        import requests
+
+        session = requests.session()
+        self.transport.mount(session)
+        return session
+
+    @instrumented
+    def save(self, target, key: str = "default") -> None:
+        """Save the login cookies so another process can continue without logging in.
+        The password is never saved.
+        - Parameters:
+            target: Path of a JSON file or a store such as SQLiteSessionStore.
+            key: Name of the saved session within the store.
+        """
+        if not self.isLoggedIn():
+            raise NotLoggedInError("Not logged in. Login first.")
+
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+                "http_only": cookie.has_nonstandard_attr("HttpOnly"),
+            }
+            for cookie in self.session.cookies
+        ]
+        self._store(target).save(
+            key,
+            {
+                "base_url": self.BASE_URL,
+                "username": self.username,
+                "logged_in_at": self.logged_in_at,
+                "cookies": cookies,
+            },
+        )
 
+    @instrumented
+    def load(self, source, key: str = "default", password: Optional[str] = None) -> bool:
+        """Restore a session saved with save().
+        The restored session is trusted until the server rejects it. With
+        auto_relogin and a password it then logs in again, otherwise requests
+        raise NotLoggedInError.
+        - Parameters:
+            source: Path of a JSON file or a store such as SQLiteSessionStore.
+            key: Name of the saved session within the store.
+            password: Password of the saved user, for auto_relogin.
+        - Returns:
+            True if a session with unexpired cookies was restored.
+        """
+        state = self._store(source).load(key)
+        if not state or state.get("base_url", self.BASE_URL) != self.BASE_URL:
+            return False
+
+        now = time.time()
+        cookies = [
+            cookie
+            for cookie in state["cookies"]
+            if cookie["expires"] is None or cookie["expires"] > now
+        ]
+        if not cookies:
+            return False
+
+        http_session = self._new_http_session()
+        from requests.cookies import create_cookie
+
+        for cookie in cookies:
+            http_session.cookies.set_cookie(
+                create_cookie(
+                    cookie["name"],
+                    cookie["value"],
+                    domain=cookie["domain"],
+                    path=cookie["path"],
+                    expires=cookie["expires"],
+                    secure=cookie["secure"],
+                    rest={"HttpOnly": None} if cookie["http_only"] else {},
+                )
+            )
+        with self._state_lock:
+            self._reset_caches()
+            self.session = http_session
+            self.username = state["username"]
+            self.logged_in_at = state["logged_in_at"]
+            self._logged_in = True
+            self._login_generation += 1
+            # Never log in again as the account that was used before
+            self._credentials = None
+            if self.auto_relogin and self.username and password is not None:
+                self._credentials = (self.username, password)
+        return True
+
+    @staticmethod
+    def _store(target):
+        if hasattr(target, "load") and hasattr(target, "save"):
+            return target
+        from .store import FileSessionStore
+
+        return FileSessionStore(target)
+
+    @instrumented
     def logout(self) -> None:
         """Log out the current user."""
-        if not self.session:
-            raise NotLoggedInError("Not logged in. Login first.")
-        self.session.get(urllib.parse.urljoin(self.BASE_URL, "/Azubi/Abmelden.aspx"))
-        self.session = None
-
-    def isLoggedIn(self) -> bool:
-        """Check if the user is currently logged in."""
+        with self._state_lock:
+            if not self.session:
+                raise NotLoggedInError("Not logged in. Login first.")
+            self._send("GET", urllib.parse.urljoin(self.BASE_URL, "/Azubi/Abmelden.aspx"))
+            self._reset_caches()
+            self.session = None
+            self._logged_in = False
+            self._login_generation += 1
+            self._credentials = None
+            self.username = None
+            self.logged_in_at = None
+
+    @instrumented
+    def isLoggedIn(self, verify: bool = False) -> bool:
+        """Check if the user is currently logged in.
+        - Parameters:
+            verify: Ask the server instead of trusting the local login state.
+        """
         if not self.session:
             return False
+        if not verify:
+            return self._logged_in
 
-        index_html = self.session.get(
-            urllib.parse.urljoin(self.BASE_URL, "/Azubi/Default.aspx")
+        index_html = self._send(
+            "GET", urllib.parse.urljoin(self.BASE_URL, "/Azubi/Default.aspx")
         ).text
-        soup = BeautifulSoup(index_html, "html.parser")
-        return bool(soup.find(id="Abmelden"))
+        self._logged_in = self._parse("start", parsing.has_logout_marker, index_html)
+        return self._logged_in
 
-    def _fetch_setup_page_tokens(self) -> Dict[str, str]:
-        """Fetch the setup page and extract necessary tokens."""
-        setup_page = self.session.get(
-            urllib.parse.urljoin(self.BASE_URL, "/Azubi/SetupSchulfach.aspx")
-        )
-        soup = BeautifulSoup(setup_page.text, "html.parser")
-        return self._extract_form_tokens(soup)
-
-    def _extract_form_tokens(self, soup: BeautifulSoup) -> Dict[str, str]:
-        """Extract __VIEWSTATE, __VIEWSTATEGENERATOR, and __EVENTVALIDATION tokens from BeautifulSoup object."""
-        viewstate = soup.find(id="__VIEWSTATE")
-        viewstategenerator = soup.find(id="__VIEWSTATEGENERATOR")
-        eventvalidation = soup.find(id="__EVENTVALIDATION")
-        return {
-            "__VIEWSTATE": viewstate["value"] if viewstate else "",
-            "__VIEWSTATEGENERATOR": (
-                viewstategenerator["value"] if viewstategenerator else ""
-            ),
-            "__EVENTVALIDATION": eventvalidation["value"] if eventvalidation else "",
-        }
+    @staticmethod
+    def _is_login_page(response: "requests.Response") -> bool:
+        """Check whether the server answered with the login page, i.e. the session expired."""
+        urls = [str(r.url) for r in getattr(response, "history", None) or []]
+        urls.append(str(response.url))
+        return parsing.is_login_page(urls, response.text)
 
-    def _prepare_subjects_payload(
+    def _send(
         self,
-        subjects: List[Dict[str, str]],
-        new_subject: Optional[str] = None,
-        delete_subject_id: Optional[str] = None,
-    ) -> Dict[str, str]:
-        """Prepare payload for subject manipulation."""
-        payload = {}
-        for subject in subjects:
-            if delete_subject_id and subject["id"] == delete_subject_id:
-                continue
-            payload[f'ctl00$ContentPlaceHolder1$txt{subject["id"]}'] = subject["name"]
+        method: str,
+        url: str,
+        http_session: Optional["requests.sessions.Session"] = None,
+        **kwargs,
+    ) -> "requests.Response":
+        """Send a request through the transport, holding the limiter during each attempt.
+        - Parameters:
+            http_session: Session to send with instead of the current one.
+        """
+        http_session = http_session or self.session
+        if http_session is None:
+            raise NotLoggedInError("Not logged in. Login first.")
+        http_send = http_session.get if method == "GET" else http_session.post
+
+        def send(url, **kwargs):
+            if self.limiter is None:
+                return self._send_attempt(http_send, method, url, **kwargs)
+            with self._limiter_slot():
+                return self._send_attempt(http_send, method, url, **kwargs)
+
+        return self.transport.send(send, method, url, **kwargs)
+
+    def _limiter_slot(self):
+        """The limiter, or with a RequestScheduler a slot for this account and operation."""
+        slot = getattr(self.limiter, "slot", None)
+        if slot is None:
+            return self.limiter
+        return slot(self.username, self.instrumentation.current())
+
+    def _send_attempt(self, http_send, method: str, url: str, **kwargs) -> "requests.Response":
+        """Send a single request and record it."""
+        started = time.perf_counter()
+        try:
+            response = http_send(url, **kwargs)
+        except Exception as e:
+            self.instrumentation.record_request(
+                method, url, None, 0, time.perf_counter() - started, type(e).__name__
+            )
+            raise
+        latency = time.perf_counter() - started
+        # Redirects followed on the way are requests of their own
+        for hop in getattr(response, "history", None) or []:
+            hop_latency = hop.elapsed.total_seconds()
+            latency -= hop_latency
+            self.instrumentation.record_request(
+                hop.request.method, hop.url, hop.status_code, len(hop.content), hop_latency
+            )
+            method, url = response.request.method, response.url
+        self.instrumentation.record_request(
+            method, url, response.status_code, len(response.content), max(latency, 0.0)
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{method} {url}: {response.status_code} in {latency * 1000:.0f} ms")
+        return response
+
+    def _parse(self, page: str, parse, *args):
+        """Call a parsing function and record how long it took."""
+        started = time.perf_counter()
+        result = parse(*args)
+        self.instrumentation.record_parse(page, time.perf_counter() - started)
+        return result
+
+    def _parse_response(self, page: str, parse, response: "requests.Response", *args):
+        """Parse a fetched page, on the parser pool if the session has one."""
+        if self.parser_pool is None:
+            return self._parse(page, parse, response.text, *args)
+        return self._parse(
+            page, self.parser_pool.parse, parse, response.content, response.encoding, *args
+        )
 
-        if new_subject:
-            payload["txtNewSubject"] = new_subject
+    def _read_page(self, page: str, ident: str, url: str, parse, *args, refresh: bool = False):
+        """Fetch and parse a page, through the page cache if the session has one.
+        - Parameters:
+            page: Page type, "overview", "setup" or "report".
+            ident: Tells pages of the same type apart, e.g. the day.
+            url: Address of the page.
+            parse: Parsing function, called with the page and args.
+            refresh: Ask the server even if the cached page is still fresh.
+        """
+        if self.cache is None:
+            return self._parse_response(page, parse, self._get(url), *args)
+
+        key = (self.username, page, ident, args)
+        cached = self.cache.get(key)
+        if cached is not None and cached.fresh and not refresh:
+            return copy.deepcopy(cached.value)
+
+        # A write invalidating pages while this one is fetched keeps it out of the cache
+        generation = self.cache.generation
+        headers = cached.conditional_headers() if cached is not None else {}
+        response = self._get(url, headers=headers) if headers else self._get(url)
+        if cached is not None and response.status_code == 304:
+            self.cache.revalidated(key, cached, generation)
+            return copy.deepcopy(cached.value)
+
+        value = self._parse_response(page, parse, response, *args)
+        self.cache.put(
+            key,
+            value,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            generation,
+        )
+        return copy.deepcopy(value)
 
-        return payload
+    def _invalidate_pages(self, page: str, ident: Optional[str] = None) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(self.username, page, ident)
 
-    def add_subject(self, subject_name: str) -> None:
-        """Adds a new subject to the list of subjects.
-        - Parameters:
-            subject_name: Name of the new subject.
+    def stats(self) -> Dict:
+        """Snapshot of the requests and parses of this session, see Instrumentation.stats."""
+        return self.instrumentation.stats()
+
+    def _request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """Send a request with the logged in session and handle an expired login.
+
+        If the server redirects to the login page, the session is marked as
+        logged out. With auto_relogin the request is repeated once after a new
+        login, otherwise NotLoggedInError is raised. When several threads run
+        into the expired session at once, only one of them logs in again.
         """
-        tokens = self._fetch_setup_page_tokens()
-        current_subjects = self.getSubjects()
+        if not self.session:
+            raise NotLoggedInError("Not logged in. Login first.")
+
+        generation = self._login_generation
+        response = self._send(method, url, **kwargs)
+        if not self._is_login_page(response):
+            return response
+
+        with self._state_lock:
+            if generation == self._login_generation:
+                self._logged_in = False
+                if not (self.auto_relogin and self._credentials):
+                    raise NotLoggedInError("Session expired. Login again.")
+
+                logger.info("Session expired, logging in again.")
+                with self.instrumentation.operation("relogin"):
+                    self._login(*self._credentials)
+            elif not self._logged_in:
+                raise NotLoggedInError("Session expired. Login again.")
+        response = self._send(method, url, **kwargs)
+        if self._is_login_page(response):
+            self._logged_in = False
+            raise NotLoggedInError("Session expired and login was rejected.")
+        return response
+
+    def _get(self, url: str, **kwargs) -> "requests.Response":
+        response = self._request("GET", url, **kwargs)
+        if not response.ok:
+            raise HTTPStatusError(
+                f"GET {url} failed with status {response.status_code}", response.status_code
+            )
+        return response
 
-        # Generate a unique key for the new subject
-        new_subject_key = f"txt{int(time.time())}"
+    def _post(self, url: str, **kwargs) -> "requests.Response":
+        return self._request("POST", url, **kwargs)
 
+    def _prepare_subjects_payload(
+        self,
+        tokens: Dict[str, str],
+        subjects: List[Dict[str, str]],
+        add: List[str],
+        delete_ids: List[str],
+    ) -> Dict[str, str]:
+        """Form data of the subject setup page: the kept subjects, new ones and deletions."""
         payload = {
             "__VIEWSTATE": tokens["__VIEWSTATE"],
             "__VIEWSTATEGENERATOR": tokens["__VIEWSTATEGENERATOR"],
             "__EVENTVALIDATION": tokens["__EVENTVALIDATION"],
-            new_subject_key: subject_name,  # Add the new subject
-            **{
-                f'ctl00$ContentPlaceHolder1$txt{subj["id"]}': subj["name"]
-                for subj in current_subjects
-            },
-            "ctl00$ContentPlaceHolder1$cmd_Save": "Speichern",  # Include the save command
         }
+        for subject in subjects:
+            if subject["id"] not in delete_ids:
+                payload[f'ctl00$ContentPlaceHolder1$txt{subject["id"]}'] = subject["name"]
 
-        response = self.session.post(
-            "https://www.azubiheft.de/Azubi/SetupSchulfach.aspx", data=payload
-        )
+        # New subjects only need unique field names, the server assigns the ids
+        timestamp = int(time.time())
+        for index, name in enumerate(add):
+            payload[f"txt{timestamp}{index:02d}"] = name
 
-        if response.status_code != 200:
-            print("Failed to add subject. Response code:", response.status_code)
-        else:
-            print("Subject added successfully.")
+        if delete_ids:
+            payload["ctl00$ContentPlaceHolder1$HiddenLöschIDs"] = "," + ",".join(delete_ids)
+        payload["ctl00$ContentPlaceHolder1$cmd_Save"] = "Speichern"
+        return payload
 
-    def delete_subject(self, subject_id: str) -> None:
-        """Delete a subject from the list of subjects."""
+    @instrumented
+    def sync_subjects(
+        self,
+        add: Optional[List[str]] = None,
+        delete: Optional[List[str]] = None,
+        rename: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Add, delete and rename user-defined subjects with a single save.
+        The setup page is fetched once for its tokens and the current
+        subjects, then all changes are sent in one request. Subjects to add
+        that already exist are skipped; without changes nothing is sent.
+        Deleting or renaming a built-in or unknown subject raises ValueError.
+        - Parameters:
+            add: Names of new subjects.
+            delete: Ids or names of subjects to delete.
+            rename: New names keyed by subject id or current name.
+        """
         if not self.isLoggedIn():
             raise NotLoggedInError("Not logged in. Login first.")
 
-        tokens = self._fetch_setup_page_tokens()
-        current_subjects = self.getSubjects()
+        # Concurrent saves would start from the same page and undo each other
+        with self._subjects_lock:
+            self._sync_subjects(add, delete, rename)
 
-        payload = {
-            "__VIEWSTATE": tokens["__VIEWSTATE"],
-            "__VIEWSTATEGENERATOR": tokens["__VIEWSTATEGENERATOR"],
-            "__EVENTVALIDATION": tokens["__EVENTVALIDATION"],
-            "ctl00$ContentPlaceHolder1$HiddenLöschIDs": "," + subject_id,
-            **{
-                f'ctl00$ContentPlaceHolder1$txt{subj["id"]}': subj["name"]
-                for subj in current_subjects
-                if subj["id"] != subject_id
-            },
-            "ctl00$ContentPlaceHolder1$cmd_Save": "Speichern",
+    def _sync_subjects(
+        self,
+        add: Optional[List[str]],
+        delete: Optional[List[str]],
+        rename: Optional[Dict[str, str]],
+    ) -> None:
+        url = urllib.parse.urljoin(self.BASE_URL, "/Azubi/SetupSchulfach.aspx")
+        setup_html = self._get(url).text
+        tokens = self._parse("setup", parsing.extract_form_tokens, setup_html)
+        subjects = self._parse("setup", parsing.parse_subjects, setup_html)
+        catalog = SubjectCatalog(subjects)
+
+        def resolve(key: str) -> Dict[str, str]:
+            # No substring matching here, a typo must not change another subject
+            subject = (
+                catalog.by_id.get(key)
+                or catalog.by_name.get(key)
+                or catalog.by_normalized_name.get(catalog.normalize(key))
+            )
+            if subject is not None:
+                return subject
+            if key in static_keys:
+                raise ValueError(f"Built-in subject {key!r} cannot be changed.")
+            raise ValueError(f"Unknown user-defined subject {key!r}.")
+
+        static_keys = {
+            value for subject in parsing.STATIC_SUBJECTS for value in subject.values()
         }
+        delete_ids = [resolve(key)["id"] for key in delete or []]
+        renamed = {
+            subject["id"]: name
+            for subject, name in ((resolve(key), name) for key, name in (rename or {}).items())
+            if subject["name"] != name
+        }
+        existing = {catalog.normalize(subject["name"]) for subject in subjects}
+        new_names = []
+        for name in add or []:
+            if catalog.normalize(name) not in existing:
+                existing.add(catalog.normalize(name))
+                new_names.append(name)
+
+        kept = [
+            {"id": subject["id"], "name": renamed.get(subject["id"], subject["name"])}
+            for subject in subjects
+        ]
+        if not (delete_ids or new_names or renamed):
+            self._subjects = SubjectCatalog(parsing.STATIC_SUBJECTS + subjects)
+            return
 
-        response = self.session.post(
-            urllib.parse.urljoin(self.BASE_URL, "/Azubi/SetupSchulfach.aspx"),
-            data=payload,
-        )
-
+        self._invalidate_pages("setup")
+        try:
+            response = self._post(
+                url, data=self._prepare_subjects_payload(tokens, kept, new_names, delete_ids)
+            )
+        finally:
+            # Pages read while the save was in flight may predate it
+            self._invalidate_pages("setup")
         if response.status_code != 200:
-            logger.error(
-                f"Failed to delete subject. Response code: {response.status_code}"
+            raise HTTPStatusError(
+                f"Failed to save subjects. Response code: {response.status_code}",
+                response.status_code,
+            )
+
+        if "divSchulfach" in response.text:
+            # The saved page lists the subjects with the ids of the new ones
+            self._subjects = SubjectCatalog(
+                parsing.STATIC_SUBJECTS
+                + self._parse("setup", parsing.parse_subjects, response.text)
             )
+        elif new_names:
+            self._subjects = None
         else:
-            logger.info("Subject deleted successfully.")
+            self._subjects = SubjectCatalog(
+                parsing.STATIC_SUBJECTS
+                + [subject for subject in kept if subject["id"] not in delete_ids]
+            )
+        logger.info(
+            f"Subjects saved: {len(new_names)} added, {len(delete_ids)} deleted, {len(renamed)} renamed."
+        )
+
+    @instrumented
+    def add_subject(self, subject_name: str) -> None:
+        """Adds a new subject to the list of subjects.
+        - Parameters:
+            subject_name: Name of the new subject.
+        """
+        self.sync_subjects(add=[subject_name])
+
+    @instrumented
+    def delete_subject(self, subject_id: str) -> None:
+        """Delete a subject from the list of subjects."""
+        self.sync_subjects(delete=[subject_id])
+
+    @instrumented
+    def getWeeks(self, refresh: bool = False) -> Dict[Tuple[int, int], Dict[str, Optional[str]]]:
+        """Get all report weeks of the overview, keyed by (year, calendar week).
+        Each value holds the week "id" (BrNr) and the "status" shown on the tile.
+        The overview is fetched once and cached for week_cache_ttl seconds,
+        or until an entry is written or deleted through the session.
+        - Parameters:
+            refresh: Fetch the overview again even if the cache is still valid.
+        """
+        if not self.isLoggedIn():
+            raise NotLoggedInError("Not logged in. Login first.")
+
+        with self._state_lock:
+            weeks, loaded_at = self._weeks, self._weeks_loaded_at
+        if refresh or self._weeks_expired(weeks, loaded_at):
+            # Threads missing the cache at the same time share one request
+            weeks = self._flight.do("weeks", lambda: self._fetch_weeks(refresh))
+        return dict(weeks)
 
+    def _fetch_weeks(self, refresh: bool) -> Dict[Tuple[int, int], Dict[str, Optional[str]]]:
+        generation = (self._account_generation, self._weeks_generation)
+        url = urllib.parse.urljoin(self.BASE_URL, "/Azubi/Ausbildungsnachweise.aspx")
+        weeks = self._read_page("overview", "", url, parsing.parse_weeks, refresh=refresh)
+        with self._state_lock:
+            # Do not keep the overview of an account that was logged out, or
+            # of a week written to, meanwhile
+            if generation == (self._account_generation, self._weeks_generation):
+                self._weeks = weeks
+                self._weeks_loaded_at = time.monotonic()
+        return weeks
+
+    def _weeks_expired(self, weeks: Optional[dict], loaded_at: float) -> bool:
+        # Decided from a snapshot, other threads may replace or clear the cache
+        return weeks is None or time.monotonic() - loaded_at > self.week_cache_ttl
+
+    @instrumented
     def getReportWeekId(self, date: datetime) -> str:
         """Get the week ID for a given date."""
         if not self.isLoggedIn():
             raise NotLoggedInError("Not logged in. Login first.")
 
-        url = urllib.parse.urljoin(self.BASE_URL, "/Azubi/Ausbildungsnachweise.aspx")
-        overview_html = self.session.get(url).text
-        soup = BeautifulSoup(overview_html, "html.parser")
-        week_divs = soup.find_all("div", class_="mo NBox")
-
-        calendar_week = date.isocalendar()[1]
-        year = date.isocalendar()[0]
-
-        for div in week_divs:
-            kw_div = None
-            year_div = None
-            if "onclick" in div.attrs:
-                kw_div = div.find("div", class_="sKW")
-                year_div_elements = div.find("div", class_="KW").find_all("div")
-                if len(year_div_elements) > 2:
-                    year_div = year_div_elements[2]
-
-            if kw_div and year_div:
-                kw = int(kw_div.get_text(strip=True))
-                kw_year = int(year_div.get_text(strip=True))
-
-                if kw == calendar_week and kw_year == year:
-                    week_id = div["onclick"].split("'")[1].split("=")[1]
-                    return week_id
+        year, calendar_week = date.isocalendar()[:2]
+        # Week ids do not change, so they are taken from the cached overview
+        # even when its statuses are outdated
+        weeks = self._weeks
+        if weeks is None or (year, calendar_week) not in weeks:
+            # The week may have been created after the overview was cached
+            weeks = self.getWeeks(refresh=weeks is not None)
 
+        if (year, calendar_week) in weeks:
+            return weeks[(year, calendar_week)]["id"]
         raise ValueError("No report found for the specified week.")
 
-    def getSubjects(self) -> List[Dict[str, str]]:
-        """Get the complete list of subjects, including both static and user-defined subjects."""
+    @instrumented
+    def getSubjects(self, refresh: bool = False) -> List[Dict[str, str]]:
+        """Get the complete list of subjects, including both static and user-defined subjects.
+        The list is fetched once per session and kept up to date by
+        sync_subjects, add_subject and delete_subject.
+        - Parameters:
+            refresh: Fetch the subject page again instead of using the cache.
+        """
         if not self.isLoggedIn():
             raise NotLoggedInError("Not logged in. Login first.")
 
-        static_subjects = [
-            {"id": "1", "name": "Betrieb"},
-            {"id": "2", "name": "Schule"},
-            {"id": "3", "name": "ÜBA"},
-            {"id": "4", "name": "Urlaub"},
-            {"id": "5", "name": "Feiertag"},
-            {"id": "6", "name": "Arbeitsunfähig"},
-            {"id": "7", "name": "Frei"},
-        ]
+        return [dict(subject) for subject in self._subject_catalog(refresh).subjects]
+
+    def _subject_catalog(self, refresh: bool = False) -> SubjectCatalog:
+        """The cached subjects, fetched once by one thread if missing."""
+        catalog = self._subjects
+        if refresh or catalog is None:
+            catalog = self._flight.do("subjects", lambda: self._fetch_subjects(refresh))
+        return catalog
+
+    def _fetch_subjects(self, refresh: bool) -> SubjectCatalog:
+        generation = self._account_generation
+        url = urllib.parse.urljoin(self.BASE_URL, "/Azubi/SetupSchulfach.aspx")
+        catalog = SubjectCatalog(
+            parsing.STATIC_SUBJECTS
+            + self._read_page("setup", "", url, parsing.parse_subjects, refresh=refresh)
+        )
+        with self._state_lock:
+            if generation == self._account_generation:
+                self._subjects = catalog
+        return catalog
 
-        subject_setup_html = self.session.get(
-            urllib.parse.urljoin(self.BASE_URL, "/Azubi/SetupSchulfach.aspx")
-        ).text
-        soup = BeautifulSoup(subject_setup_html, "html.parser")
-        subject_elements = soup.find(id="divSchulfach").find_all("input")
+    @instrumented
+    def get_art_id_from_text(self, subject_name: str) -> Optional[str]:
+        """Get the subject ID from its name, see SubjectCatalog.find_id."""
+        return self._subject_catalog().find_id(subject_name)
 
-        dynamic_subjects = [
-            {
-                "id": subject_element.get("data-default"),
-                "name": subject_element.get("value"),
-            }
-            for subject_element in subject_elements
-        ]
+    def _entry_url(self, date: datetime, week_id: str) -> str:
+        return f"{self.BASE_URL}/Azubi/XMLHttpRequest.ashx?Datum={TimeHelper.dateTimeToString(date)}&BrNr={week_id}&BrSt=1&BrVorh=Yes&T={TimeHelper.getActualTimestamp()}"
 
-        return static_subjects + dynamic_subjects
+    def _run_concurrently(self, fn, items: list, max_workers: Optional[int] = None) -> list:
+        """Apply fn to every item on a bounded thread pool and return the results in order."""
+        max_workers = max_workers or self.max_workers
+        if max_workers <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            return list(executor.map(self.instrumentation.bind(fn), items))
 
-    def get_art_id_from_text(self, subject_name: str) -> Optional[str]:
-        """Get the subject ID from its name."""
-        subjects = self.getSubjects()
-        for subject in subjects:
-            if subject_name in subject['name']:
-                return subject['id']
-        return None
+    @staticmethod
+    def _week_of(date: datetime) -> Tuple[int, int]:
+        return tuple(date.isocalendar()[:2])
 
-    def writeReports(self, entries: List[Entry]) -> None:
-        """Write a list of reports to the Azubiheft."""
+    def _resolve_week_ids(
+        self, dates, errors: Optional[Dict[Tuple[int, int], str]] = None
+    ) -> Dict[Tuple[int, int], str]:
+        """Look up the week id of every calendar week the dates fall in, once per week.
+        - Parameters:
+            dates: Dates to look up.
+            errors: If given, weeks without a report are added to it with the
+                error message instead of raising ValueError.
+        """
+        week_ids = {}
+        for date in dates:
+            week = self._week_of(date)
+            if week in week_ids or (errors is not None and week in errors):
+                continue
+            try:
+                week_ids[week] = self.getReportWeekId(date)
+            except ValueError as e:
+                if errors is None:
+                    raise
+                errors[week] = str(e)
+        return week_ids
+
+    @instrumented
+    def writeReports(
+        self,
+        entries: List[Entry],
+        max_workers: Optional[int] = None,
+        journal=None,
+    ) -> List[WriteResult]:
+        """Write a list of reports to the Azubiheft.
+        The week ids are resolved once per calendar week before anything is
+        sent. Days are written concurrently, the entries of one day in order.
+        - Parameters:
+            entries: Entries to add.
+            max_workers: Number of days written in parallel, defaults to
+                the max_workers of the session.
+            journal: Path of a WriteJournal database, or a WriteJournal, that
+                records every entry before and after it is sent. Calling
+                writeReports again with the same entries and journal after an
+                interruption only sends the entries that did not arrive.
+        - Returns:
+            One WriteResult per entry, in the order of entries. Entries the
+            journal shows as written are not sent; their results have a
+            latency of 0. Entries of weeks without a report are not sent
+            either and fail with the error.
+        """
         if not self.isLoggedIn():
             raise NotLoggedInError("Not logged in. Login first.")
 
-        headers = {
-            "x-my-ajax-request": "ajax",
-            "Origin": self.BASE_URL,
-            "Referer": self.BASE_URL,
-            "Sec-Fetch-Dest": "empty",
-            "Sec-Fetch-Mode": "cors",
-            "Sec-Fetch-Site": "same-origin",
-            "Pragma": "no-cache",
-            "Cache-Control": "no-cache",
-        }
-
-        for entry in entries:
-            date_str = TimeHelper.dateTimeToString(entry.date)
-            week_number = self.getReportWeekId(entry.date)
-            url = f"{self.BASE_URL}/Azubi/XMLHttpRequest.ashx?Datum={date_str}&BrNr={week_number}&BrSt=1&BrVorh=Yes&T={TimeHelper.getActualTimestamp()}"
+        if journal is None:
+            return self._write_reports(entries, max_workers, None)
+        from .journal import WriteJournal
+
+        if isinstance(journal, WriteJournal):
+            return self._write_reports(entries, max_workers, journal)
+        with WriteJournal(journal) as opened:
+            return self._write_reports(entries, max_workers, opened)
+
+    def _write_reports(
+        self, entries: List[Entry], max_workers: Optional[int], journal: Optional["WriteJournal"]
+    ) -> List[WriteResult]:
+        results: List[Optional[WriteResult]] = [None] * len(entries)
+        if journal is not None:
+            account = self.username or ""
+            keys = journal.keys(entries)
+            for index, status_code in journal.resume(self, entries, keys, max_workers).items():
+                results[index] = WriteResult(entries[index], status_code, 0.0)
+
+        to_send = [(index, entry) for index, entry in enumerate(entries) if results[index] is None]
+        missing_weeks: Dict[Tuple[int, int], str] = {}
+        week_ids = self._resolve_week_ids((entry.date for _, entry in to_send), missing_weeks)
+        if missing_weeks:
+            # Entries of weeks without a report fail on their own, the rest is written
+            for index, entry in to_send:
+                error = missing_weeks.get(self._week_of(entry.date))
+                if error is not None:
+                    logger.error(
+                        f"Failed to add entry for date {TimeHelper.dateTimeToString(entry.date)}: {error}"
+                    )
+                    results[index] = WriteResult(entry, None, 0.0, error)
+            to_send = [(index, entry) for index, entry in to_send if results[index] is None]
+        days: Dict[str, List[Tuple[int, Entry]]] = {}
+        for index, entry in to_send:
+            days.setdefault(TimeHelper.dateTimeToString(entry.date), []).append(
+                (index, entry)
+            )
 
-            formatted_message = (
-                "<div>" + "</div><div>".join(entry.message.split("\n")) + "</div>"
+        headers = parsing.ajax_headers(self.BASE_URL)
+
+        def write(index: int, entry: Entry) -> WriteResult:
+            week_id = week_ids[self._week_of(entry.date)]
+            if journal is None:
+                return self._write_entry(entry, week_id, headers)
+            journal.record_intent(account, keys[index], entry.date)
+            result = self._write_entry(entry, week_id, headers)
+            journal.record_result(account, keys[index], entry.date, result.status_code, result.error)
+            return result
+
+        def write_day(day_entries: List[Tuple[int, Entry]]) -> List[Tuple[int, WriteResult]]:
+            return [(index, write(index, entry)) for index, entry in day_entries]
+
+        for day_results in self._run_concurrently(
+            write_day, list(days.values()), max_workers
+        ):
+            for index, result in day_results:
+                results[index] = result
+        return results
+
+    def _write_entry(
+        self, entry: Entry, week_id: str, headers: Dict[str, str]
+    ) -> WriteResult:
+        """Post a single new entry and report the outcome."""
+        formData = parsing.entry_form(entry.message, entry.time_spent, entry.type)
+        self._invalidate_day(entry.date)
+
+        started = time.perf_counter()
+        try:
+            response = self._post(
+                self._entry_url(entry.date, week_id), headers=headers, data=formData
             )
-            encoded_message = urllib.parse.quote(formatted_message)
-
-            formData = {
-                "disablePaste": "0",
-                "Seq": "0",
-                "Art_ID": str(entry.type),
-                "Abt_ID": "0",
-                "Dauer": entry.time_spent,
-                "Inhalt": encoded_message,
-                "jsVer": "12",
-            }
+        except TransportError as e:
+            logger.error(f"Failed to add entry for date {TimeHelper.dateTimeToString(entry.date)}: {e}")
+            return WriteResult(
+                entry, getattr(e, "status_code", None), time.perf_counter() - started, str(e)
+            )
+        finally:
+            # Pages read while the entry was in flight may predate it
+            self._invalidate_day(entry.date)
 
-            response = self.session.post(url, headers=headers, data=formData)
-            if response.status_code != 200:
-                logger.error(
-                    f"Failed to add entry for date {date_str}. Response code: {response.status_code}"
-                )
-            else:
-                logger.info(f"Entry added successfully for date {date_str}.")
+        result = WriteResult(entry, response.status_code, time.perf_counter() - started)
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to add entry for date {TimeHelper.dateTimeToString(entry.date)}."
+                f" Response code: {response.status_code}"
+            )
+        elif logger.isEnabledFor(logging.INFO):
+            # Called once per entry, only format the message when it is logged
+            logger.info(f"Entry added successfully for date {TimeHelper.dateTimeToString(entry.date)}.")
+        return result
 
+    @instrumented
     def writeReport(
         self, date: datetime, message: str, time_spent: str, entry_type: int
     ) -> None:
@@ -309,56 +1055,140 @@ class Session:
             entry = Entry(date, message, time_spent, entry_type)
             self.writeReports([entry])
 
+    @instrumented
     def getReport(
-        self, date: datetime, include_formatting: bool = False
-    ) -> List[Dict[str, str]]:
-        """Retrieve a report for a given date, optionally including HTML formatting."""
+        self, date: datetime, include_formatting: bool = False, records: bool = False
+    ) -> Union[List[Dict[str, str]], Report]:
+        """Retrieve a report for a given date, optionally including HTML formatting.
+        - Parameters:
+            date: Day of the report.
+            include_formatting: Keep the HTML formatting of the texts.
+            records: Return a Report with parsed durations and subject ids
+                instead of a list of dicts. Needs the subject list once.
+        """
         if not self.isLoggedIn():
             raise NotLoggedInError("Not logged in. Login first.")
 
-        url = f"{self.BASE_URL}/Azubi/Tagesbericht.aspx?Datum={TimeHelper.dateTimeToString(date)}"
-        report_html = self.session.get(url).text
-        soup = BeautifulSoup(report_html, "html.parser")
-
-        reports = []
-        entries = soup.find_all("div", class_="d0 mo")
-
-        for entry in entries:
-            duration = entry.find("div", class_="row2 d4").get_text(strip=True)
-            if duration.strip() == "00:00":
-                continue
-            activity_type = (
-                entry.find("div", class_="row1 d3")
-                .get_text(strip=True)
-                .replace("Art: ", "")
-            )
-            seq = entry.get("data-seq")
-
-            report_text_div = entry.find("div", class_="row7 d5")
-            if include_formatting:
-                report_text = "".join(
-                    str(e)
-                    for e in report_text_div.contents
-                    if isinstance(e, NavigableString) or e.name == "div"
-                )
-                report_text = re.sub(r"<br\s*/?>", "\n", report_text)
-            else:
-                report_text = " ".join(report_text_div.stripped_strings)
-
-            reports.append(
-                {
-                    "seq": seq,
-                    "type": activity_type,
-                    "duration": duration,
-                    "text": report_text,
-                }
-            )
+        day = TimeHelper.dateTimeToString(date)
+        url = f"{self.BASE_URL}/Azubi/Tagesbericht.aspx?Datum={day}"
+        reports = self._read_page("report", day, url, parsing.parse_report, include_formatting)
 
         if not reports:
             logger.info("No reports found for the given date.")
+        if records:
+            return Report.from_dict(reports, date, self._subject_catalog().find_id)
         return reports
 
-    def deleteReport(self, date: datetime, entry_number: Optional[int] = None) -> None:
+    @instrumented
+    def getReports(
+        self,
+        start: datetime,
+        end: datetime,
+        include_formatting: bool = False,
+        max_workers: Optional[int] = None,
+        skip_weekends: bool = False,
+        skip_empty: bool = False,
+        records: bool = False,
+    ) -> Dict[Date, Union[List[Dict[str, str]], Report]]:
+        """Retrieve the reports of all days from start to end (inclusive).
+        The days are fetched concurrently over the session's connection pool.
+        - Parameters:
+            start: First day of the range.
+            end: Last day of the range.
+            include_formatting: Keep the HTML formatting of the texts, see getReport.
+            max_workers: Number of days fetched in parallel, defaults to the
+                max_workers of the session.
+            skip_weekends: Do not fetch Saturdays and Sundays.
+            skip_empty: Leave out days without entries.
+            records: Return Report records instead of lists of dicts, see getReport.
+        - Returns:
+            The entries of every day, keyed by date in ascending order.
+        """
+        return dict(
+            self.iter_reports(
+                start,
+                end,
+                include_formatting=include_formatting,
+                max_workers=max_workers,
+                skip_weekends=skip_weekends,
+                skip_empty=skip_empty,
+                records=records,
+            )
+        )
+
+    def iter_reports(
+        self,
+        start: datetime,
+        end: datetime,
+        include_formatting: bool = False,
+        prefetch: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        skip_weekends: bool = False,
+        skip_empty: bool = False,
+        records: bool = False,
+    ) -> Iterator[Tuple[Date, Union[List[Dict[str, str]], Report]]]:
+        """Iterate over the reports of all days from start to end (inclusive).
+        Days are fetched in the background, at most prefetch days ahead of
+        the consumer, and yielded in order as soon as they arrive. Closing the
+        iterator early (e.g. by leaving a for loop) cancels the days not yet
+        requested and waits for the requests in flight.
+        - Parameters:
+            start: First day of the range.
+            end: Last day of the range.
+            include_formatting: Keep the HTML formatting of the texts, see getReport.
+            prefetch: Number of days fetched ahead, defaults to twice max_workers.
+            max_workers: Number of days fetched in parallel, defaults to the
+                max_workers of the session.
+            skip_weekends: Do not fetch Saturdays and Sundays.
+            skip_empty: Leave out days without entries.
+            records: Yield Report records instead of lists of dicts, see getReport.
+        - Returns:
+            An iterator over (date, entries) pairs in ascending order.
+        """
+        if not self.isLoggedIn():
+            raise NotLoggedInError("Not logged in. Login first.")
+        if records:
+            # Load the subject ids once instead of in every worker
+            self.getSubjects()
+
+        max_workers = max_workers or self.max_workers
+        prefetch = max(prefetch or 2 * max_workers, 1)
+        # The operation path is taken from the caller, not from wherever the
+        # iterator happens to be consumed
+        stack = self.instrumentation.current() + ("iter_reports",)
+        fetch = self.instrumentation.bind(
+            lambda day: self.getReport(day, include_formatting, records), "iter_reports"
+        )
+        days = TimeHelper.iterDateRange(start, end, skip_weekends)
+        return self._iter_reports(
+            days, fetch, prefetch, min(max_workers, prefetch), skip_empty, stack
+        )
+
+    def _iter_reports(
+        self, days, fetch, prefetch: int, max_workers: int, skip_empty: bool, stack
+    ) -> Iterator[Tuple[Date, Union[List[Dict[str, str]], Report]]]:
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = deque((day, executor.submit(fetch, day)) for day in itertools.islice(days, prefetch))
+        try:
+            while pending:
+                day, future = pending.popleft()
+                entries = future.result()
+                # Keep the read-ahead window full while the consumer works
+                for next_day in itertools.islice(days, 1):
+                    pending.append((next_day, executor.submit(fetch, next_day)))
+                if not skip_empty or (entries.entries if isinstance(entries, Report) else entries):
+                    yield day, entries
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.instrumentation.record_call(stack, time.perf_counter() - started)
+
+    @instrumented
+    def deleteReport(
+        self, date: datetime, entry_number: Optional[int] = None
+    ) -> List[WriteResult]:
         """Delete one or all reports for a given date."""
         if not self.isLoggedIn():
             raise NotLoggedInError("Not logged in. Login first.")
@@ -366,20 +1196,10 @@ class Session:
         report_entries = self.getReport(date)
         if not report_entries:
             logger.info("No report entries found for this date.")
-            return
+            return []
 
         week_number = self.getReportWeekId(date)
-
-        headers = {
-            "x-my-ajax-request": "ajax",
-            "Origin": self.BASE_URL,
-            "Referer": self.BASE_URL,
-            "Sec-Fetch-Dest": "empty",
-            "Sec-Fetch-Mode": "cors",
-            "Sec-Fetch-Site": "same-origin",
-            "Pragma": "no-cache",
-            "Cache-Control": "no-cache",
-        }
+        headers = parsing.ajax_headers(self.BASE_URL)
 
         entries_to_delete = (
             report_entries
@@ -387,26 +1207,185 @@ class Session:
             else [report_entries[entry_number - 1]]
         )
 
-        for entry in entries_to_delete:
-            formData = {
-                'disablePaste': '0',
-                'Seq': f"-{entry['seq']}",
-                'Art_ID': self.get_art_id_from_text(entry['type']),
-                'Abt_ID': '0',
-                'Dauer': entry['duration'],
-                'Inhalt': entry['text'],
-                'jsVer': '12'
-            }
+        return [
+            self._delete_entry(date, entry, week_number, headers)
+            for entry in entries_to_delete
+        ]
+
+    @instrumented
+    def deleteReports(
+        self,
+        start: datetime,
+        end: datetime,
+        predicate: Optional[Callable[[Date, Dict[str, str]], bool]] = None,
+        max_workers: Optional[int] = None,
+        skip_weekends: bool = False,
+    ) -> List[WriteResult]:
+        """Delete the report entries of all days from start to end (inclusive).
+        The days are read concurrently, the week and subject ids are looked
+        up once for the whole range, and the deletions are sent on a bounded
+        pool: days in parallel, the entries of one day in order.
+        - Parameters:
+            start: First day of the range.
+            end: Last day of the range.
+            predicate: Called with the date and the entry dict (as returned
+                by getReport), only entries it returns True for are deleted.
+                By default all entries are deleted.
+            max_workers: Number of days read and written in parallel.
+            skip_weekends: Leave Saturdays and Sundays untouched.
+        - Returns:
+            One WriteResult per deleted entry, ordered by date.
+        """
+        if not self.isLoggedIn():
+            raise NotLoggedInError("Not logged in. Login first.")
+
+        deletions: Dict[Date, List[Dict[str, str]]] = {}
+        for day, entries in self.iter_reports(
+            start, end, max_workers=max_workers, skip_weekends=skip_weekends, skip_empty=True
+        ):
+            entries = [entry for entry in entries if predicate is None or predicate(day, entry)]
+            if entries:
+                deletions[day] = entries
+        if not deletions:
+            logger.info("No report entries found in this range.")
+            return []
+
+        week_ids = self._resolve_week_ids(deletions)
+        self.getSubjects()
+        headers = parsing.ajax_headers(self.BASE_URL)
+
+        def delete_day(day: Date) -> List[WriteResult]:
+            week_id = week_ids[self._week_of(day)]
+            return [
+                self._delete_entry(day, entry, week_id, headers) for entry in deletions[day]
+            ]
+
+        results: List[WriteResult] = []
+        for day_results in self._run_concurrently(delete_day, list(deletions), max_workers):
+            results.extend(day_results)
+        return results
+
+    def _invalidate_day(self, date: datetime) -> None:
+        """Drop the cached pages a write to the day may change. The overview
+        kept by getWeeks expires too, as the status of the week may change.
+        """
+        self._invalidate_pages("report", TimeHelper.dateTimeToString(date))
+        self._invalidate_pages("overview")
+        with self._state_lock:
+            self._weeks_generation += 1
+            self._weeks_loaded_at = float("-inf")
+
+    def _delete_entry(
+        self, date: datetime, entry: Dict[str, str], week_id: str, headers: Dict[str, str]
+    ) -> WriteResult:
+        """Post the deletion of a parsed entry and report the outcome."""
+        formData = parsing.delete_entry_form(
+            entry, self.get_art_id_from_text(entry['type'])
+        )
+        self._invalidate_day(date)
+
+        started = time.perf_counter()
+        try:
+            # Deleting the same entry twice is harmless, so it may be retried
+            response = self._post(
+                self._entry_url(date, week_id), headers=headers, data=formData, idempotent=True
+            )
+        except TransportError as e:
+            logger.error(f"Failed to delete entry: {entry['text']}: {e}")
+            return WriteResult(
+                entry,
+                getattr(e, "status_code", None),
+                time.perf_counter() - started,
+                str(e),
+                action="delete",
+                date=date,
+            )
+        finally:
+            # Pages read while the deletion was in flight may predate it
+            self._invalidate_day(date)
+
+        result = WriteResult(
+            entry, response.status_code, time.perf_counter() - started, action="delete", date=date
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Failed to delete entry: {entry['text']}. Response code: {response.status_code}"
+            )
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info(f"Entry deleted successfully: {entry['text']}")
+        return result
 
-            url = f"{self.BASE_URL}/Azubi/XMLHttpRequest.ashx?Datum={TimeHelper.dateTimeToString(date)}&BrNr={week_number}&BrSt=1&BrVorh=Yes&T={TimeHelper.getActualTimestamp()}"
+    @instrumented
+    def upsertReports(
+        self,
+        entries: List[Entry],
+        dry_run: bool = False,
+        max_workers: Optional[int] = None,
+    ) -> UpsertPlan:
+        """Make the days of the given entries contain exactly these entries.
+        Each affected day is read once and compared by type, duration and text
+        (ignoring whitespace and markup) with the wanted entries. Only entries that are
+        missing are added and only entries that are not wanted are deleted,
+        so repeating an upsert sends no write requests. The order of entries
+        within a day is not compared.
+        - Parameters:
+            entries: All wanted entries of the affected days.
+            dry_run: Only compute the plan, send nothing.
+            max_workers: Number of days read and written in parallel.
+        - Returns:
+            The UpsertPlan, with the results of the sent requests unless dry_run.
+        """
+        if not self.isLoggedIn():
+            raise NotLoggedInError("Not logged in. Login first.")
 
-            response = self.session.post(url, headers=headers, data=formData)
-            if response.status_code != 200:
-                logger.error(
-                    f"Failed to delete entry: {entry['text']}. Response code: {response.status_code}"
+        wanted: Dict[Date, List[Entry]] = {}
+        for entry in entries:
+            if entry.time_spent.strip() != "00:00":
+                wanted.setdefault(TimeHelper.toDate(entry.date), []).append(entry)
+        days = sorted(wanted)
+        existing = dict(zip(days, self._run_concurrently(self.getReport, days, max_workers)))
+
+        plan = UpsertPlan()
+        plan.dry_run = dry_run
+        changes: Dict[Date, Tuple[List[Dict[str, str]], List[Entry]]] = {}
+        for day in days:
+            missing = list(wanted[day])
+            missing_keys = [
+                parsing.entry_key(e.type, e.time_spent, parsing.message_text(e.message))
+                for e in missing
+            ]
+            deletes = []
+            for current in existing[day]:
+                current_key = parsing.entry_key(
+                    self.get_art_id_from_text(current["type"]), current["duration"], current["text"]
                 )
-            else:
-                logger.info(f"Entry deleted successfully: {entry['text']}")
+                if current_key in missing_keys:
+                    index = missing_keys.index(current_key)
+                    del missing[index], missing_keys[index]
+                    plan.unchanged.append((day, current))
+                else:
+                    deletes.append(current)
+            plan.deletes.extend((day, entry) for entry in deletes)
+            plan.inserts.extend(missing)
+            if deletes or missing:
+                changes[day] = (deletes, missing)
+
+        if dry_run or not changes:
+            return plan
+
+        week_ids = self._resolve_week_ids(changes)
+        headers = parsing.ajax_headers(self.BASE_URL)
+
+        def apply_day(day: Date) -> List[WriteResult]:
+            deletes, inserts = changes[day]
+            week_id = week_ids[self._week_of(day)]
+            return [
+                self._delete_entry(day, entry, week_id, headers) for entry in deletes
+            ] + [self._write_entry(entry, week_id, headers) for entry in inserts]
+
+        for day_results in self._run_concurrently(apply_day, list(changes), max_workers):
+            plan.results.extend(day_results)
+        return plan
 
 
 class TimeHelper:
@@ -415,11 +1394,53 @@ class TimeHelper:
         """Convert a datetime object to a string in the format YYYYMMDD."""
         return date.strftime("%Y%m%d")
 
+    @staticmethod
+    def toDate(value) -> Date:
+        """Convert a datetime, date or YYYY-MM-DD string to a date."""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, str):
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        return value
+
+    @staticmethod
+    def isoWeekStart(year: int, week: int) -> Date:
+        """Get the Monday of an ISO calendar week."""
+        # January 4th always lies in calendar week 1
+        fourth = Date(year, 1, 4)
+        return fourth + timedelta(days=-fourth.weekday(), weeks=week - 1)
+
+    @staticmethod
+    def dateRange(start: datetime, end: datetime, skip_weekends: bool = False) -> List[Date]:
+        """List the days from start to end (inclusive), optionally without weekends."""
+        return list(TimeHelper.iterDateRange(start, end, skip_weekends))
+
+    @staticmethod
+    def iterDateRange(start: datetime, end: datetime, skip_weekends: bool = False) -> Iterator[Date]:
+        """Iterate over the days from start to end (inclusive), optionally without weekends."""
+        day, end = TimeHelper.toDate(start), TimeHelper.toDate(end)
+        while day <= end:
+            if not skip_weekends or day.weekday() < 5:
+                yield day
+            day += timedelta(days=1)
+
     @staticmethod
     def getActualTimestamp() -> str:
         """Get the current time as a string timestamp."""
         return str(int(time.time()))
 
+    @staticmethod
+    def parseDuration(duration: str) -> timedelta:
+        """Convert a duration such as "04:30" to a timedelta."""
+        hours, _, minutes = duration.strip().partition(":")
+        return timedelta(hours=int(hours), minutes=int(minutes or 0))
+
+    @staticmethod
+    def durationToString(duration: timedelta) -> str:
+        """Convert a timedelta to a duration as shown on the report page, e.g. "04:30"."""
+        minutes = int(duration.total_seconds()) // 60
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
     @staticmethod
     def timeDeltaToString(time_delta: timedelta) -> str:
         """Convert a timedelta object to a string, ensuring it's less than 19:59."""
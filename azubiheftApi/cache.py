@@ -0,0 +1,142 @@
+# In-memory cache of parsed pages, see Session(cache=PageCache())
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class CachedPage:
+    """A parsed page with its expiry time and the validators the server sent."""
+
+    __slots__ = ("value", "expires_at", "etag", "last_modified")
+
+    def __init__(self, value: Any, expires_at: float, etag: Optional[str], last_modified: Optional[str]):
+        self.value = value
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers asking the server to answer 304 if the page did not change."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """Bounded LRU cache of parsed pages with a time to live per page type.
+
+    Entries are keyed by (account, page, ident, parse arguments), where page
+    is "overview", "setup" or "report" and ident tells pages of the same type
+    apart, e.g. the date of a day report. A Session invalidates the affected
+    entries itself when it writes. Pages fetched before an invalidation are
+    not stored once it happened, see generation. Expired entries that carry an ETag or
+    Last-Modified validator are revalidated with a conditional request
+    instead of being fetched again.
+    """
+
+    DEFAULT_TTL = {"overview": 300.0, "setup": 300.0, "report": 60.0}
+
+    def __init__(self, max_entries: int = 512, ttl: Optional[Dict[str, float]] = None):
+        """Initializes the cache.
+        - Parameters:
+            max_entries: Number of pages kept before the least recently used is dropped.
+            ttl: Seconds a page is used without asking the server, by page
+                type. Overrides DEFAULT_TTL; 0 disables caching of a type
+                unless the server sends validators.
+        """
+        self.max_entries = max_entries
+        self.ttl = dict(self.DEFAULT_TTL, **(ttl or {}))
+        self._entries: "OrderedDict[Tuple, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Incremented by every invalidation
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple) -> Optional[CachedPage]:
+        """Look up a page, fresh or not, and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(
+        self,
+        key: Tuple,
+        value: Any,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Store a parsed page. Pages without TTL and validators are not kept.
+        - Parameters:
+            generation: The generation read before the page was requested.
+                If entries were invalidated since, the page may predate the
+                write that caused it and is not stored.
+        """
+        ttl = self.ttl.get(key[1], 0.0)
+        if ttl <= 0 and not (etag or last_modified):
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = CachedPage(value, time.monotonic() + ttl, etag, last_modified)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revalidated(self, key: Tuple, entry: CachedPage, generation: Optional[int] = None) -> None:
+        """Keep a page the server confirmed as unchanged for another TTL."""
+        with self._lock:
+            self.revalidations += 1
+        self.put(key, entry.value, entry.etag, entry.last_modified, generation)
+
+    def invalidate(
+        self,
+        account: Optional[str] = None,
+        page: Optional[str] = None,
+        ident: Optional[Hashable] = None,
+    ) -> None:
+        """Drop all pages matching the given account, page type and ident."""
+        with self._lock:
+            self.generation += 1
+            for key in [
+                key
+                for key in self._entries
+                if (account is None or key[0] == account)
+                and (page is None or key[1] == page)
+                and (ident is None or key[2] == ident)
+            ]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+            }
@@ -0,0 +1,377 @@
+# Command-line tool for bulk work on an Azubiheft account, see `azubiheft --help`
+
+from datetime import date as Date, datetime
+from typing import Dict, Iterator, List, Optional, TextIO
+import argparse
+import csv
+import getpass
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from .azubiheftApi import Entry, Session, TimeHelper, WriteResult
+from .errors import Error, NotLoggedInError
+from .instrumentation import RequestEvent
+from .parsing import ParserPool
+
+FIELDS = ["date", "seq", "art_id", "type", "duration", "text"]
+DEFAULT_SESSION_FILE = "~/.azubiheft-session.json"
+
+
+class Progress:
+    """Shows the progress and throughput of a command on stderr.
+    Registered as instrumentation listener it counts the requests of the
+    session; advance() counts the command's own items, e.g. days.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        unit: str,
+        total: Optional[int] = None,
+        stream: Optional[TextIO] = None,
+        interval: float = 0.2,
+        enabled: bool = True,
+    ):
+        self.label = label
+        self.unit = unit
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.enabled = enabled
+        # Redraw a status line only on a terminal, logs just get the summary
+        self.live = enabled and self.stream.isatty()
+        self.done = 0
+        self.requests = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._drawn_at = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, event) -> None:
+        if isinstance(event, RequestEvent):
+            with self._lock:
+                self.requests += 1
+                self.bytes += event.bytes
+            self._draw()
+
+    def advance(self, count: int = 1) -> None:
+        with self._lock:
+            self.done += count
+        self._draw()
+
+    def status(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        done = f"{self.done}/{self.total}" if self.total is not None else str(self.done)
+        return (
+            f"{self.label}: {done} {self.unit}, {self.requests} requests, "
+            f"{self.bytes / 1024:.0f} KiB in {elapsed:.1f}s "
+            f"({self.done / elapsed:.1f} {self.unit}/s, {self.requests / elapsed:.1f} requests/s)"
+        )
+
+    def _draw(self) -> None:
+        now = time.perf_counter()
+        if not self.live or now - self._drawn_at < self.interval:
+            return
+        self._drawn_at = now
+        self.stream.write("\r" + self.status())
+        self.stream.flush()
+
+    def finish(self) -> None:
+        if self.enabled:
+            self.stream.write(("\r" if self.live else "") + self.status() + "\n")
+            self.stream.flush()
+
+
+def _date(value: str) -> Date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def _rename(value: str) -> List[str]:
+    old, sep, new = value.partition("=")
+    if not sep or not old or not new:
+        raise argparse.ArgumentTypeError(f"invalid rename {value!r}, expected OLD=NEW")
+    return [old, new]
+
+
+def _open_output(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdout
+    return open(os.path.expanduser(path), "w", encoding="utf-8", newline="")
+
+
+def _format_of(path: str, format: Optional[str]) -> str:
+    if format:
+        return format
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def open_session(args: argparse.Namespace, parser_pool: Optional[ParserPool] = None) -> Session:
+    """Restore the stored session of the user or log in and store it."""
+    username = args.user or os.environ.get("AZUBIHEFT_USER")
+    if not username:
+        raise SystemExit("azubiheft: no user given, use --user or AZUBIHEFT_USER")
+    password = os.environ.get("AZUBIHEFT_PASSWORD")
+
+    def new_session() -> Session:
+        return Session(
+            auto_relogin=True,
+            max_workers=args.workers,
+            base_url=args.base_url,
+            parser_pool=parser_pool,
+        )
+
+    session = new_session()
+    if args.session_file and session.load(args.session_file, key=username, password=password):
+        # Without a password an expired session cannot be renewed on the fly
+        if password is not None or session.isLoggedIn(verify=True):
+            return session
+        session = new_session()
+
+    if password is None:
+        password = getpass.getpass(f"Password for {username}: ")
+    session.login(username, password)
+    if args.session_file:
+        session.save(args.session_file, key=username)
+    return session
+
+
+def _report_failures(results: List[WriteResult]) -> int:
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        print(f"azubiheft: {result!r}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _export(session: Session, args: argparse.Namespace, progress: Progress) -> int:
+    progress.total = len(TimeHelper.dateRange(args.start, args.end, args.skip_weekends))
+    format = _format_of(args.output, args.format)
+    output = _open_output(args.output)
+    try:
+        writer = csv.DictWriter(output, FIELDS) if format == "csv" else None
+        if writer:
+            writer.writeheader()
+        for _, report in session.iter_reports(
+            args.start,
+            args.end,
+            include_formatting=args.formatting,
+            skip_weekends=args.skip_weekends,
+            records=True,
+        ):
+            for entry in report.entries:
+                row = {
+                    "date": entry.date.isoformat(),
+                    "seq": entry.seq,
+                    "art_id": entry.art_id,
+                    "type": entry.type,
+                    "duration": TimeHelper.durationToString(entry.duration),
+                    "text": entry.text,
+                }
+                if writer:
+                    writer.writerow(row)
+                else:
+                    output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            progress.advance()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def read_entries(session: Session, path: str) -> Iterator[Entry]:
+    """Read entries from a JSON lines or CSV file as written by export.
+    Rows without art_id are resolved by their type name.
+    """
+    with open(os.path.expanduser(path), encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = enumerate(csv.DictReader(f), 2)
+        else:
+            rows = ((number, json.loads(line)) for number, line in enumerate(f, 1) if line.strip())
+        for number, row in rows:
+            art_id = row.get("art_id") or (row.get("type") and session.get_art_id_from_text(row["type"]))
+            if not art_id:
+                raise ValueError(f"{path}:{number}: unknown subject {row.get('type')!r}")
+            yield Entry(_date(row["date"]), row["text"], row["duration"], int(art_id))
+
+
+def _import(session: Session, args: argparse.Namespace, progress: Progress) -> int:
+    try:
+        entries = list(read_entries(session, args.file))
+    except (OSError, ValueError, KeyError, argparse.ArgumentTypeError) as e:
+        raise Error(f"cannot read {args.file}: {e}")
+    progress.total = len(entries)
+    if args.replace:
+        plan = session.upsertReports(entries, dry_run=args.dry_run)
+        progress.total, progress.done = plan.requests, len(plan.results)
+        print(
+            f"{len(plan.inserts)} to add, {len(plan.deletes)} to delete, "
+            f"{len(plan.unchanged)} unchanged",
+            file=sys.stderr,
+        )
+        return _report_failures(plan.results)
+    if args.dry_run:
+        print(f"{len(entries)} to add", file=sys.stderr)
+        return 0
+    results = session.writeReports(entries, journal=args.journal)
+    progress.done = len(results)
+    return _report_failures(results)
+
+
+def _delete(session: Session, args: argparse.Namespace, progress: Progress) -> int:
+    def predicate(day: Date, entry: Dict[str, str]) -> bool:
+        if args.type and entry["type"] != args.type:
+            return False
+        return not args.contains or args.contains in entry["text"]
+
+    results = session.deleteReports(
+        args.start,
+        args.end,
+        predicate=predicate if args.type or args.contains else None,
+        skip_weekends=args.skip_weekends,
+    )
+    progress.done = len(results)
+    return _report_failures(results)
+
+
+def _subjects_list(session: Session, args: argparse.Namespace, progress: Progress) -> int:
+    for subject in session.getSubjects():
+        print(f"{subject['id']}\t{subject['name']}")
+        progress.advance()
+    return 0
+
+
+def _subjects_sync(session: Session, args: argparse.Namespace, progress: Progress) -> int:
+    session.sync_subjects(add=args.add, delete=args.delete, rename=dict(args.rename))
+    progress.done = len(args.add) + len(args.delete) + len(args.rename)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="azubiheft", description="Bulk export, import and cleanup of Azubiheft reports."
+    )
+    parser.add_argument("--user", help="Azubiheft user name, defaults to $AZUBIHEFT_USER")
+    parser.add_argument("--base-url", help="Address of the Azubiheft server")
+    parser.add_argument(
+        "--session-file",
+        default=DEFAULT_SESSION_FILE,
+        help="Stored login cookies, reused between runs (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-session-file",
+        dest="session_file",
+        action="store_const",
+        const=None,
+        help="Always log in and store nothing",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Days processed in parallel (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Parse pages on N worker processes, for large ranges on many cores",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Show no progress")
+    parser.add_argument("--verbose", action="store_true", help="Log every request and entry")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    def add_range(command: argparse.ArgumentParser) -> None:
+        command.add_argument("--from", dest="start", type=_date, required=True, metavar="YYYY-MM-DD")
+        command.add_argument("--to", dest="end", type=_date, required=True, metavar="YYYY-MM-DD")
+        command.add_argument("--skip-weekends", action="store_true", help="Leave out Saturdays and Sundays")
+
+    export = commands.add_parser("export", help="Write the entries of a date range to a file")
+    add_range(export)
+    export.add_argument("--format", choices=["jsonl", "csv"], help="Default: by output extension, else jsonl")
+    export.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export.add_argument("--formatting", action="store_true", help="Keep the HTML formatting of the texts")
+    export.set_defaults(run=_export, unit="days")
+
+    import_ = commands.add_parser("import", help="Add the entries of a JSON lines or CSV file")
+    import_.add_argument("file")
+    import_.add_argument(
+        "--replace",
+        action="store_true",
+        help="Make the days in the file contain exactly its entries; repeated runs send nothing",
+    )
+    import_.add_argument("--dry-run", action="store_true", help="Only show what would change")
+    import_.add_argument(
+        "--journal",
+        metavar="PATH",
+        help="Record sent entries in this database; rerunning after a crash only sends the rest",
+    )
+    import_.set_defaults(run=_import, unit="entries")
+
+    delete = commands.add_parser("delete", help="Delete the entries of a date range")
+    add_range(delete)
+    delete.add_argument("--type", help="Only delete entries of this subject")
+    delete.add_argument("--contains", help="Only delete entries whose text contains this")
+    delete.set_defaults(run=_delete, unit="entries")
+
+    subjects = commands.add_parser("subjects", help="List or change the user-defined subjects")
+    subject_commands = subjects.add_subparsers(dest="subjects_command", metavar="command")
+    subject_commands.required = True
+    subject_commands.add_parser("list", help="Print id and name of every subject").set_defaults(
+        run=_subjects_list, unit="subjects"
+    )
+    sync = subject_commands.add_parser("sync", help="Add, delete and rename subjects with one save")
+    sync.add_argument("--add", action="append", default=[], metavar="NAME")
+    sync.add_argument("--delete", action="append", default=[], metavar="NAME_OR_ID")
+    sync.add_argument("--rename", action="append", default=[], type=_rename, metavar="OLD=NEW")
+    sync.set_defaults(run=_subjects_sync, unit="changes")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # The library configures no logging, show its messages on stderr
+    logger = logging.getLogger("azubiheftApi")
+    level = logger.level
+    logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("azubiheft: %(message)s"))
+    logger.addHandler(handler)
+    name = args.command if args.command != "subjects" else f"subjects {args.subjects_command}"
+
+    parser_pool = ParserPool(args.parse_processes) if args.parse_processes > 0 else None
+    try:
+        session = open_session(args, parser_pool)
+        progress = Progress(name, args.unit, enabled=not args.quiet)
+        session.instrumentation.add_listener(progress)
+        try:
+            status = args.run(session, args, progress)
+        finally:
+            session.instrumentation.remove_listener(progress)
+            progress.finish()
+        if args.session_file and session.isLoggedIn():
+            # Keep cookies renewed by an automatic login for the next run
+            session.save(args.session_file, key=session.username)
+        return status
+    except NotLoggedInError as e:
+        hint = " Set AZUBIHEFT_PASSWORD to log in again automatically." if args.session_file else ""
+        print(f"azubiheft: {e}{hint}", file=sys.stderr)
+    except (Error, ValueError) as e:
+        print(f"azubiheft: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("azubiheft: interrupted", file=sys.stderr)
+        return 130
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+        if parser_pool is not None:
+            parser_pool.close()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,4 +12,28 @@ class ValueTooLargeError(Error):
 
 class NotLoggedInError(Error):
     """Raised when user is not loged in"""
-    pass
\ No newline at end of file
+    pass
+
+class TransportError(Error):
+    """Raised when a request to the Azubiheft fails"""
+    pass
+
+class RequestTimeoutError(TransportError):
+    """Raised when the server does not answer in time"""
+    pass
+
+class ConnectionFailedError(TransportError):
+    """Raised when the server cannot be reached"""
+    pass
+
+class HTTPStatusError(TransportError):
+    """Raised when the server answers with an unexpected status code"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ServerError(HTTPStatusError):
+    """Raised when the server keeps answering with a status code worth retrying:
+    429 (too many requests) or 5xx, see Transport.RETRY_STATUSES"""
+    pass
@@ -0,0 +1,300 @@
+# Request and parse statistics of a Session, grouped by the operation that caused them
+
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import functools
+import logging
+import threading
+import time
+import urllib.parse
+
+if TYPE_CHECKING:
+    from http.server import HTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class RequestEvent(NamedTuple):
+    """One HTTP request attempt. status_code is None if no response arrived."""
+
+    operation: Tuple[str, ...]
+    method: str
+    endpoint: str
+    status_code: Optional[int]
+    bytes: int
+    latency: float
+    error: Optional[str] = None
+
+
+class ParseEvent(NamedTuple):
+    """One parsed HTML page."""
+
+    operation: Tuple[str, ...]
+    page: str
+    duration: float
+
+
+def _operation_counters() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "time": 0.0,
+        "requests": 0,
+        "request_errors": 0,
+        "bytes": 0,
+        "latency": 0.0,
+        "parses": 0,
+        "parse_time": 0.0,
+    }
+
+
+def _endpoint_counters() -> Dict[str, Any]:
+    return {"requests": 0, "errors": 0, "bytes": 0, "latency": 0.0, "statuses": {}}
+
+
+class Instrumentation:
+    """Collects the HTTP requests and HTML parses of one or more sessions.
+
+    Every public Session method runs as an operation. Operations called by
+    other operations are nested, e.g. "writeReports > getReportWeekId >
+    getWeeks", and the counters of an operation include everything its
+    nested operations did. Listeners added with add_listener() receive every
+    RequestEvent and ParseEvent as it happens.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._listeners: List[Callable[[Any], None]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all collected statistics."""
+        with self._lock:
+            self._operations: Dict[str, Dict[str, Any]] = {}
+            self._endpoints: Dict[str, Dict[str, Any]] = {}
+            self._totals = _operation_counters()
+            self._parses: Dict[str, Dict[str, Any]] = {}
+
+    def add_listener(self, listener: Callable[[Any], None]) -> None:
+        """Call listener with every RequestEvent and ParseEvent."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Any], None]) -> None:
+        self._listeners.remove(listener)
+
+    def current(self) -> Tuple[str, ...]:
+        """The operations running in the current thread, outermost first."""
+        return getattr(self._local, "stack", ())
+
+    @contextmanager
+    def operation(self, name: str):
+        """Group everything done within the block under the operation name."""
+        parent = self.current()
+        stack = parent + (name,)
+        self._local.stack = stack
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.stack = parent
+            self.record_call(stack, time.perf_counter() - started)
+
+    def record_call(self, stack: Tuple[str, ...], elapsed: float) -> None:
+        """Count a finished call of the operation path stack."""
+        with self._lock:
+            counters = self._counters(stack)
+            counters["calls"] += 1
+            counters["time"] += elapsed
+
+    def bind(self, fn: Callable, operation: Optional[str] = None) -> Callable:
+        """Let fn run within the current operations, e.g. on a worker thread.
+        - Parameters:
+            fn: Function to bind.
+            operation: Name of a further operation fn runs in. Its calls are
+                not counted, see record_call.
+        """
+        stack = self.current() + ((operation,) if operation else ())
+
+        def bound(*args, **kwargs):
+            previous = self.current()
+            self._local.stack = stack
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.stack = previous
+
+        return bound
+
+    def _counters(self, stack: Tuple[str, ...]) -> Dict[str, Any]:
+        key = " > ".join(stack)
+        counters = self._operations.get(key)
+        if counters is None:
+            counters = self._operations[key] = _operation_counters()
+        return counters
+
+    def _enclosing_counters(self, stack: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        """The counters of the stack and of all operations enclosing it."""
+        return [self._totals] + [self._counters(stack[:i]) for i in range(1, len(stack) + 1)]
+
+    def record_request(
+        self,
+        method: str,
+        url: str,
+        status_code: Optional[int],
+        size: int,
+        latency: float,
+        error: Optional[str] = None,
+    ) -> None:
+        event = RequestEvent(
+            self.current(), method, urllib.parse.urlsplit(url).path, status_code, size, latency, error
+        )
+        with self._lock:
+            for counters in self._enclosing_counters(event.operation):
+                counters["requests"] += 1
+                counters["request_errors"] += error is not None
+                counters["bytes"] += size
+                counters["latency"] += latency
+            key = f"{method} {event.endpoint}"
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = _endpoint_counters()
+            endpoint["requests"] += 1
+            endpoint["errors"] += error is not None
+            endpoint["bytes"] += size
+            endpoint["latency"] += latency
+            status = str(status_code) if status_code is not None else error
+            endpoint["statuses"][status] = endpoint["statuses"].get(status, 0) + 1
+        self._notify(event)
+
+    def record_parse(self, page: str, duration: float) -> None:
+        event = ParseEvent(self.current(), page, duration)
+        with self._lock:
+            for counters in self._enclosing_counters(event.operation):
+                counters["parses"] += 1
+                counters["parse_time"] += duration
+            parses = self._parses.setdefault(page, {"parses": 0, "parse_time": 0.0})
+            parses["parses"] += 1
+            parses["parse_time"] += duration
+        self._notify(event)
+
+    def _notify(self, event) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Instrumentation listener failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the collected statistics.
+        - Returns:
+            "totals": Counters over everything.
+            "operations": Counters per operation path. "calls" and "time" count
+                the operation itself, the other counters include its nested
+                operations.
+            "endpoints": Counters and status codes per "METHOD /path".
+            "pages": Number and duration of parses per page.
+        """
+        with self._lock:
+            return {
+                "totals": dict(self._totals),
+                "operations": {key: dict(counters) for key, counters in self._operations.items()},
+                "endpoints": {
+                    key: dict(counters, statuses=dict(counters["statuses"]))
+                    for key, counters in self._endpoints.items()
+                },
+                "pages": {page: dict(counters) for page, counters in self._parses.items()},
+            }
+
+    def to_prometheus(self, prefix: str = "azubiheft") -> str:
+        """Render the statistics in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels)
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+        operations = sorted(stats["operations"].items())
+        for name, key, help_text in [
+            ("operation_calls_total", "calls", "Calls of the operation."),
+            ("operation_seconds_total", "time", "Time spent in the operation."),
+            ("operation_requests_total", "requests", "HTTP requests sent by the operation."),
+            ("operation_parse_seconds_total", "parse_time", "Time spent parsing pages in the operation."),
+        ]:
+            metric(name, help_text, [((("operation", op),), counters[key]) for op, counters in operations])
+
+        endpoints = [
+            (key.split(" ", 1), counters) for key, counters in sorted(stats["endpoints"].items())
+        ]
+        metric(
+            "requests_total",
+            "HTTP requests by endpoint and status.",
+            [
+                ((("method", method), ("endpoint", path), ("status", status)), count)
+                for (method, path), counters in endpoints
+                for status, count in sorted(counters["statuses"].items())
+            ],
+        )
+        metric(
+            "response_bytes_total",
+            "Bytes received by endpoint.",
+            [((("method", method), ("endpoint", path)), counters["bytes"]) for (method, path), counters in endpoints],
+        )
+        metric(
+            "request_seconds_total",
+            "Time spent waiting for responses by endpoint.",
+            [((("method", method), ("endpoint", path)), counters["latency"]) for (method, path), counters in endpoints],
+        )
+        metric(
+            "parse_seconds_total",
+            "Time spent parsing by page.",
+            [((("page", page),), counters["parse_time"]) for page, counters in sorted(stats["pages"].items())],
+        )
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def instrumented(method: Callable) -> Callable:
+    """Run a Session method as an operation of the session's instrumentation."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.instrumentation.operation(name):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def serve_metrics(
+    instrumentation: Instrumentation, port: int = 9100, address: str = ""
+) -> "HTTPServer":
+    """Serve the statistics for Prometheus on /metrics from a background thread.
+    Call shutdown() on the returned server to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = instrumentation.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    server = HTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,201 @@
+# Durable record of sent entries, so an interrupted writeReports can be resumed
+
+from collections import Counter
+from datetime import date as Date, datetime
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+from .parsing import entry_key, message_text
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS writes (
+    account TEXT NOT NULL,
+    key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    state TEXT NOT NULL,
+    status_code INTEGER,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (account, key)
+);
+"""
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class WriteJournal:
+    """Records every entry writeReports sends in a SQLite database.
+
+    The intent to send an entry is committed before the request and the
+    server's answer after it. When the same entries are written again with
+    the same journal, entries confirmed with status 200 are skipped and
+    entries without a confirmed answer (the process died or the connection
+    broke while the request was in flight) are looked up on the server: only
+    their days are read, and an entry found there is not sent again. Entries
+    the server rejected are sent again.
+
+    Use one journal per batch; an entry equal to one the journal already
+    confirmed for the account is never sent again. An equal entry that was
+    on the day before the batch counts as written when an unconfirmed entry
+    is looked up.
+    """
+
+    def __init__(self, path: str):
+        """Opens (or creates) the journal database.
+        - Parameters:
+            path: Path of the SQLite database.
+        """
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # Every commit reaches the disk before the request is sent
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=FULL")
+            with self._db:
+                self._db.executescript(SCHEMA)
+
+    def __enter__(self) -> "WriteJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def keys(entries) -> List[str]:
+        """Journal keys of the entries of a batch. Equal entries on the same
+        day get distinct keys by their order in the batch.
+        """
+        seen: Counter = Counter()
+        keys = []
+        for entry in entries:
+            identity = (_day(entry.date).isoformat(),) + entry_key(
+                entry.type, entry.time_spent, entry.message
+            )
+            seen[identity] += 1
+            keys.append(
+                hashlib.sha1(repr((identity, seen[identity])).encode("utf-8")).hexdigest()
+            )
+        return keys
+
+    def states(self, account: str, keys: List[str]) -> Dict[str, Tuple[str, Optional[int]]]:
+        """State and status code of the journaled keys."""
+        states = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, state, status_code FROM writes WHERE account = ?"
+                    f" AND key IN ({','.join('?' * len(chunk))})",
+                    [account] + chunk,
+                )
+                states.update((key, (state, status)) for key, state, status in rows)
+        return states
+
+    def _set(self, account: str, key: str, day, state: str, status_code=None, error=None) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO writes"
+                " (account, key, date, state, status_code, error, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account, key, _day(day).isoformat(), state, status_code, error, time.time()),
+            )
+
+    def record_intent(self, account: str, key: str, day) -> None:
+        """Commit that the entry is about to be sent."""
+        self._set(account, key, day, PENDING)
+
+    def record_result(
+        self, account: str, key: str, day, status_code: Optional[int], error: Optional[str] = None
+    ) -> None:
+        """Commit the outcome of sending the entry.
+        Without a status code it is unknown whether the server got the entry,
+        so it stays pending and is looked up when the batch is resumed.
+        """
+        if status_code is None:
+            self._set(account, key, day, PENDING, None, error)
+        else:
+            self._set(account, key, day, DONE if status_code == 200 else FAILED, status_code, error)
+
+    def resume(self, session, entries, keys: List[str], max_workers: Optional[int] = None) -> Dict[int, int]:
+        """Find the entries of a batch that need not be sent again.
+        Reads the days of unconfirmed entries once to check whether they
+        arrived, and records the outcome.
+        - Parameters:
+            session: Logged in Session of the account.
+            entries: The entries of the batch.
+            keys: Their keys, see keys().
+            max_workers: Number of days read in parallel.
+        - Returns:
+            The status codes of the entries already on the server, keyed by
+            their index in entries.
+        """
+        account = session.username or ""
+        states = self.states(account, keys)
+        done = {
+            index: states[key][1] for index, key in enumerate(keys) if states.get(key, ("",))[0] == DONE
+        }
+        pending = [index for index, key in enumerate(keys) if states.get(key, ("",))[0] == PENDING]
+        if not pending:
+            return done
+
+        days: Dict[Date, List[int]] = {}
+        for index in pending:
+            days.setdefault(_day(entries[index].date), []).append(index)
+        reports = dict(zip(days, session._run_concurrently(session.getReport, list(days), max_workers)))
+
+        found = 0
+        for day, indexes in days.items():
+            on_server = Counter(
+                entry_key(session.get_art_id_from_text(entry["type"]), entry["duration"], entry["text"])
+                for entry in reports[day]
+            )
+            # Confirmed entries of the batch account for their copies on the server
+            for index in done:
+                if _day(entries[index].date) == day:
+                    entry = entries[index]
+                    on_server[entry_key(entry.type, entry.time_spent, message_text(entry.message))] -= 1
+            for index in indexes:
+                entry = entries[index]
+                key = entry_key(entry.type, entry.time_spent, message_text(entry.message))
+                if on_server[key] > 0:
+                    on_server[key] -= 1
+                    done[index] = 200
+                    found += 1
+                    self.record_result(account, keys[index], day, 200)
+                else:
+                    self._set(account, keys[index], day, FAILED, None, "not found on the server")
+
+        logger.info(
+            f"Journal: {len(done)} entries already written, {found} of {len(pending)} unconfirmed entries found on the server."
+        )
+        return done
+
+    def counts(self, account: Optional[str] = None) -> Dict[str, int]:
+        """Number of journaled entries by state."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*) FROM writes WHERE ? IS NULL OR account = ? GROUP BY state",
+                (account, account),
+            ).fetchall()
+        return {PENDING: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def clear(self, account: Optional[str] = None) -> None:
+        """Forget the journaled entries, of one account or all."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM writes WHERE ? IS NULL OR account = ?", (account, account))
+
+
+def _day(value) -> Date:
+    return value.date() if isinstance(value, datetime) else value
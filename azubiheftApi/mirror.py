@@ -0,0 +1,204 @@
+# Local SQLite copy of an account's reports, updated week by week
+
+from datetime import date as Date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import sqlite3
+import threading
+import logging
+import time
+
+from .azubiheftApi import Session, TimeHelper
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weeks (
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    week_id TEXT NOT NULL,
+    status TEXT,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (year, week)
+);
+CREATE TABLE IF NOT EXISTS days (
+    date TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    date TEXT NOT NULL,
+    seq TEXT,
+    position INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    duration TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (date, seq)
+);
+"""
+
+
+class ReportMirror:
+    """Mirrors the reports of one account into a local SQLite database.
+
+    sync() compares the week tiles of the report overview with the mirrored
+    weeks and only fetches the days of weeks that are new or whose id or status
+    changed. The tiles do not reveal edits within a week, so the most recent
+    weeks are fetched on every sync as well.
+    """
+
+    def __init__(self, session: Session, path: str, include_formatting: bool = False):
+        """Opens (or creates) the mirror database.
+        - Parameters:
+            session: Logged in session of the mirrored account.
+            path: Path of the SQLite database.
+            include_formatting: Store the texts with HTML formatting, see Session.getReport.
+        """
+        self.session = session
+        self.path = path
+        self.include_formatting = include_formatting
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def __enter__(self) -> "ReportMirror":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def sync(
+        self,
+        full: bool = False,
+        recent_weeks: int = 2,
+        max_workers: Optional[int] = None,
+        today: Optional[Date] = None,
+    ) -> Dict[str, int]:
+        """Bring the mirror up to date.
+        - Parameters:
+            full: Fetch every week, not only new and changed ones.
+            recent_weeks: Number of weeks up to today that are always fetched.
+            max_workers: Number of days fetched in parallel.
+            today: Reference day for recent_weeks, defaults to today.
+        - Returns:
+            Counts of checked and fetched weeks, fetched days and stored entries.
+        """
+        weeks = self.session.getWeeks(refresh=True)
+        with self._lock:
+            known = {
+                (year, week): (week_id, status)
+                for year, week, week_id, status in self._db.execute(
+                    "SELECT year, week, week_id, status FROM weeks"
+                )
+            }
+
+        today = today or Date.today()
+        recent = {
+            tuple((today - timedelta(weeks=n)).isocalendar()[:2])
+            for n in range(recent_weeks)
+        }
+        changed = sorted(
+            key
+            for key, week in weeks.items()
+            if full
+            or key in recent
+            or known.get(key) != (week["id"], week["status"])
+        )
+
+        days_fetched = entries_stored = 0
+        for start, end in self._week_ranges(changed):
+            reports = self.session.getReports(
+                start, end, include_formatting=self.include_formatting, max_workers=max_workers
+            )
+            days_fetched += len(reports)
+            entries_stored += sum(len(entries) for entries in reports.values())
+            self._store_days(reports)
+
+        synced_at = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO weeks (year, week, week_id, status, synced_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [
+                    (year, week, weeks[(year, week)]["id"], weeks[(year, week)]["status"], synced_at)
+                    for year, week in changed
+                ],
+            )
+
+        logger.info(
+            f"Synced {len(changed)} of {len(weeks)} weeks, {days_fetched} days."
+        )
+        return {
+            "weeks_checked": len(weeks),
+            "weeks_synced": len(changed),
+            "days_fetched": days_fetched,
+            "entries_stored": entries_stored,
+        }
+
+    @staticmethod
+    def _week_ranges(weeks: List[Tuple[int, int]]) -> List[Tuple[Date, Date]]:
+        """Merge consecutive calendar weeks into (first day, last day) ranges."""
+        ranges: List[Tuple[Date, Date]] = []
+        for year, week in weeks:
+            start = TimeHelper.isoWeekStart(year, week)
+            end = start + timedelta(days=6)
+            if ranges and ranges[-1][1] + timedelta(days=1) == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def _store_days(self, reports: Dict[Date, List[Dict[str, str]]]) -> None:
+        """Replace the mirrored entries of the given days."""
+        synced_at = time.time()
+        days = [(day.isoformat(),) for day in reports]
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM entries WHERE date = ?", days)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO days (date, synced_at) VALUES (?, ?)",
+                [(day, synced_at) for day, in days],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (date, seq, position, type, duration, text)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (day.isoformat(), entry["seq"], position, entry["type"], entry["duration"], entry["text"])
+                    for day, entries in reports.items()
+                    for position, entry in enumerate(entries)
+                ],
+            )
+
+    def getReport(self, date: datetime) -> List[Dict[str, str]]:
+        """Read the mirrored entries of a day, in the same form as Session.getReport."""
+        return self.getReports(date, date).get(TimeHelper.toDate(date), [])
+
+    def getReports(
+        self, start: datetime, end: datetime, skip_empty: bool = False
+    ) -> Dict[Date, List[Dict[str, str]]]:
+        """Read the mirrored days from start to end (inclusive), like Session.getReports.
+        Days that were never synced are left out.
+        """
+        start, end = TimeHelper.toDate(start), TimeHelper.toDate(end)
+        with self._lock:
+            days = self._db.execute(
+                "SELECT date FROM days WHERE date BETWEEN ? AND ? ORDER BY date",
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+            rows = self._db.execute(
+                "SELECT date, seq, type, duration, text FROM entries"
+                " WHERE date BETWEEN ? AND ? ORDER BY date, position",
+                (start.isoformat(), end.isoformat()),
+            ).fetchall()
+
+        reports: Dict[Date, List[Dict[str, str]]] = {
+            TimeHelper.toDate(day): [] for day, in days
+        }
+        for day, seq, entry_type, duration, text in rows:
+            reports[TimeHelper.toDate(day)].append(
+                {"seq": seq, "type": entry_type, "duration": duration, "text": text}
+            )
+        if skip_empty:
+            reports = {day: entries for day, entries in reports.items() if entries}
+        return reports
@@ -0,0 +1,352 @@
+# Page parsing and form payloads shared by Session and AsyncSession
+
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+import importlib.util
+import urllib.parse
+import re
+
+# bs4 is imported by the first parse, not by importing this module
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+LOGIN_PATH = "/Login.aspx"
+PARSERS = ("lxml", "html.parser")
+
+# Only the elements a page is read for are built into a tree. The
+# SoupStrainer arguments by name, the strainers are built on first use.
+_TOKEN_IDS = ["__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION"]
+_STRAINERS = {
+    "tokens": (("input",), {"id": _TOKEN_IDS}),
+    "logout_link": ((), {"id": "Abmelden"}),
+    "week_tiles": (("div",), {"class_": "mo NBox"}),
+    "subjects": ((), {"id": "divSchulfach"}),
+    "report_entries": (("div",), {"class_": "d0 mo"}),
+}
+_strainers: Dict[str, object] = {}
+
+REPORT_FIELDS = ("seq", "type", "duration", "text")
+
+
+def available_parsers() -> List[str]:
+    """List the installed parser backends, fastest first."""
+    available = []
+    for name in PARSERS:
+        if name == "lxml" and importlib.util.find_spec("lxml") is None:
+            continue
+        available.append(name)
+    return available
+
+
+parser = available_parsers()[0]
+
+
+def set_parser(name: str) -> None:
+    """Select the parser backend used for all pages, e.g. "html.parser"."""
+    global parser
+    if name not in available_parsers():
+        raise ValueError(f"Parser {name!r} is not available.")
+    parser = name
+
+
+def _strainer(name: str):
+    """The SoupStrainer of _STRAINERS named name."""
+    strainer = _strainers.get(name)
+    if strainer is None:
+        from bs4 import SoupStrainer
+
+        args, kwargs = _STRAINERS[name]
+        strainer = _strainers[name] = SoupStrainer(*args, **kwargs)
+    return strainer
+
+
+def _soup(html, only: Optional[str] = None) -> "BeautifulSoup":
+    """Parse html, keeping only the elements of the strainer named only if given."""
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, parser, parse_only=_strainer(only) if only else None)
+
+STATIC_SUBJECTS = [
+    {"id": "1", "name": "Betrieb"},
+    {"id": "2", "name": "Schule"},
+    {"id": "3", "name": "ÜBA"},
+    {"id": "4", "name": "Urlaub"},
+    {"id": "5", "name": "Feiertag"},
+    {"id": "6", "name": "Arbeitsunfähig"},
+    {"id": "7", "name": "Frei"},
+]
+
+
+def has_logout_marker(html: str) -> bool:
+    """Check whether a page contains the logout link of a logged in user."""
+    if "Abmelden" not in html:
+        return False
+    return bool(_soup(html, "logout_link").find(id="Abmelden"))
+
+
+def is_login_page(urls: Iterable[str], html: str) -> bool:
+    """Check whether a response is the login page, i.e. the session expired.
+    - Parameters:
+        urls: The URLs of the response and of any redirects leading to it.
+        html: The response body.
+    """
+    if any(LOGIN_PATH in url for url in urls):
+        return True
+    return "txt_Benutzername" in html
+
+
+def extract_form_tokens(html: str) -> Dict[str, str]:
+    """Extract __VIEWSTATE, __VIEWSTATEGENERATOR, and __EVENTVALIDATION tokens from a page."""
+    soup = _soup(html, "tokens")
+    viewstate = soup.find(id="__VIEWSTATE")
+    viewstategenerator = soup.find(id="__VIEWSTATEGENERATOR")
+    eventvalidation = soup.find(id="__EVENTVALIDATION")
+    return {
+        "__VIEWSTATE": viewstate["value"] if viewstate else "",
+        "__VIEWSTATEGENERATOR": (
+            viewstategenerator["value"] if viewstategenerator else ""
+        ),
+        "__EVENTVALIDATION": eventvalidation["value"] if eventvalidation else "",
+    }
+
+
+def parse_week_rows(overview_html: str) -> List[Tuple[int, int, str, Optional[str]]]:
+    """Parse the week tiles of the report overview into (year, calendar week, id, status) rows."""
+    soup = _soup(overview_html, "week_tiles")
+    week_divs = soup.find_all("div", class_="mo NBox")
+
+    rows = []
+    for div in week_divs:
+        kw_div = None
+        year_div = None
+        if "onclick" in div.attrs:
+            kw_div = div.find("div", class_="sKW")
+            year_div_elements = div.find("div", class_="KW").find_all("div")
+            if len(year_div_elements) > 2:
+                year_div = year_div_elements[2]
+
+        if kw_div and year_div:
+            kw = int(kw_div.get_text(strip=True))
+            kw_year = int(year_div.get_text(strip=True))
+            status = " ".join(
+                child.get_text(" ", strip=True)
+                for child in div.find_all("div", recursive=False)
+                if not {"sKW", "KW"} & set(child.get("class", []))
+            ).strip()
+            rows.append((kw_year, kw, div["onclick"].split("'")[1].split("=")[1], status or None))
+    return rows
+
+
+def _weeks_from_rows(rows) -> Dict[Tuple[int, int], Dict[str, Optional[str]]]:
+    return {(year, week): {"id": week_id, "status": status} for year, week, week_id, status in rows}
+
+
+def parse_weeks(overview_html: str) -> Dict[Tuple[int, int], Dict[str, Optional[str]]]:
+    """Parse the week tiles of the report overview, keyed by (year, calendar week)."""
+    return _weeks_from_rows(parse_week_rows(overview_html))
+
+
+def parse_subjects(subject_setup_html: str) -> List[Dict[str, str]]:
+    """Parse the user-defined subjects of the subject setup page."""
+    soup = _soup(subject_setup_html, "subjects")
+    container = soup.find(id="divSchulfach")
+    if container is None:
+        return []
+    return [
+        {
+            "id": subject_element.get("data-default"),
+            "name": subject_element.get("value"),
+        }
+        for subject_element in container.find_all("input")
+    ]
+
+
+def parse_report_rows(report_html: str, include_formatting: bool = False) -> List[Tuple[str, ...]]:
+    """Parse the entries of a day report page into tuples of REPORT_FIELDS,
+    skipping empty (00:00) entries.
+    """
+    soup = _soup(report_html, "report_entries")
+
+    rows = []
+    entries = soup.find_all("div", class_="d0 mo")
+
+    for entry in entries:
+        duration = entry.find("div", class_="row2 d4").get_text(strip=True)
+        if duration.strip() == "00:00":
+            continue
+        activity_type = (
+            entry.find("div", class_="row1 d3")
+            .get_text(strip=True)
+            .replace("Art: ", "")
+        )
+        seq = entry.get("data-seq")
+
+        report_text_div = entry.find("div", class_="row7 d5")
+        if include_formatting:
+            from bs4 import NavigableString
+
+            report_text = "".join(
+                str(e)
+                for e in report_text_div.contents
+                if isinstance(e, NavigableString) or e.name == "div"
+            )
+            report_text = re.sub(r"<br\s*/?>", "\n", report_text)
+        else:
+            report_text = " ".join(report_text_div.stripped_strings)
+
+        rows.append((seq, activity_type, duration, report_text))
+    return rows
+
+
+def _report_from_rows(rows) -> List[Dict[str, str]]:
+    return [dict(zip(REPORT_FIELDS, row)) for row in rows]
+
+
+def parse_report(report_html: str, include_formatting: bool = False) -> List[Dict[str, str]]:
+    """Parse the entries of a day report page, skipping empty (00:00) entries."""
+    return _report_from_rows(parse_report_rows(report_html, include_formatting))
+
+
+def message_text(message: str) -> str:
+    """The text parse_report reads back for an entry written with message:
+    markup removed, entities resolved and whitespace collapsed. Use it to
+    compare messages to be written with parsed entries, see entry_key.
+    """
+    if "<" not in message and "&" not in message:
+        return " ".join(message.split())
+    return " ".join(_soup(entry_html(message)).stripped_strings)
+
+
+def entry_key(art_id, duration: str, text: str) -> Tuple[str, str, str]:
+    """What tells entries of a day apart: subject id, duration and text, ignoring
+    whitespace and how the duration is written.
+    """
+    hours, _, minutes = duration.strip().partition(":")
+    try:
+        duration = f"{int(hours):02d}:{int(minutes or 0):02d}"
+    except ValueError:
+        duration = duration.strip()
+    return (str(art_id), duration, " ".join(text.split()))
+
+
+def login_form(tokens: Dict[str, str], username: str, password: str) -> Dict[str, str]:
+    """Form data of the login page."""
+    return {
+        "__VIEWSTATE": tokens["__VIEWSTATE"],
+        "__VIEWSTATEGENERATOR": tokens["__VIEWSTATEGENERATOR"],
+        "__EVENTVALIDATION": tokens["__EVENTVALIDATION"],
+        "ctl00$ContentPlaceHolder1$txt_Benutzername": username,
+        "ctl00$ContentPlaceHolder1$txt_Passwort": password,
+        "ctl00$ContentPlaceHolder1$chk_Persistent": "on",
+        "ctl00$ContentPlaceHolder1$cmd_Login": "Anmelden",
+        "ctl00$ContentPlaceHolder1$HiddenField_isMobile": "false",
+    }
+
+
+def ajax_headers(base_url: str) -> Dict[str, str]:
+    """Headers the report editor sends with its XMLHttpRequest calls."""
+    return {
+        "x-my-ajax-request": "ajax",
+        "Origin": base_url,
+        "Referer": base_url,
+        "Sec-Fetch-Dest": "empty",
+        "Sec-Fetch-Mode": "cors",
+        "Sec-Fetch-Site": "same-origin",
+        "Pragma": "no-cache",
+        "Cache-Control": "no-cache",
+    }
+
+
+def entry_html(message: str) -> str:
+    """The HTML an entry is stored as, one div per line of message."""
+    return "<div>" + "</div><div>".join(message.split("\n")) + "</div>"
+
+
+def entry_form(message: str, time_spent: str, entry_type: int) -> Dict[str, str]:
+    """Form data adding a new entry to a day report."""
+    formatted_message = entry_html(message)
+    return {
+        "disablePaste": "0",
+        "Seq": "0",
+        "Art_ID": str(entry_type),
+        "Abt_ID": "0",
+        "Dauer": time_spent,
+        "Inhalt": urllib.parse.quote(formatted_message),
+        "jsVer": "12",
+    }
+
+
+def delete_entry_form(entry: Dict[str, str], art_id: Optional[str]) -> Dict[str, str]:
+    """Form data deleting a parsed entry of a day report."""
+    return {
+        "disablePaste": "0",
+        "Seq": f"-{entry['seq']}",
+        "Art_ID": art_id,
+        "Abt_ID": "0",
+        "Dauer": entry["duration"],
+        "Inhalt": entry["text"],
+        "jsVer": "12",
+    }
+
+
+# Parsers whose results are sent back from worker processes as plain tuples:
+# function -> (function returning rows, function building the result from rows)
+_COMPACT = {
+    parse_report: (parse_report_rows, _report_from_rows),
+    parse_weeks: (parse_week_rows, _weeks_from_rows),
+}
+
+
+def _parse_in_worker(parse: Callable, content: bytes, encoding: Optional[str], backend: str, args: tuple):
+    """Decode and parse a page in a worker process of a ParserPool."""
+    global parser
+    parser = backend
+    return parse(content.decode(encoding or "utf-8", "replace"), *args)
+
+
+class ParserPool:
+    """Parses pages on worker processes, so bulk reads are not limited to one core.
+
+    A Session given a pool hands the raw bytes of every fetched overview,
+    subject and day report page to a worker process. Reports and weeks come
+    back as tuples and are turned into the usual dicts by the session.
+    Pages smaller than min_size are cheaper to parse than to send to a
+    worker and are parsed in the calling thread. A pool may be shared
+    between sessions; close it, or use it as a context manager, when done.
+    """
+
+    def __init__(self, processes: Optional[int] = None, min_size: int = 4096):
+        """Initializes the pool.
+        - Parameters:
+            processes: Number of worker processes, defaults to the number of CPUs.
+            min_size: Pages with fewer bytes are parsed in the calling thread.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.min_size = min_size
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+
+    def __enter__(self) -> "ParserPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def parse(self, parse: Callable, content: bytes, encoding: Optional[str], *args):
+        """Parse a page with one of the parse functions of this module.
+        - Parameters:
+            parse: Parse function, e.g. parse_report.
+            content: The undecoded response body.
+            encoding: Encoding of content, utf-8 if unknown.
+            args: Further arguments of parse.
+        """
+        if len(content) < self.min_size:
+            return parse(content.decode(encoding or "utf-8", "replace"), *args)
+        worker_parse, build = _COMPACT.get(parse, (parse, None))
+        result = self._executor.submit(
+            _parse_in_worker, worker_parse, content, encoding, parser, args
+        ).result()
+        return build(result) if build else result
+
+    def close(self) -> None:
+        """Wait for running parses and stop the worker processes."""
+        self._executor.shutdown(wait=True)
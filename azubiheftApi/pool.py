@@ -0,0 +1,129 @@
+# Sessions for many accounts over one shared connection pool
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import threading
+import logging
+
+from .azubiheftApi import Session
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPool:
+    """Logged in sessions for many accounts.
+
+    All sessions share one Transport, so connections to azubiheft.de are
+    reused across accounts, and one semaphore that caps the number of requests
+    in flight over all accounts. Accounts are logged in on first use.
+    """
+
+    def __init__(
+        self,
+        accounts: Optional[Dict[str, Tuple[str, str]]] = None,
+        max_connections: int = 10,
+        max_in_flight: int = 8,
+        max_workers: int = 8,
+        transport: Optional[Transport] = None,
+        limiter=None,
+        **session_options,
+    ):
+        """Initializes the pool.
+        - Parameters:
+            accounts: Credentials (username, password) keyed by account id.
+            max_connections: Size of the shared connection pool.
+            max_in_flight: Maximum number of requests sent at the same time
+                over all accounts.
+            max_workers: Number of accounts map() works on in parallel.
+            transport: Shared transport, by default one with max_connections
+                connections that waits for a free connection.
+            limiter: Shared limiter of all sessions instead of the max_in_flight
+                semaphore, e.g. a RequestScheduler with rate limits.
+            session_options: Further keyword arguments for every Session.
+        """
+        self.transport = transport or Transport(pool_maxsize=max_connections, pool_block=True)
+        self.limiter = limiter or threading.BoundedSemaphore(max_in_flight)
+        self.max_workers = max_workers
+        self.session_options = session_options
+        self._accounts: Dict[str, Tuple[str, str]] = dict(accounts or {})
+        self._sessions: Dict[str, Session] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SessionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, account_id: str, username: str, password: str) -> None:
+        """Register the credentials of an account."""
+        with self._lock:
+            self._accounts[account_id] = (username, password)
+
+    @property
+    def account_ids(self):
+        return list(self._accounts)
+
+    def _new_session(self) -> Session:
+        return Session(transport=self.transport, limiter=self.limiter, **self.session_options)
+
+    def get(self, account_id: str) -> Session:
+        """Get the logged in session of an account, logging it in on first use."""
+        with self._lock:
+            if account_id not in self._accounts:
+                raise KeyError(f"Unknown account {account_id!r}.")
+            lock = self._locks.setdefault(account_id, threading.Lock())
+
+        with lock:
+            session = self._sessions.get(account_id)
+            if session is None or not session.isLoggedIn():
+                session = session or self._new_session()
+                session.login(*self._accounts[account_id])
+                self._sessions[account_id] = session
+            return session
+
+    def map(
+        self,
+        account_ids: Iterable[str],
+        fn: Callable[[Session], Any],
+        return_exceptions: bool = False,
+    ) -> Dict[str, Any]:
+        """Call fn with the session of every account, on up to max_workers threads.
+        - Parameters:
+            account_ids: Accounts to run fn for.
+            fn: Called with a logged in Session.
+            return_exceptions: Put an exception raised for one account into
+                the result instead of raising it.
+        - Returns:
+            The result of fn keyed by account id.
+        """
+        account_ids = list(account_ids)
+
+        def run(account_id: str) -> Any:
+            try:
+                return fn(self.get(account_id))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                logger.error(f"Operation failed for account {account_id}: {e}")
+                return e
+
+        if not account_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(account_ids))) as executor:
+            return dict(zip(account_ids, executor.map(run, account_ids)))
+
+    def close(self) -> None:
+        """Log out all sessions and close the shared connections."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            if session.isLoggedIn():
+                try:
+                    session.logout()
+                except Exception as e:
+                    logger.error(f"Logout failed: {e}")
+        self.transport.close()
@@ -0,0 +1,259 @@
+# Rate limiting and prioritisation of Session requests, see Session(limiter=RequestScheduler())
+
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import bisect
+import itertools
+import threading
+import time
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+# Priority of the requests of a Session method called directly by the user.
+# Methods called by other methods take the priority of the outermost one, so
+# the days read by getReports are background requests even though they are
+# read with getReport.
+DEFAULT_PRIORITIES = {
+    "login": INTERACTIVE,
+    "relogin": INTERACTIVE,
+    "logout": INTERACTIVE,
+    "isLoggedIn": INTERACTIVE,
+    "getReport": INTERACTIVE,
+    "writeReport": INTERACTIVE,
+    "deleteReport": INTERACTIVE,
+    "getReportWeekId": INTERACTIVE,
+    "getReports": BACKGROUND,
+    "iter_reports": BACKGROUND,
+    "writeReports": BACKGROUND,
+    "deleteReports": BACKGROUND,
+    "upsertReports": BACKGROUND,
+}
+
+
+class TokenBucket:
+    """Allows rate requests per second on average and bursts of up to burst requests.
+    Not thread-safe on its own, RequestScheduler guards it with its lock.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: Optional[float] = None, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """Spaces out the requests of one or more sessions and lets urgent ones go first.
+
+    Requests wait until a token is available in the global bucket and in the
+    bucket of their account, and, with max_in_flight, until fewer than that
+    many requests are running. Waiting requests are admitted by priority
+    class (INTERACTIVE before NORMAL before BACKGROUND), in arrival order
+    within a class. A request whose account has no token left does not hold
+    up the requests of other accounts.
+
+    Pass the scheduler as limiter to every Session (or SessionPool) that
+    should share the limits. Sessions take the priority of a request from
+    the Session method it belongs to, see DEFAULT_PRIORITIES.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        account_rate: Optional[float] = None,
+        account_burst: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        priorities: Optional[Dict[str, int]] = None,
+    ):
+        """Initializes the scheduler.
+        - Parameters:
+            rate: Requests per second over all accounts, None for no limit.
+            burst: Requests allowed at once after a pause, defaults to rate.
+            account_rate: Requests per second per account, None for no limit.
+            account_burst: Burst per account, defaults to account_rate.
+            max_in_flight: Maximum number of requests running at the same time.
+            priorities: Priority classes by Session method name, merged into
+                DEFAULT_PRIORITIES. Other methods are NORMAL.
+        """
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.max_in_flight = max_in_flight
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._account_buckets: Dict[Any, TokenBucket] = {}
+        self._condition = threading.Condition()
+        self._waiting: List[Tuple[int, int, Any]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        with self._condition:
+            self._admitted = {priority: 0 for priority in PRIORITY_NAMES}
+            self._wait_time = {priority: 0.0 for priority in PRIORITY_NAMES}
+            self._max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+            self._max_queue_depth = len(self._waiting)
+
+    def priority_of(self, operations: Sequence[str]) -> int:
+        """Priority class of a request made within the given operations, outermost first."""
+        return self.priorities.get(operations[0], NORMAL) if operations else NORMAL
+
+    def _account_bucket(self, account) -> Optional[TokenBucket]:
+        if not self.account_rate:
+            return None
+        bucket = self._account_buckets.get(account)
+        if bucket is None:
+            bucket = self._account_buckets[account] = TokenBucket(self.account_rate, self.account_burst)
+        return bucket
+
+    def _delay(self, account, now: float) -> Optional[float]:
+        """Seconds until a request of the account may start, None if it must wait for a slot."""
+        if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+            return None
+        delays = [0.0]
+        if self._bucket is not None:
+            delays.append(self._bucket.wait_time(now))
+        bucket = self._account_bucket(account)
+        if bucket is not None:
+            delays.append(bucket.wait_time(now))
+        return max(delays)
+
+    def acquire(self, account=None, priority: int = NORMAL) -> float:
+        """Wait until a request may be sent.
+        - Returns:
+            The seconds waited.
+        """
+        started = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._sequence), account)
+            bisect.insort(self._waiting, ticket)
+            self._max_queue_depth = max(self._max_queue_depth, len(self._waiting))
+            try:
+                while True:
+                    now = time.monotonic()
+                    timeout = None
+                    checked_accounts = set()
+                    for waiting in self._waiting:
+                        # Only the first waiting request of an account can be next
+                        if waiting[2] in checked_accounts:
+                            continue
+                        checked_accounts.add(waiting[2])
+                        delay = self._delay(waiting[2], now)
+                        if delay == 0.0:
+                            break
+                        if delay is not None:
+                            timeout = delay if timeout is None else min(timeout, delay)
+                    else:
+                        waiting = None
+                    if waiting is ticket:
+                        break
+                    if waiting is not None:
+                        # Another request goes first, let it know
+                        self._condition.notify_all()
+                    self._condition.wait(timeout)
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+                raise
+
+            self._waiting.remove(ticket)
+            if self._bucket is not None:
+                self._bucket.take(now)
+            bucket = self._account_bucket(account)
+            if bucket is not None:
+                bucket.take(now)
+            self._in_flight += 1
+            waited = now - started
+            self._admitted[priority] = self._admitted.get(priority, 0) + 1
+            self._wait_time[priority] = self._wait_time.get(priority, 0.0) + waited
+            self._max_wait[priority] = max(self._max_wait.get(priority, 0.0), waited)
+            self._condition.notify_all()
+        return waited
+
+    def release(self) -> None:
+        """Mark a request admitted by acquire as finished."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, account=None, operations: Sequence[str] = ()):
+        """Hold a request slot for the block, see Session.
+        - Parameters:
+            account: Account whose rate limit applies, e.g. the user name.
+            operations: The Session operations the request is made in, see
+                Instrumentation.current; they decide the priority.
+        """
+        self.acquire(account, self.priority_of(operations))
+        try:
+            yield
+        finally:
+            self.release()
+
+    def __enter__(self) -> "RequestScheduler":
+        # Used as a plain limiter: no account, NORMAL priority
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the queue.
+        - Returns:
+            "queue_depth": Requests waiting now, by priority class name.
+            "max_queue_depth": Most requests waiting at once since reset_stats.
+            "in_flight": Requests admitted and not yet finished.
+            "admitted", "wait_time", "max_wait": Requests admitted and the
+                seconds they waited in total and at most, by priority class name.
+        """
+        with self._condition:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._waiting:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+            return {
+                "queue_depth": depth,
+                "max_queue_depth": self._max_queue_depth,
+                "in_flight": self._in_flight,
+                "admitted": {PRIORITY_NAMES.get(p, str(p)): n for p, n in self._admitted.items()},
+                "wait_time": {PRIORITY_NAMES.get(p, str(p)): t for p, t in self._wait_time.items()},
+                "max_wait": {PRIORITY_NAMES.get(p, str(p)): t for p, t in self._max_wait.items()},
+            }
+
+    def to_prometheus(self, prefix: str = "azubiheft") -> str:
+        """Render the queue statistics in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = []
+        for name, kind, help_text, samples in [
+            ("scheduler_queue_depth", "gauge", "Requests waiting for a slot.", stats["queue_depth"]),
+            ("scheduler_admitted_total", "counter", "Requests admitted.", stats["admitted"]),
+            ("scheduler_wait_seconds_total", "counter", "Time requests waited.", stats["wait_time"]),
+        ]:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for priority, value in sorted(samples.items()):
+                lines.append(f'{prefix}_{name}{{priority="{priority}"}} {value}')
+        lines.append(f"# HELP {prefix}_scheduler_in_flight Requests being sent.")
+        lines.append(f"# TYPE {prefix}_scheduler_in_flight gauge")
+        lines.append(f"{prefix}_scheduler_in_flight {stats['in_flight']}")
+        return "\n".join(lines) + "\n"
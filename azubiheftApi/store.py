@@ -0,0 +1,86 @@
+# Persistent storage for login cookies, see Session.save and Session.load
+
+from typing import Any, Dict, Optional
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class FileSessionStore:
+    """Keeps saved sessions in a JSON file readable only by the current user."""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves half a file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".azubiheft-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def save(self, key: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            data = self._read()
+            data[key] = state
+            self._write(data)
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read().get(key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
+
+
+class SQLiteSessionStore:
+    """Keeps saved sessions in a SQLite database, e.g. shared by many worker processes."""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS sessions"
+            " (key TEXT PRIMARY KEY, state TEXT NOT NULL, saved_at REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> list:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                return db.execute(sql, parameters).fetchall()
+        finally:
+            db.close()
+
+    def save(self, key: str, state: Dict[str, Any]) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO sessions (key, state, saved_at) VALUES (?, ?, ?)",
+            (key, json.dumps(state), time.time()),
+        )
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT state FROM sessions WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def delete(self, key: str) -> None:
+        self._execute("DELETE FROM sessions WHERE key = ?", (key,))
@@ -0,0 +1,178 @@
+# Timeouts, retries and connection pooling for Session requests
+
+from typing import Callable, Optional
+import logging
+import random
+import socket
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from .errors import ConnectionFailedError, RequestTimeoutError, ServerError
+
+logger = logging.getLogger(__name__)
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive on its connections."""
+
+    def __init__(self, keepalive_interval: int = 30, **kwargs):
+        self.keepalive_interval = keepalive_interval
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        for name in ("TCP_KEEPIDLE", "TCP_KEEPINTVL"):
+            if hasattr(socket, name):
+                options.append((socket.IPPROTO_TCP, getattr(socket, name), self.keepalive_interval))
+        kwargs["socket_options"] = (
+            list(kwargs.get("socket_options") or [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)])
+            + options
+        )
+        super().init_poolmanager(*args, **kwargs)
+
+
+class Transport:
+    """How a Session sends its requests: timeouts, retries and the connection pool.
+
+    GET requests are retried on connection errors, timeouts and the statuses
+    in RETRY_STATUSES. Writes are only retried if they are idempotent (e.g.
+    deleting an entry) or if the connection could not be established, i.e.
+    the request never reached the server. Waits between attempts grow
+    exponentially with full jitter; a Retry-After sent by the server is waited
+    out in full, or the request fails right away if it asks for more than
+    max_retry_after. When all attempts fail, a TransportError is raised.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        max_retry_after: float = 60.0,
+        pool_connections: int = 1,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keepalive_interval: Optional[int] = 30,
+    ):
+        """Initializes the transport.
+        - Parameters:
+            connect_timeout: Seconds to wait for a connection.
+            read_timeout: Seconds to wait for the server to answer.
+            retries: Attempts after the first one.
+            backoff: Base wait in seconds, doubled on every retry.
+            max_backoff: Upper bound for a single wait in seconds.
+            max_retry_after: Longest Retry-After in seconds that is waited for
+                before retrying, longer ones raise the ServerError immediately.
+            pool_connections: Number of hosts to keep connection pools for.
+            pool_maxsize: Connections kept open per host.
+            pool_block: Wait for a free connection instead of opening extra ones.
+            keepalive_interval: Seconds between TCP keep-alive probes, None to
+                use the system defaults.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keepalive_interval = keepalive_interval
+        self.adapter = self.make_adapter()
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def make_adapter(self) -> HTTPAdapter:
+        """Create an adapter with the pool settings of this transport."""
+        options = dict(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=0,
+        )
+        if self.keepalive_interval is None:
+            return HTTPAdapter(**options)
+        return KeepAliveAdapter(self.keepalive_interval, **options)
+
+    def mount(self, session: requests.sessions.Session) -> None:
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+
+    def close(self) -> None:
+        self.adapter.close()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt (starting at 0)."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def send(
+        self,
+        send: Callable[..., requests.Response],
+        method: str,
+        url: str,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> requests.Response:
+        """Send a request with send (e.g. requests.Session.get), retrying where safe.
+        - Parameters:
+            send: Function sending the request.
+            method: HTTP method, decides whether the request is retried.
+            url: Request URL.
+            idempotent: Whether repeating the request is harmless, by default
+                only for GET requests.
+        """
+        if idempotent is None:
+            idempotent = method == "GET"
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            try:
+                response = send(url, **kwargs)
+            except requests.ConnectTimeout as e:
+                error = RequestTimeoutError(f"Connecting to {url} timed out: {e}")
+            except requests.Timeout as e:
+                if not idempotent:
+                    raise RequestTimeoutError(f"{method} {url} timed out: {e}") from e
+                error = RequestTimeoutError(f"{method} {url} timed out: {e}")
+            except requests.ConnectionError as e:
+                # Without a connection the request cannot have been processed
+                if not (idempotent or self._not_connected(e)):
+                    raise ConnectionFailedError(f"{method} {url} failed: {e}") from e
+                error = ConnectionFailedError(f"{method} {url} failed: {e}")
+            else:
+                if not (idempotent and response.status_code in self.RETRY_STATUSES):
+                    return response
+                error = ServerError(
+                    f"{method} {url} failed with status {response.status_code}",
+                    response.status_code,
+                )
+                retry_after = response.headers.get("Retry-After", "")
+
+            if attempt >= self.retries:
+                raise error
+            delay = self.backoff_delay(attempt)
+            if isinstance(error, ServerError) and retry_after.isdigit():
+                # Retrying earlier than asked only uses up the attempts
+                if float(retry_after) > self.max_retry_after:
+                    raise error
+                delay = max(delay, float(retry_after))
+            logger.warning(f"{error}, retrying in {delay:.2f}s.")
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _not_connected(error: requests.ConnectionError) -> bool:
+        """Check whether a connection error happened before anything was sent."""
+        reason = error.args[0] if error.args else None
+        return isinstance(getattr(reason, "reason", reason), NewConnectionError)
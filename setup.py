@@ -25,4 +25,11 @@ setuptools.setup(
         "beautifulsoup4",
         "requests",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "fast": ["lxml"],
+    },
+    entry_points={
+        "console_scripts": ["azubiheft=azubiheftApi.cli:main"],
+    },
 )
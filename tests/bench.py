@@ -0,0 +1,185 @@
+# Benchmarks of the main Session operations against the local fake server
+#
+#   python -m tests.bench [--latency 0.02] [--workers 4] [--page-size 16000] [--json]
+#   python -m tests.bench --import-time [--json]
+
+from datetime import date as Date
+from typing import Callable, Dict, List, NamedTuple, Optional
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+
+from azubiheftApi.azubiheftApi import Entry, Session, TimeHelper
+
+from tests.fake_server import FakeAzubiheft
+
+YEAR = TimeHelper.dateRange(Date(2024, 1, 1), Date(2024, 12, 31))
+WORKDAYS = [day for day in YEAR if day.weekday() < 5]
+DELETED_MONTH = [day for day in WORKDAYS if day.month == 3]
+
+# Most requests an operation may send, checked by the tests
+REQUEST_BUDGETS = {
+    # Login page, login form and the start page it redirects to
+    "login": 3,
+    # The report overview once, then one request per entry
+    "backfill": 1 + len(WORKDAYS),
+    "range_read": len(YEAR),
+    # Overview and subjects once, then the day and its single entry
+    "bulk_delete": 2 + 2 * len(DELETED_MONTH),
+}
+
+# Modules importing the package must not load, they are imported on first use.
+# Checked by the tests.
+LAZY_MODULES = ("requests", "bs4", "lxml", "sqlite3", "http.server", "concurrent.futures.process")
+
+_IMPORT_SCRIPT = """
+import json, logging, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - started, [m for m in {lazy!r} if m in sys.modules],
+                  len(logging.getLogger().handlers)]))
+"""
+
+
+class BenchResult(NamedTuple):
+    name: str
+    requests: int
+    wall_time: float
+    parse_time: float
+    bytes_received: int
+
+
+def measure(
+    server: FakeAzubiheft, session: Session, name: str, operation: Callable[[Session], None]
+) -> BenchResult:
+    """Run operation with session and count its requests on the server side."""
+    server.reset_stats()
+    session.instrumentation.reset()
+    started = time.perf_counter()
+    operation(session)
+    wall_time = time.perf_counter() - started
+    parse_time = session.stats()["totals"]["parse_time"]
+    return BenchResult(name, server.request_count(), wall_time, parse_time, server.bytes_sent)
+
+
+class ImportResult(NamedTuple):
+    module: str
+    import_time: float
+    loaded: List[str]
+    root_handlers: int
+
+
+def import_time(module: str = "azubiheftApi.azubiheftApi", runs: int = 5) -> ImportResult:
+    """Measure a cold import of module in fresh interpreters.
+    - Parameters:
+        module: Module to import.
+        runs: Number of interpreters started, the fastest import is reported.
+    - Returns:
+        The import time in seconds, the LAZY_MODULES the import loaded and the
+        number of handlers on the root logger afterwards.
+    """
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SCRIPT.format(module=module, lazy=LAZY_MODULES)],
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+        samples.append(json.loads(output))
+    seconds, loaded, root_handlers = min(samples)
+    return ImportResult(module, seconds, loaded, root_handlers)
+
+
+def run(
+    latency: float = 0.02,
+    max_workers: int = 4,
+    page_size: int = 16000,
+    scenarios: Optional[List[str]] = None,
+) -> List[BenchResult]:
+    """Run the benchmarks on a fresh fake server.
+    - Parameters:
+        latency: Seconds the server adds to every response.
+        max_workers: max_workers of the benchmarked sessions.
+        page_size: Approximate size of the served pages in bytes.
+        scenarios: Names of the benchmarks to report, by default all of
+            REQUEST_BUDGETS. The data of skipped benchmarks is still written.
+    - Returns:
+        One BenchResult per benchmark.
+    """
+    scenarios = scenarios or list(REQUEST_BUDGETS)
+    results = []
+    with FakeAzubiheft(latency=latency, page_size=page_size) as server:
+
+        def login(session: Session) -> None:
+            session.login("max", "secret")
+
+        def backfill(session: Session) -> None:
+            session.writeReports(
+                [Entry(day, f"Arbeit am {day:%d.%m.%Y}", "08:00", 1) for day in WORKDAYS]
+            )
+
+        def range_read(session: Session) -> None:
+            session.getReports(YEAR[0], YEAR[-1])
+
+        def bulk_delete(session: Session) -> None:
+            session.deleteReports(DELETED_MONTH[0], DELETED_MONTH[-1], skip_weekends=True)
+
+        operations: Dict[str, Callable[[Session], None]] = {
+            "login": login,
+            "backfill": backfill,
+            "range_read": range_read,
+            "bulk_delete": bulk_delete,
+        }
+        for name, operation in operations.items():
+            # Every benchmark starts with a fresh session and empty caches
+            session = Session(max_workers=max_workers, base_url=server.url)
+            if operation is not login:
+                login(session)
+            if name in scenarios:
+                results.append(measure(server, session, name, operation))
+            else:
+                operation(session)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark azubiheftApi against a local fake server.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response.")
+    parser.add_argument("--workers", type=int, default=4, help="max_workers of the sessions.")
+    parser.add_argument("--page-size", type=int, default=16000, help="Approximate page size in bytes.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    parser.add_argument("--import-time", action="store_true", help="Measure the import of the package instead.")
+    parser.add_argument("scenarios", nargs="*", help=f"Benchmarks to run: {', '.join(REQUEST_BUDGETS)}.")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(REQUEST_BUDGETS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    if args.import_time:
+        result = import_time()
+        if args.json:
+            print(json.dumps(result._asdict(), indent=2))
+            return
+        print(f"import {result.module}: {result.import_time * 1000:.1f} ms")
+        print(f"eagerly loaded: {', '.join(result.loaded) or 'none of ' + ', '.join(LAZY_MODULES)}")
+        return
+
+    logging.disable(logging.INFO)
+    results = run(args.latency, args.workers, args.page_size, args.scenarios or None)
+
+    if args.json:
+        print(json.dumps([result._asdict() for result in results], indent=2))
+        return
+    print(f"{'operation':<12} {'requests':>8} {'budget':>7} {'wall s':>8} {'parse s':>8} {'kB':>8}")
+    for result in results:
+        print(
+            f"{result.name:<12} {result.requests:>8} {REQUEST_BUDGETS[result.name]:>7}"
+            f" {result.wall_time:>8.3f} {result.parse_time:>8.3f} {result.bytes_received / 1000:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
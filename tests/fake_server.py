@@ -0,0 +1,460 @@
+# Local stand-in for azubiheft.de, used by the end-to-end tests and benchmarks
+
+from datetime import date as Date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Dict, Iterable, List, Optional, Tuple
+import base64
+import hashlib
+import html
+import random
+import secrets
+import threading
+import time
+import urllib.parse
+
+from azubiheftApi import parsing
+from azubiheftApi.azubiheftApi import TimeHelper
+
+AUTH_COOKIE = ".ASPXAUTH"
+
+LAYOUT = """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" lang="de">
+<head><meta charset="utf-8" /><meta name="viewport" content="width=device-width, initial-scale=1" />
+<title>{title} - Azubiheft</title>
+<link href="/Content/Site.css?v=12" rel="stylesheet" type="text/css" />
+<script src="/Scripts/jquery-3.6.0.min.js" type="text/javascript"></script>
+<script src="/Scripts/Azubiheft.js?v=12" type="text/javascript"></script>
+<script type="text/javascript">
+  var jsVer = 12; function go(url) {{ location.href = url; }}
+  if (window.innerWidth < 800) {{ document.documentElement.className += " mobile"; }}
+</script>
+</head>
+<body>
+<form method="post" action="{action}" id="form1">
+<div class="aspNetHidden">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+</div>
+<div class="aspNetHidden">
+<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="C2EE9ABB" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="/wEdAAVb7m1n3jC9iWQyF6sP2kDfMk3ZcR0b+Aq1g==" />
+</div>
+{menu}<div id="Inhalt"{content_class}>
+{content}
+</div>
+<div id="Fuss"><a href="/Impressum.aspx">Impressum</a> | <a href="/Datenschutz.aspx">Datenschutz</a></div>
+</form>
+</body>
+</html>
+"""
+
+MENU = """<div id="Kopf"><div class="Logo"><a href="/Azubi/Default.aspx">Azubiheft</a></div>
+<ul class="Menu">
+  <li><a href="/Azubi/Default.aspx">Start</a></li>
+  <li><a href="/Azubi/Ausbildungsnachweise.aspx">Ausbildungsnachweise</a></li>
+  <li><a href="/Azubi/SetupSchulfach.aspx">Schulfächer</a></li>
+  <li><a id="Abmelden" href="/Azubi/Abmelden.aspx">Abmelden</a></li>
+</ul></div>
+"""
+
+LOGIN_FORM = """<h1>Anmelden</h1>{error}
+<label for="ContentPlaceHolder1_txt_Benutzername">Benutzername</label>
+<input name="ctl00$ContentPlaceHolder1$txt_Benutzername" type="text" id="ContentPlaceHolder1_txt_Benutzername" />
+<label for="ContentPlaceHolder1_txt_Passwort">Passwort</label>
+<input name="ctl00$ContentPlaceHolder1$txt_Passwort" type="password" id="ContentPlaceHolder1_txt_Passwort" />
+<input id="ContentPlaceHolder1_chk_Persistent" type="checkbox" name="ctl00$ContentPlaceHolder1$chk_Persistent" /><label for="ContentPlaceHolder1_chk_Persistent">Angemeldet bleiben</label>
+<input type="hidden" name="ctl00$ContentPlaceHolder1$HiddenField_isMobile" id="ContentPlaceHolder1_HiddenField_isMobile" value="false" />
+<input type="submit" name="ctl00$ContentPlaceHolder1$cmd_Login" value="Anmelden" id="ContentPlaceHolder1_cmd_Login" />"""
+
+WEEK_TILE = """<div class="mo NBox" onclick="location.href='Wochenansicht.aspx?T={id}'">
+    <div class="sKW">{week}</div>
+    <div class="KW"><div>KW</div><div>{week}</div><div>{year}</div></div>{status}
+</div>"""
+
+REPORT_ENTRY = """<div class="d0 mo" data-seq="{seq}" onclick="EditEintrag({seq})">
+    <div class="row1 d3">Art: {type}</div>
+    <div class="row2 d4">{duration}</div>
+    <div class="row7 d5">{text}</div>
+</div>"""
+
+SUBJECT_INPUT = '<input name="ctl00$ContentPlaceHolder1$txt{id}" type="text" value="{name}" id="ContentPlaceHolder1_txt{id}" data-default="{id}" />'
+
+WEEKDAYS = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag", "Samstag", "Sonntag"]
+
+Response = Tuple[int, str, Dict[str, str]]
+
+
+def _parse_day(value: Optional[str]) -> Optional[Date]:
+    """Parse the Datum parameter (YYYYMMDD) of a request."""
+    try:
+        return datetime.strptime(value or "", "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+class FakeAzubiheft:
+    """An in-process HTTP server that behaves like the pages of azubiheft.de.
+
+    Serves login and logout, the start page, the report overview, day reports,
+    the subject setup and the XMLHttpRequest.ashx endpoint the report editor
+    writes through, for any number of accounts. Pages are padded to about
+    page_size bytes with view state, like the real ASP.NET pages, and every
+    request waits latency seconds before it is answered. All requests are
+    recorded in `requests` as (method, path) pairs.
+
+        with FakeAzubiheft() as server:
+            session = Session(base_url=server.url)
+            session.login("max", "secret")
+    """
+
+    def __init__(
+        self,
+        accounts: Optional[Dict[str, str]] = None,
+        latency: float = 0.0,
+        page_size: int = 16000,
+        first_day: Date = Date(2023, 8, 1),
+        last_day: Date = Date(2026, 7, 31),
+        subjects: Iterable[str] = ("Wirtschaftslehre", "Anwendungsentwicklung", "Deutsch"),
+        etags: bool = False,
+    ):
+        """Initializes the server state, call start() to serve it.
+        - Parameters:
+            accounts: Passwords keyed by username, by default max/secret.
+            latency: Seconds added to every response.
+            page_size: Approximate size of every HTML page in bytes.
+            first_day: First day of the apprenticeship, i.e. of the report weeks.
+            last_day: Last day of the report weeks.
+            subjects: Names of the user-defined subjects of every account.
+            etags: Send ETags with pages and answer matching conditional
+                requests with 304.
+        """
+        self.accounts = dict(accounts or {"max": "secret"})
+        self.latency = latency
+        self.page_size = page_size
+        self.etags = etags
+        self.requests: List[Tuple[str, str]] = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, str] = {}
+        self._next_subject_id = 8
+        self._subject_names = list(subjects)
+        self.subjects: Dict[str, Dict[str, str]] = {}
+        self.reports: Dict[str, Dict[Date, List[Dict[str, str]]]] = {}
+        self.weeks: Dict[Tuple[int, int], Dict[str, Optional[str]]] = {}
+        for account in self.accounts:
+            self._add_account_state(account)
+
+        monday = first_day - timedelta(days=first_day.weekday())
+        week_id = 48000
+        while monday <= last_day:
+            self.weeks[tuple(monday.isocalendar()[:2])] = {"id": str(week_id), "status": None}
+            week_id += 1
+            monday += timedelta(weeks=1)
+
+        rng = random.Random(0)
+        self._padding = base64.b64encode(bytes(rng.getrandbits(8) for _ in range(page_size))).decode()
+        self._server: Optional[HTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _add_account_state(self, username: str) -> None:
+        self.reports[username] = {}
+        self.subjects[username] = {}
+        for name in self._subject_names:
+            self.subjects[username][str(self._next_subject_id)] = name
+            self._next_subject_id += 1
+
+    # Server lifecycle
+
+    def start(self) -> "FakeAzubiheft":
+        self._server = _ThreadingServer(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> "FakeAzubiheft":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Inspection and manipulation from tests
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests = []
+            self.bytes_sent = 0
+
+    def request_count(self, path: Optional[str] = None, method: Optional[str] = None) -> int:
+        """Number of recorded requests, optionally only those to path and/or with method."""
+        with self._lock:
+            return sum(
+                1
+                for m, p in self.requests
+                if (path is None or p == path) and (method is None or m == method)
+            )
+
+    def expire_sessions(self) -> None:
+        """Invalidate every login, as the real site does after a while."""
+        with self._lock:
+            self._tokens.clear()
+
+    def add_entry(self, username: str, day: Date, art_id: str, duration: str, text: str) -> str:
+        """Add an entry directly, without a request. Returns its seq."""
+        with self._lock:
+            return self._add_entry(username, day, art_id, duration, text)
+
+    def entries(self, username: str, day: Date) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(entry) for entry in self.reports[username].get(day, [])]
+
+    # Pages
+
+    def _page(self, title: str, action: str, content: str, logged_in: bool = True) -> str:
+        page = LAYOUT.format(
+            title=title,
+            action=action,
+            viewstate="/wEPDwUKMTY1NDU2MTA1Mg" + "{padding}",
+            menu=MENU if logged_in else "",
+            content_class="" if logged_in else ' class="Login"',
+            content=content,
+        )
+        # The view state makes up the difference to page_size
+        padding = max(0, self.page_size - len(page))
+        return page.replace("{padding}", self._padding[:padding])
+
+    def login_page(self, error: bool = False) -> str:
+        message = '\n<div class="Fehler">Benutzername oder Passwort falsch.</div>' if error else ""
+        return self._page("Anmelden", "./Login.aspx", LOGIN_FORM.format(error=message), logged_in=False)
+
+    def default_page(self, username: str) -> str:
+        content = (
+            f"<h1>Willkommen, {html.escape(username)}</h1>\n"
+            '<div class="Box">Ausbildungsberuf: Fachinformatiker für Anwendungsentwicklung</div>'
+        )
+        return self._page("Start", "./Default.aspx", content)
+
+    def overview_page(self) -> str:
+        tiles = [
+            WEEK_TILE.format(
+                id=week["id"],
+                week=week_number,
+                year=year,
+                status=f'\n    <div class="Status">{week["status"]}</div>' if week["status"] else "",
+            )
+            for (year, week_number), week in sorted(self.weeks.items(), reverse=True)
+        ]
+        tiles.append('<div class="mo NBox NeuBox"><div class="sKW">+</div><div class="KW"><div>Neuer</div><div>Nachweis</div></div></div>')
+        content = '<h1>Ausbildungsnachweise</h1>\n<div class="NBoxen">\n' + "\n".join(tiles) + "\n</div>"
+        return self._page("Ausbildungsnachweise", "./Ausbildungsnachweise.aspx", content)
+
+    def report_page(self, username: str, day: Date) -> str:
+        names = self._subject_names_of(username)
+        entries = [
+            REPORT_ENTRY.format(
+                seq=entry["seq"],
+                type=html.escape(names.get(entry["art_id"], "")),
+                duration=entry["duration"],
+                text=entry["text"],
+            )
+            for entry in self.reports[username].get(day, [])
+        ]
+        content = (
+            f"<h1>Tagesbericht {WEEKDAYS[day.weekday()]}, {day.strftime('%d.%m.%Y')}</h1>\n"
+            '<div class="Tag">\n' + "\n".join(entries) + "\n</div>"
+        )
+        return self._page("Tagesbericht", f"./Tagesbericht.aspx?Datum={TimeHelper.dateTimeToString(day)}", content)
+
+    def setup_page(self, username: str) -> str:
+        inputs = [
+            SUBJECT_INPUT.format(id=subject_id, name=html.escape(name))
+            for subject_id, name in self.subjects[username].items()
+        ]
+        content = (
+            '<h1>Schulfächer</h1>\n<div id="divSchulfach">\n' + "\n".join(inputs) + "\n</div>\n"
+            '<input type="hidden" name="ctl00$ContentPlaceHolder1$HiddenLöschIDs" id="ContentPlaceHolder1_HiddenLöschIDs" />\n'
+            '<input type="submit" name="ctl00$ContentPlaceHolder1$cmd_Save" value="Speichern" id="ContentPlaceHolder1_cmd_Save" />'
+        )
+        return self._page("Schulfächer", "./SetupSchulfach.aspx", content)
+
+    # State changes, called with the lock held
+
+    def _subject_names_of(self, username: str) -> Dict[str, str]:
+        names = {subject["id"]: subject["name"] for subject in parsing.STATIC_SUBJECTS}
+        names.update(self.subjects[username])
+        return names
+
+    def _add_entry(self, username: str, day: Date, art_id: str, duration: str, text: str) -> str:
+        entries = self.reports[username].setdefault(day, [])
+        seq = str(max((int(entry["seq"]) for entry in entries), default=0) + 1)
+        hours, _, minutes = duration.partition(":")
+        entries.append(
+            {
+                "seq": seq,
+                "art_id": art_id,
+                "duration": f"{int(hours):02d}:{int(minutes or 0):02d}",
+                "text": text,
+            }
+        )
+        return seq
+
+    def _save_entry(self, username: str, query: Dict[str, str], form: Dict[str, str]) -> int:
+        """Handle a report editor request, returning the status code."""
+        day = _parse_day(query.get("Datum"))
+        week = self.weeks.get(tuple(day.isocalendar()[:2])) if day else None
+        if week is None or week["id"] != query.get("BrNr"):
+            return 400
+
+        seq = form.get("Seq", "0")
+        if seq.startswith("-"):
+            # Deleting an entry that is already gone succeeds, like on the real site
+            entries = self.reports[username].get(day, [])
+            entries[:] = [entry for entry in entries if entry["seq"] != seq[1:]]
+            return 200
+        if form.get("Art_ID") not in self._subject_names_of(username):
+            return 400
+        text = urllib.parse.unquote(form.get("Inhalt", ""))
+        if seq == "0":
+            self._add_entry(username, day, form["Art_ID"], form.get("Dauer", "00:00"), text)
+            return 200
+        for entry in self.reports[username].get(day, []):
+            if entry["seq"] == seq:
+                entry.update(art_id=form["Art_ID"], duration=form.get("Dauer", "00:00"), text=text)
+                return 200
+        return 400
+
+    def _save_subjects(self, username: str, form: Dict[str, str]) -> None:
+        subjects = self.subjects[username]
+        prefix = "ctl00$ContentPlaceHolder1$txt"
+        deleted = form.get("ctl00$ContentPlaceHolder1$HiddenLöschIDs", "").split(",")
+        for subject_id in deleted:
+            subjects.pop(subject_id, None)
+        for key, value in form.items():
+            if key.startswith(prefix) and key[len(prefix):] in subjects:
+                subjects[key[len(prefix):]] = value
+            elif key.startswith("txt") and value:
+                subjects[str(self._next_subject_id)] = value
+                self._next_subject_id += 1
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    fake: FakeAzubiheft
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: _ThreadingServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def _handle(self, method: str) -> None:
+        fake = self.server.fake
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        form = dict(urllib.parse.parse_qsl(body, keep_blank_values=True))
+
+        if fake.latency:
+            time.sleep(fake.latency)
+        with fake._lock:
+            fake.requests.append((method, url.path))
+            username = fake._tokens.get(self._auth_token())
+            status, text, headers = self._route(fake, method, url.path, query, form, username)
+            body = text.encode("utf-8")
+            if fake.etags and method == "GET" and status == 200:
+                headers["ETag"] = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    status, body = 304, b""
+            fake.bytes_sent += len(body)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _auth_token(self) -> str:
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == AUTH_COOKIE:
+                return value
+        return ""
+
+    def _route(self, fake, method, path, query, form, username) -> Response:
+        if path == "/Login.aspx":
+            if method == "GET":
+                return self._page_response(200, fake.login_page())
+            username = form.get("ctl00$ContentPlaceHolder1$txt_Benutzername")
+            password = form.get("ctl00$ContentPlaceHolder1$txt_Passwort")
+            if not form.get("__VIEWSTATE") or fake.accounts.get(username) != password:
+                return self._page_response(200, fake.login_page(error=True))
+            token = secrets.token_hex(16)
+            fake._tokens[token] = username
+            if username not in fake.reports:
+                fake._add_account_state(username)
+            return self._redirect(
+                "/Azubi/Default.aspx", cookie=f"{AUTH_COOKIE}={token}; path=/; HttpOnly"
+            )
+
+        if not path.startswith("/Azubi/"):
+            return self._page_response(404, "Not found")
+        if username is None:
+            return self._redirect(
+                "/Login.aspx?ReturnUrl=" + urllib.parse.quote(path, safe="")
+            )
+
+        if path == "/Azubi/Abmelden.aspx":
+            fake._tokens.pop(self._auth_token(), None)
+            return self._redirect("/Login.aspx", cookie=f"{AUTH_COOKIE}=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT")
+        if path == "/Azubi/Default.aspx":
+            return self._page_response(200, fake.default_page(username))
+        if path == "/Azubi/Ausbildungsnachweise.aspx":
+            return self._page_response(200, fake.overview_page())
+        if path == "/Azubi/Tagesbericht.aspx":
+            day = _parse_day(query.get("Datum"))
+            if day is None:
+                return self._page_response(400, "Bad request")
+            return self._page_response(200, fake.report_page(username, day))
+        if path == "/Azubi/SetupSchulfach.aspx":
+            if method == "POST":
+                fake._save_subjects(username, form)
+            return self._page_response(200, fake.setup_page(username))
+        if path == "/Azubi/XMLHttpRequest.ashx" and method == "POST":
+            status = fake._save_entry(username, query, form)
+            return self._page_response(status, "OK" if status == 200 else "Fehler")
+        return self._page_response(404, "Not found")
+
+    @staticmethod
+    def _page_response(status: int, text: str) -> Response:
+        return status, text, {}
+
+    @staticmethod
+    def _redirect(location: str, cookie: Optional[str] = None) -> Response:
+        headers = {"Location": location}
+        if cookie:
+            headers["Set-Cookie"] = cookie
+        return 302, "", headers
@@ -1,8 +1,9 @@
+import itertools
 import unittest
 from unittest.mock import patch, MagicMock
-from datetime import datetime, timedelta
-from azubiheftApi.azubiheftApi import Session, Entry, TimeHelper
-from azubiheftApi.errors import AuthError, ValueTooLargeError, NotLoggedInError
+from datetime import date, datetime, timedelta
+from azubiheftApi.azubiheftApi import Session, Entry, Report, ReportEntry, TimeHelper
+from azubiheftApi.errors import AuthError, HTTPStatusError, ValueTooLargeError, NotLoggedInError
 
 
 class TestTimeHelper(unittest.TestCase):
@@ -10,10 +11,35 @@ class TestTimeHelper(unittest.TestCase):
         date = datetime(2024, 5, 10)
         self.assertEqual(TimeHelper.dateTimeToString(date), "20240510")
 
+    def test_dateRange(self):
+        days = TimeHelper.dateRange(datetime(2024, 5, 10), datetime(2024, 5, 14))
+        self.assertEqual(days[0], date(2024, 5, 10))
+        self.assertEqual(len(days), 5)
+        self.assertEqual(
+            TimeHelper.dateRange(date(2024, 5, 10), date(2024, 5, 14), skip_weekends=True),
+            [date(2024, 5, 10), date(2024, 5, 13), date(2024, 5, 14)],
+        )
+        self.assertEqual(TimeHelper.dateRange(date(2024, 5, 14), date(2024, 5, 10)), [])
+
+    def test_toDate(self):
+        self.assertEqual(TimeHelper.toDate(datetime(2024, 5, 10, 12)), date(2024, 5, 10))
+        self.assertEqual(TimeHelper.toDate("2024-05-10"), date(2024, 5, 10))
+        self.assertEqual(TimeHelper.toDate(date(2024, 5, 10)), date(2024, 5, 10))
+
+    def test_isoWeekStart(self):
+        self.assertEqual(TimeHelper.isoWeekStart(2024, 19), date(2024, 5, 6))
+        self.assertEqual(TimeHelper.isoWeekStart(2021, 1), date(2021, 1, 4))
+        self.assertEqual(TimeHelper.isoWeekStart(2020, 53), date(2020, 12, 28))
+
     def test_getActualTimestamp(self):
         with patch("time.time", return_value=1657890000):
             self.assertEqual(TimeHelper.getActualTimestamp(), "1657890000")
 
+    def test_durations(self):
+        self.assertEqual(TimeHelper.parseDuration("04:30"), timedelta(hours=4, minutes=30))
+        self.assertEqual(TimeHelper.parseDuration("2:00"), timedelta(hours=2))
+        self.assertEqual(TimeHelper.durationToString(timedelta(hours=4, minutes=30)), "04:30")
+
     def test_timeDeltaToString(self):
         time_delta = timedelta(hours=10, minutes=30)
         self.assertEqual(TimeHelper.timeDeltaToString(time_delta), "10:30")
@@ -32,10 +58,13 @@ class TestSession(unittest.TestCase):
         mock_requests.return_value = mock_session
         mock_session.get.return_value.text = '<input id="__VIEWSTATE" value="state" /><input id="__VIEWSTATEGENERATOR" value="generator" /><input id="__EVENTVALIDATION" value="validation" />'
         mock_session.post.return_value.status_code = 200
-        mock_session.get.return_value.text = '<div id="Abmelden"></div>'
+        mock_session.post.return_value.text = '<div id="Abmelden"></div>'
 
         self.session.login("username", "password")
         self.assertTrue(self.session.isLoggedIn())
+        # Login page and login POST only, the state is tracked locally
+        self.assertEqual(mock_session.get.call_count, 1)
+        self.assertEqual(mock_session.post.call_count, 1)
 
     @patch("requests.session")
     def test_login_failure(self, mock_requests):
@@ -43,7 +72,7 @@ class TestSession(unittest.TestCase):
         mock_requests.return_value = mock_session
         mock_session.get.return_value.text = '<input id="__VIEWSTATE" value="state" /><input id="__VIEWSTATEGENERATOR" value="generator" /><input id="__EVENTVALIDATION" value="validation" />'
         mock_session.post.return_value.status_code = 200
-        mock_session.get.return_value.text = ""
+        mock_session.post.return_value.text = ""
 
         with self.assertRaises(AuthError):
             self.session.login("username", "password")
@@ -72,17 +101,58 @@ class TestSession(unittest.TestCase):
         mock_session.get.return_value.text = '<div id="Abmelden"></div>'
 
         self.session.session = mock_session
+        self.assertFalse(self.session.isLoggedIn())
+        self.assertTrue(self.session.isLoggedIn(verify=True))
         self.assertTrue(self.session.isLoggedIn())
 
         mock_session.get.return_value.text = ""
+        self.assertFalse(self.session.isLoggedIn(verify=True))
         self.assertFalse(self.session.isLoggedIn())
 
+    def test_expired_session_raises(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value = MagicMock(
+            url="https://www.azubiheft.de/Login.aspx?ReturnUrl=%2fAzubi%2fTagesbericht.aspx",
+            text="",
+        )
+        self.session.session = mock_session
+        self.session._logged_in = True
+
+        with self.assertRaises(NotLoggedInError):
+            self.session.getReport(datetime(2024, 5, 10))
+        self.assertFalse(self.session.isLoggedIn())
+
+    @patch("requests.session")
+    def test_expired_session_relogin(self, mock_requests):
+        login_page = '<input id="__VIEWSTATE" value="state" />'
+        report_page = '<div class="d0 mo"><div class="row2 d4">01:00</div><div class="row1 d3">Art: Work</div><div class="row7 d5">Did some work</div></div>'
+        expired = MagicMock(url="https://www.azubiheft.de/Login.aspx", text=login_page)
+
+        first, second = MagicMock(), MagicMock()
+        mock_requests.side_effect = [first, second]
+        for mock_session in (first, second):
+            mock_session.post.return_value.text = '<div id="Abmelden"></div>'
+        first.get.side_effect = [MagicMock(text=login_page), expired]
+        second.get.side_effect = [
+            MagicMock(text=login_page),
+            MagicMock(url="https://www.azubiheft.de/Azubi/Tagesbericht.aspx", text=report_page),
+        ]
+
+        session = Session(auto_relogin=True)
+        session.login("username", "password")
+        reports = session.getReport(datetime(2024, 5, 10))
+
+        self.assertEqual(len(reports), 1)
+        self.assertIs(session.session, second)
+        self.assertTrue(session.isLoggedIn())
+
     @patch("requests.session")
     def test_add_subject(self, mock_requests):
         mock_session = MagicMock()
         mock_requests.return_value = mock_session
         mock_session.get.return_value.text = '<input id="__VIEWSTATE" value="state" /><input id="__VIEWSTATEGENERATOR" value="generator" /><input id="__EVENTVALIDATION" value="validation" />'
         mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.text = ""
 
         self.session.session = mock_session
         self.session.isLoggedIn = MagicMock(return_value=True)
@@ -97,12 +167,18 @@ class TestSession(unittest.TestCase):
         mock_requests.return_value = mock_session
         mock_session.get.return_value.text = '<input id="__VIEWSTATE" value="state" /><input id="__VIEWSTATEGENERATOR" value="generator" /><input id="__EVENTVALIDATION" value="validation" />'
         mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.text = ""
 
         self.session.session = mock_session
         self.session.isLoggedIn = MagicMock(return_value=True)
         self.session.getSubjects = MagicMock(return_value=[{"id": "1", "name": "Math"}])
 
-        self.session.delete_subject("1")
+        with self.assertRaises(ValueError):
+            self.session.delete_subject("1")
+        self.assertFalse(mock_session.post.called)
+
+        mock_session.get.return_value.text += '<div id="divSchulfach"><input data-default="8" value="Math" /></div>'
+        self.session.delete_subject("8")
         self.assertTrue(mock_session.post.called)
 
     @patch("requests.session")
@@ -128,6 +204,54 @@ class TestSession(unittest.TestCase):
         week_id = self.session.getReportWeekId(datetime(2024, 5, 10))
         self.assertEqual(week_id, "19")
 
+    def test_getReportWeekId_uses_week_index(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value.text = """
+        <div class="mo NBox" onclick="location.href='?week_id=19'">
+            <div class="sKW">19</div>
+            <div class="KW"><div></div><div></div><div>2024</div></div>
+            <div class="Status">Abgegeben</div>
+        </div>
+        <div class="mo NBox" onclick="location.href='?week_id=20'">
+            <div class="sKW">20</div>
+            <div class="KW"><div></div><div></div><div>2024</div></div>
+        </div>
+        """
+
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        self.assertEqual(self.session.getReportWeekId(datetime(2024, 5, 10)), "19")
+        self.assertEqual(self.session.getReportWeekId(datetime(2024, 5, 13)), "20")
+        self.assertEqual(mock_session.get.call_count, 1)
+        self.assertEqual(
+            self.session.getWeeks(),
+            {
+                (2024, 19): {"id": "19", "status": "Abgegeben"},
+                (2024, 20): {"id": "20", "status": None},
+            },
+        )
+
+        # A miss refreshes the cached overview once before giving up
+        with self.assertRaises(ValueError):
+            self.session.getReportWeekId(datetime(2024, 6, 10))
+        self.assertEqual(mock_session.get.call_count, 2)
+
+    def test_getWeeks_ttl(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value.text = ""
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+        self.session.week_cache_ttl = 60
+
+        with patch("time.monotonic", return_value=1000):
+            self.session.getWeeks()
+            self.session.getWeeks()
+        self.assertEqual(mock_session.get.call_count, 1)
+        with patch("time.monotonic", return_value=1061):
+            self.session.getWeeks()
+        self.assertEqual(mock_session.get.call_count, 2)
+
     @patch("requests.session")
     def test_getSubjects(self, mock_requests):
         mock_session = MagicMock()
@@ -142,11 +266,47 @@ class TestSession(unittest.TestCase):
         subjects = self.session.getSubjects()
         self.assertIn({"id": "8", "name": "Extra"}, subjects)
 
+    def test_subject_catalog(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value.text = (
+            '<div id="divSchulfach"><input data-default="8" value="Mathematik" />'
+            '<input data-default="9" value="Wirtschafts  Lehre" /></div>'
+        )
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        self.assertEqual(self.session.get_art_id_from_text("Mathematik"), "8")
+        self.assertEqual(self.session.get_art_id_from_text("wirtschafts lehre"), "9")
+        self.assertEqual(self.session.get_art_id_from_text("Mathe"), "8")
+        self.assertEqual(self.session.get_art_id_from_text("Betrieb"), "1")
+        self.assertIsNone(self.session.get_art_id_from_text("Sport"))
+        self.assertEqual(mock_session.get.call_count, 1)
+
+    def test_subject_catalog_follows_changes(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value.text = (
+            '<div id="divSchulfach"><input data-default="8" value="Mathematik" /></div>'
+        )
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.text = ""
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        self.session.getSubjects()
+        self.session.delete_subject("8")
+        self.assertIsNone(self.session.get_art_id_from_text("Mathematik"))
+
+        self.session.add_subject("Physik")
+        calls = mock_session.get.call_count
+        self.session.getSubjects()
+        self.assertEqual(mock_session.get.call_count, calls + 1)
+
     @patch("requests.session")
     def test_writeReports(self, mock_requests):
         mock_session = MagicMock()
         mock_requests.return_value = mock_session
         mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.text = ""
 
         self.session.session = mock_session
         self.session.isLoggedIn = MagicMock(return_value=True)
@@ -156,6 +316,62 @@ class TestSession(unittest.TestCase):
         self.session.writeReports([entry])
         self.assertTrue(mock_session.post.called)
 
+    def test_writeReports_missing_week(self):
+        mock_session = MagicMock()
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.text = ""
+
+        def week_id(date):
+            if date.isocalendar()[1] == 21:
+                raise ValueError("No report found for the specified week.")
+            return "19"
+
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+        self.session.getReportWeekId = MagicMock(side_effect=week_id)
+
+        entries = [
+            Entry(datetime(2024, 5, 17), "Friday", "01:00", 1),
+            Entry(datetime(2024, 5, 20), "Monday", "01:00", 1),
+            Entry(datetime(2024, 5, 21), "Tuesday", "01:00", 1),
+        ]
+        results = self.session.writeReports(entries)
+
+        self.assertEqual([result.ok for result in results], [True, False, False])
+        self.assertEqual(results[1].status_code, None)
+        self.assertEqual(results[1].error, "No report found for the specified week.")
+        # Looked up once, only the entry of the known week was sent
+        self.assertEqual(self.session.getReportWeekId.call_count, 2)
+        self.assertEqual(mock_session.post.call_count, 1)
+
+    def test_writeReports_batch(self):
+        mock_session = MagicMock()
+        mock_session.post.side_effect = lambda url, **kwargs: MagicMock(
+            status_code=500 if "Datum=20240514" in url else 200, text=""
+        )
+
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+        self.session.getReportWeekId = MagicMock(side_effect=lambda date: str(date.isocalendar()[1]))
+
+        entries = [
+            Entry(datetime(2024, 5, 13) + timedelta(days=day), f"Day {day}", "01:00", 1)
+            for day in range(5)
+            for _ in range(2)
+        ]
+        results = self.session.writeReports(entries, max_workers=3)
+
+        # One week id lookup for the whole week, one POST per entry
+        self.assertEqual(self.session.getReportWeekId.call_count, 1)
+        self.assertEqual(mock_session.post.call_count, 10)
+        self.assertEqual([result.entry for result in results], entries)
+        self.assertEqual(
+            [result.ok for result in results],
+            [True, True, False, False, True, True, True, True, True, True],
+        )
+        self.assertEqual(results[2].status_code, 500)
+        self.assertTrue(all(result.latency >= 0 for result in results))
+
     @patch("requests.session")
     def test_getReport(self, mock_requests):
         mock_session = MagicMock()
@@ -169,6 +385,93 @@ class TestSession(unittest.TestCase):
         self.assertEqual(len(reports), 1)
         self.assertEqual(reports[0]["type"], "Work")
 
+    def test_getReport_records(self):
+        mock_session = MagicMock()
+        mock_session.get.side_effect = lambda url, **kwargs: MagicMock(
+            text='<div id="divSchulfach"><input data-default="8" value="Wirtschaftslehre"/></div>'
+            if "SetupSchulfach" in url
+            else '<div class="d0 mo" data-seq="3"><div class="row2 d4">01:30</div><div class="row1 d3">Art: Wirtschaftslehre</div><div class="row7 d5">Kaufvertrag</div></div>'
+            '<div class="d0 mo" data-seq="4"><div class="row2 d4">06:00</div><div class="row1 d3">Art: Betrieb</div><div class="row7 d5">Tests</div></div>'
+        )
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        report = self.session.getReport(datetime(2024, 5, 10), records=True)
+        self.assertIsInstance(report, Report)
+        self.assertEqual(report.date, date(2024, 5, 10))
+        self.assertEqual(report.duration, timedelta(hours=7, minutes=30))
+        first = report.entries[0]
+        self.assertEqual(
+            first,
+            ReportEntry(date(2024, 5, 10), 3, 8, "Wirtschaftslehre", timedelta(hours=1, minutes=30), "Kaufvertrag"),
+        )
+        self.assertFalse(hasattr(first, "__dict__"))
+        with self.assertRaises(AttributeError):
+            first.text = "changed"
+
+        # The records convert to and from the default dict output
+        self.assertEqual(report.to_dict(), self.session.getReport(datetime(2024, 5, 10)))
+        self.assertEqual(Report.from_dict(report.to_dict(), report.date, self.session.get_art_id_from_text), report)
+
+        reports = self.session.getReports(date(2024, 5, 10), date(2024, 5, 11), records=True, skip_empty=True)
+        self.assertEqual(list(reports), [date(2024, 5, 10), date(2024, 5, 11)])
+
+    def test_entry_slots(self):
+        entry = Entry(datetime(2024, 5, 10), "Tests", "02:00", 1)
+        self.assertFalse(hasattr(entry, "__dict__"))
+
+    def test_getReports(self):
+        report = '<div class="d0 mo"><div class="row2 d4">01:00</div><div class="row1 d3">Art: Work</div><div class="row7 d5">Did some work</div></div>'
+        mock_session = MagicMock()
+        mock_session.get.side_effect = lambda url, **kwargs: MagicMock(
+            text="" if "Datum=20240513" in url else report
+        )
+
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        reports = self.session.getReports(
+            datetime(2024, 5, 10), datetime(2024, 5, 14), max_workers=3, skip_weekends=True
+        )
+        self.assertEqual(list(reports), [date(2024, 5, 10), date(2024, 5, 13), date(2024, 5, 14)])
+        self.assertEqual(reports[date(2024, 5, 10)][0]["type"], "Work")
+        self.assertEqual(reports[date(2024, 5, 13)], [])
+        self.assertEqual(mock_session.get.call_count, 3)
+
+        reports = self.session.getReports(
+            datetime(2024, 5, 10), datetime(2024, 5, 14), skip_weekends=True, skip_empty=True
+        )
+        self.assertEqual(list(reports), [date(2024, 5, 10), date(2024, 5, 14)])
+
+    def test_iter_reports(self):
+        report = '<div class="d0 mo"><div class="row2 d4">01:00</div><div class="row1 d3">Art: Work</div><div class="row7 d5">Did some work</div></div>'
+        mock_session = MagicMock()
+        mock_session.get.side_effect = lambda url, **kwargs: MagicMock(text=report)
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        reports = self.session.iter_reports(
+            date(2024, 1, 1), date(2024, 12, 31), prefetch=2, max_workers=2
+        )
+        first = [day for day, entries in itertools.islice(reports, 3)]
+        self.assertEqual(first, [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)])
+        # Only the read-ahead window was requested, closing cancels the rest
+        reports.close()
+        self.assertLessEqual(mock_session.get.call_count, 5)
+
+        days = list(self.session.iter_reports(date(2024, 5, 10), date(2024, 5, 14), skip_weekends=True))
+        self.assertEqual([day for day, _ in days], [date(2024, 5, 10), date(2024, 5, 13), date(2024, 5, 14)])
+        self.assertEqual(days[0][1][0]["text"], "Did some work")
+
+    def test_iter_reports_error(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value = MagicMock(ok=False, status_code=404, text="")
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+        with self.assertRaises(HTTPStatusError):
+            list(self.session.iter_reports(date(2024, 5, 10), date(2024, 5, 14)))
+
     @patch("requests.session")
     def test_deleteReport(self, mock_requests):
         mock_session = MagicMock()
@@ -178,6 +481,7 @@ class TestSession(unittest.TestCase):
         mock_session.get.return_value.text = '<html><div id="divSchulfach"><input data-default="1" value="Math" /></div></html>'
 
         mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.text = ""
 
         self.session.session = mock_session
         self.session.isLoggedIn = MagicMock(return_value=True)
@@ -196,6 +500,92 @@ class TestSession(unittest.TestCase):
         self.session.deleteReport(datetime(2024, 5, 10), 1)
         self.assertTrue(mock_session.post.called)
 
+    @patch("time.sleep")
+    def test_deleteReport_results(self, mock_sleep):
+        mock_session = MagicMock()
+        mock_session.get.return_value.text = '<div id="divSchulfach"></div>'
+        mock_session.post.return_value.status_code = 500
+        mock_session.post.return_value.text = ""
+
+        self.session.session = mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+        self.session.getReport = MagicMock(
+            return_value=[{"seq": "3", "type": "Schule", "duration": "01:00", "text": "Mathe"}]
+        )
+        self.session.getReportWeekId = MagicMock(return_value="19")
+
+        results = self.session.deleteReport(datetime(2024, 5, 10))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].action, "delete")
+        self.assertEqual(results[0].date, datetime(2024, 5, 10))
+        self.assertFalse(results[0].ok)
+        self.assertEqual(results[0].status_code, 500)
+        # Deletions are idempotent and retried
+        self.assertEqual(mock_session.post.call_count, 4)
+        self.assertEqual(mock_session.post.call_args[1]["data"]["Seq"], "-3")
+        self.assertEqual(mock_session.post.call_args[1]["data"]["Art_ID"], "2")
+
+
+class TestUpsertReports(unittest.TestCase):
+    def setUp(self):
+        self.session = Session()
+        self.mock_session = MagicMock()
+        self.mock_session.get.return_value.text = '<div id="divSchulfach"></div>'
+        self.mock_session.post.return_value.status_code = 200
+        self.mock_session.post.return_value.text = ""
+        self.session.session = self.mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+        self.session.getReportWeekId = MagicMock(return_value="19")
+        self.existing = {
+            date(2024, 5, 6): [
+                {"seq": "1", "type": "Betrieb", "duration": "04:00", "text": "Code Review Tests"},
+                {"seq": "2", "type": "Schule", "duration": "02:00", "text": "Mathe"},
+            ],
+            date(2024, 5, 7): [],
+        }
+        self.session.getReport = MagicMock(side_effect=lambda day: self.existing[day])
+
+    def test_unchanged_days_send_nothing(self):
+        entries = [
+            Entry(datetime(2024, 5, 6), "Code Review\nTests", "4:00", 1),
+            Entry(datetime(2024, 5, 6), "Mathe", "02:00", 2),
+        ]
+        plan = self.session.upsertReports(entries)
+        self.assertEqual(plan.requests, 0)
+        self.assertEqual(len(plan.unchanged), 2)
+        self.assertFalse(self.mock_session.post.called)
+        self.assertFalse(self.session.getReportWeekId.called)
+
+    def test_dry_run(self):
+        entries = [
+            Entry(datetime(2024, 5, 6), "Code Review\nTests", "04:00", 1),
+            Entry(datetime(2024, 5, 6), "Englisch", "02:00", 2),
+            Entry(datetime(2024, 5, 7), "Deployment", "08:00", 1),
+            Entry(datetime(2024, 5, 7), "Nothing", "00:00", 1),
+        ]
+        plan = self.session.upsertReports(entries, dry_run=True)
+        self.assertTrue(plan.dry_run)
+        self.assertEqual(plan.inserts, [entries[1], entries[2]])
+        self.assertEqual(plan.deletes, [(date(2024, 5, 6), self.existing[date(2024, 5, 6)][1])])
+        self.assertEqual(plan.requests, 3)
+        self.assertEqual(plan.results, [])
+        self.assertFalse(self.mock_session.post.called)
+
+    def test_apply(self):
+        entries = [
+            Entry(datetime(2024, 5, 6), "Code Review\nTests", "04:00", 1),
+            Entry(datetime(2024, 5, 6), "Englisch", "02:00", 2),
+            Entry(datetime(2024, 5, 7), "Deployment", "08:00", 1),
+        ]
+        plan = self.session.upsertReports(entries, max_workers=2)
+        self.assertEqual(self.mock_session.post.call_count, 3)
+        self.assertEqual(
+            sorted(result.action for result in plan.results), ["add", "add", "delete"]
+        )
+        self.assertTrue(all(result.ok for result in plan.results))
+        # The day reads happen once per day
+        self.assertEqual(self.session.getReport.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,166 @@
+import logging
+import unittest
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+from azubiheftApi.azubiheftApi import Entry
+from azubiheftApi.errors import AuthError, NotLoggedInError
+
+from tests.fake_server import FakeAzubiheft
+
+try:
+    import aiohttp
+    from azubiheftApi.aio import AsyncSession
+except ImportError:
+    aiohttp = None
+
+OVERVIEW = """
+<div class="mo NBox" onclick="location.href='?week_id=19'">
+    <div class="sKW">19</div>
+    <div class="KW"><div></div><div></div><div>2024</div></div>
+</div>
+"""
+REPORT = '<div class="d0 mo" data-seq="1"><div class="row2 d4">01:00</div><div class="row1 d3">Art: Betrieb</div><div class="row7 d5">Did some work</div></div>'
+
+
+class FakeResponse:
+    def __init__(self, text="", status=200, url="https://www.azubiheft.de/Azubi/Default.aspx"):
+        self._text = text
+        self.status = status
+        self.url = url
+        self.history = ()
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeClient:
+    """Stands in for aiohttp.ClientSession, answering by URL path."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        for path, response in self.pages.items():
+            if path in url:
+                return response(method) if callable(response) else response
+        return FakeResponse()
+
+    async def close(self):
+        pass
+
+
+@unittest.skipUnless(aiohttp, "aiohttp is not installed")
+class TestAsyncSession(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.session = AsyncSession()
+        self.client = FakeClient(
+            {
+                "Login.aspx": lambda method: FakeResponse(
+                    '<div id="Abmelden"></div>' if method == "POST" else ""
+                ),
+                "Ausbildungsnachweise.aspx": FakeResponse(OVERVIEW),
+                "Tagesbericht.aspx": FakeResponse(REPORT),
+                "SetupSchulfach.aspx": FakeResponse('<div id="divSchulfach"></div>'),
+            }
+        )
+        self.session._new_client = MagicMock(return_value=self.client)
+
+    async def test_login(self):
+        await self.session.login("username", "password")
+        self.assertTrue(await self.session.isLoggedIn())
+        self.assertEqual([m for m, _ in self.client.requests], ["GET", "POST"])
+
+        with self.assertRaises(AuthError):
+            await self.session.login("username", "password")
+
+    async def test_login_failure(self):
+        self.client.pages["Login.aspx"] = FakeResponse("")
+        with self.assertRaises(AuthError):
+            await self.session.login("username", "password")
+
+    async def test_requires_login(self):
+        with self.assertRaises(NotLoggedInError):
+            await self.session.getReport(datetime(2024, 5, 10))
+
+    async def test_getReport(self):
+        await self.session.login("username", "password")
+        reports = await self.session.getReport(datetime(2024, 5, 10))
+        self.assertEqual(reports[0]["type"], "Betrieb")
+        self.assertEqual(reports[0]["seq"], "1")
+
+    async def test_expired_session(self):
+        await self.session.login("username", "password")
+        self.client.pages["Tagesbericht.aspx"] = FakeResponse(
+            "", url="https://www.azubiheft.de/Login.aspx?ReturnUrl=%2fAzubi"
+        )
+        with self.assertRaises(NotLoggedInError):
+            await self.session.getReport(datetime(2024, 5, 10))
+        self.assertFalse(await self.session.isLoggedIn())
+
+    async def test_writeReports(self):
+        await self.session.login("username", "password")
+        entries = [
+            Entry(datetime(2024, 5, day), "Did some work", "01:00", 1)
+            for day in (6, 7, 8)
+        ]
+        results = await self.session.writeReports(entries)
+
+        self.assertTrue(all(result.ok for result in results))
+        posts = [url for method, url in self.client.requests if "XMLHttpRequest" in url]
+        self.assertEqual(len(posts), 3)
+        self.assertTrue(all("BrNr=19" in url for url in posts))
+        overview_gets = [url for _, url in self.client.requests if "Ausbildungsnachweise" in url]
+        self.assertEqual(len(overview_gets), 1)
+
+    async def test_deleteReport(self):
+        await self.session.login("username", "password")
+        results = await self.session.deleteReport(datetime(2024, 5, 10))
+        posts = [url for method, url in self.client.requests if "XMLHttpRequest" in url]
+        self.assertEqual(len(posts), 1)
+        self.assertEqual([(r.action, r.ok) for r in results], [("delete", True)])
+        self.assertEqual(results[0].entry["text"], "Did some work")
+        self.assertEqual(results[0].date, datetime(2024, 5, 10))
+
+
+
+@unittest.skipUnless(aiohttp, "aiohttp is not installed")
+class TestAsyncSessionFakeServer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.server = FakeAzubiheft().start()
+        self.addCleanup(self.server.stop)
+
+    async def test_concurrent_relogin(self):
+        async with AsyncSession(base_url=self.server.url, auto_relogin=True, max_workers=4) as session:
+            await session.login("max", "secret")
+            await session.getWeeks()
+            self.server.expire_sessions()
+            self.server.reset_stats()
+            client = session.session
+
+            entries = [Entry(datetime(2024, 5, day), "Parallel", "01:00", 1) for day in range(6, 11)]
+            results = await session.writeReports(entries)
+
+            self.assertTrue(all(result.ok for result in results), [r.error for r in results])
+            self.assertEqual(self.server.request_count("/Login.aspx", "POST"), 1)
+            # The replaced client is closed once the last request using it is done
+            self.assertTrue(client.closed)
+            self.assertFalse(session._retired_clients)
+            self.assertFalse(session._active_requests)
+            for day in range(6, 11):
+                self.assertEqual(len(self.server.entries("max", date(2024, 5, day))), 1)
+            self.assertEqual(len(await session.getReport(datetime(2024, 5, 6))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
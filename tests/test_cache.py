@@ -0,0 +1,148 @@
+import logging
+import threading
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from azubiheftApi.azubiheftApi import Entry, Session
+from azubiheftApi.cache import PageCache
+
+from tests.fake_server import FakeAzubiheft
+
+DAY = date(2024, 5, 10)
+
+
+class TestPageCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = PageCache(max_entries=2)
+        cache.put(("max", "report", "20240506", ()), [1])
+        cache.put(("max", "report", "20240507", ()), [2])
+        cache.get(("max", "report", "20240506", ()))
+        cache.put(("max", "report", "20240508", ()), [3])
+        self.assertIsNotNone(cache.get(("max", "report", "20240506", ())))
+        self.assertIsNone(cache.get(("max", "report", "20240507", ())))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        cache = PageCache(ttl={"report": 0, "setup": 10})
+        cache.put(("max", "report", "20240506", ()), [])
+        self.assertEqual(len(cache), 0)
+        # Pages with validators are kept for conditional requests
+        cache.put(("max", "report", "20240506", ()), [], etag='"abc"')
+        self.assertFalse(cache.get(("max", "report", "20240506", ())).fresh)
+
+        with patch("time.monotonic", return_value=1000.0):
+            cache.put(("max", "setup", "", ()), [])
+        with patch("time.monotonic", return_value=1009.0):
+            self.assertTrue(cache.get(("max", "setup", "", ())).fresh)
+        with patch("time.monotonic", return_value=1011.0):
+            self.assertFalse(cache.get(("max", "setup", "", ())).fresh)
+
+    def test_invalidate(self):
+        cache = PageCache()
+        cache.put(("max", "report", "20240506", (False,)), [])
+        cache.put(("max", "report", "20240506", (True,)), [])
+        cache.put(("max", "report", "20240507", (False,)), [])
+        cache.put(("anna", "report", "20240506", (False,)), [])
+        cache.invalidate("max", "report", "20240506")
+        self.assertEqual(len(cache), 2)
+        cache.invalidate("max")
+        self.assertEqual(len(cache), 1)
+
+    def test_put_after_invalidation(self):
+        cache = PageCache()
+        generation = cache.generation
+        cache.invalidate("max", "report", "20240506")
+        # Fetched before the invalidation, may predate the write
+        cache.put(("max", "report", "20240506", ()), [], generation=generation)
+        self.assertEqual(len(cache), 0)
+        cache.put(("max", "report", "20240506", ()), [], generation=cache.generation)
+        self.assertEqual(len(cache), 1)
+
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.server = FakeAzubiheft(accounts={"max": "secret", "anna": "secret"}).start()
+        self.addCleanup(self.server.stop)
+        self.cache = PageCache()
+        self.session = Session(base_url=self.server.url, cache=self.cache)
+        self.session.login("max", "secret")
+        self.server.add_entry("max", DAY, "1", "08:00", "Tests")
+        self.server.reset_stats()
+
+    def test_cached_reads(self):
+        first = self.session.getReport(DAY)
+        first[0]["text"] = "changed by the caller"
+        self.assertEqual(self.session.getReport(DAY)[0]["text"], "Tests")
+        self.assertEqual(self.server.request_count("/Azubi/Tagesbericht.aspx"), 1)
+        # Formatting is a separate entry
+        self.session.getReport(DAY, include_formatting=True)
+        self.assertEqual(self.server.request_count("/Azubi/Tagesbericht.aspx"), 2)
+
+        self.session.getWeeks()
+        self.session.getWeeks(refresh=True)
+        self.assertEqual(self.server.request_count("/Azubi/Ausbildungsnachweise.aspx"), 2)
+
+    def test_writes_invalidate(self):
+        self.session.getReport(DAY)
+        self.session.getReport(date(2024, 5, 9))
+        self.session.writeReports([Entry(DAY, "Mehr Tests", "01:00", 1)])
+        self.assertEqual(len(self.session.getReport(DAY)), 2)
+        self.session.getReport(date(2024, 5, 9))
+        self.assertEqual(self.server.request_count("/Azubi/Tagesbericht.aspx"), 3)
+
+        self.session.deleteReport(DAY, 1)
+        self.assertEqual(len(self.session.getReport(DAY)), 1)
+
+        self.session.getSubjects()
+        self.session.sync_subjects(add=["Sport"])
+        self.assertIn("Sport", [s["name"] for s in self.session.getSubjects(refresh=True)])
+
+    def test_read_during_write(self):
+        post = self.session._post
+
+        def post_with_concurrent_read(url, **kwargs):
+            # Another thread reads the day before the server applies the write
+            reader = threading.Thread(target=self.session.getReport, args=(DAY,))
+            reader.start()
+            reader.join()
+            return post(url, **kwargs)
+
+        with patch.object(self.session, "_post", post_with_concurrent_read):
+            self.session.writeReports([Entry(DAY, "Mehr Tests", "01:00", 1)])
+        self.assertEqual(len(self.session.getReport(DAY)), 2)
+
+    def test_writes_expire_weeks(self):
+        self.session.getWeeks()
+        self.session.writeReports([Entry(DAY, "Mehr Tests", "01:00", 1)])
+        self.session.getWeeks()
+        self.assertEqual(self.server.request_count("/Azubi/Ausbildungsnachweise.aspx"), 2)
+
+    def test_accounts_are_separate(self):
+        self.session.getReport(DAY)
+        anna = Session(base_url=self.server.url, cache=self.cache)
+        anna.login("anna", "secret")
+        self.assertEqual(anna.getReport(DAY), [])
+
+        self.session.logout()
+        self.assertEqual(
+            [key[0] for key in self.cache._entries], ["anna"]
+        )
+
+    def test_conditional_requests(self):
+        self.server.etags = True
+        self.cache.ttl["report"] = 0
+        self.session.getReport(DAY)
+        self.session.getReport(DAY)
+        self.assertEqual(self.cache.stats()["revalidations"], 1)
+        self.assertEqual(self.server.request_count("/Azubi/Tagesbericht.aspx"), 2)
+        self.assertEqual(self.session.stats()["endpoints"]["GET /Azubi/Tagesbericht.aspx"]["statuses"], {"200": 1, "304": 1})
+
+        self.server.add_entry("max", DAY, "1", "01:00", "Neu")
+        self.assertEqual(len(self.session.getReport(DAY)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
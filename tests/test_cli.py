@@ -0,0 +1,139 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import date
+from unittest.mock import patch
+
+from azubiheftApi import cli
+
+from tests.fake_server import FakeAzubiheft
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAzubiheft().start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(logging.getLogger("azubiheftApi").setLevel, logging.NOTSET)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        self.session_file = os.path.join(self.dir, "session.json")
+        env = patch.dict(os.environ, {"AZUBIHEFT_USER": "max", "AZUBIHEFT_PASSWORD": "secret"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def run_cli(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = cli.main(
+                ["--base-url", self.server.url, "--session-file", self.session_file, *argv]
+            )
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_export_import_roundtrip(self):
+        self.server.add_entry("max", date(2024, 5, 6), "1", "08:00", "Tests")
+        self.server.add_entry("max", date(2024, 5, 7), "8", "01:30", "<div>Netzwerke</div>")
+        path = os.path.join(self.dir, "week.jsonl")
+
+        status, _, stderr = self.run_cli(
+            "--workers", "3", "--parse-processes", "2", "export", "--from", "2024-05-06", "--to", "2024-05-12", "-o", path
+        )
+        self.assertEqual(status, 0)
+        self.assertIn("export: 7/7 days", stderr)
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(
+            rows[1],
+            {"date": "2024-05-07", "seq": 1, "art_id": 8, "type": "Wirtschaftslehre", "duration": "01:30", "text": "Netzwerke"},
+        )
+
+        # The stored session is reused, no further login
+        self.server.reset_stats()
+        status, _, stderr = self.run_cli("import", path, "--replace")
+        self.assertEqual(status, 0)
+        self.assertIn("0 to add, 0 to delete, 2 unchanged", stderr)
+        self.assertEqual(self.server.request_count("/Login.aspx"), 0)
+
+        self.server.reset_stats()
+        self.run_cli("delete", "--from", "2024-05-06", "--to", "2024-05-12")
+        self.assertEqual(self.server.entries("max", date(2024, 5, 6)), [])
+
+        status, _, _ = self.run_cli("import", path)
+        self.assertEqual(status, 0)
+        self.assertEqual([e["text"] for e in self.server.entries("max", date(2024, 5, 7))], ["<div>Netzwerke</div>"])
+
+    def test_csv(self):
+        self.server.add_entry("max", date(2024, 5, 6), "1", "08:00", "Tests, mit Komma")
+        status, stdout, _ = self.run_cli(
+            "--quiet", "export", "--from", "2024-05-06", "--to", "2024-05-06", "--format", "csv"
+        )
+        self.assertEqual(status, 0)
+        self.assertEqual(
+            stdout.splitlines(),
+            ["date,seq,art_id,type,duration,text", '2024-05-06,1,1,Betrieb,08:00,"Tests, mit Komma"'],
+        )
+
+        path = os.path.join(self.dir, "import.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("date,type,duration,text\n2024-05-08,Schule,02:00,Berufsschule\n")
+        self.assertEqual(self.run_cli("import", path)[0], 0)
+        self.assertEqual(self.server.entries("max", date(2024, 5, 8))[0]["art_id"], "2")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("date,type,duration,text\n2024-05-08,,02:00,Ohne Fach\n")
+        status, _, stderr = self.run_cli("import", path)
+        self.assertEqual(status, 1)
+        self.assertIn("import.csv:2: unknown subject", stderr)
+
+    def test_delete_filters(self):
+        for text in ("Generiert", "Behalten"):
+            self.server.add_entry("max", date(2024, 5, 6), "1", "01:00", text)
+        status, _, _ = self.run_cli(
+            "delete", "--from", "2024-05-06", "--to", "2024-05-06", "--contains", "Gen"
+        )
+        self.assertEqual(status, 0)
+        self.assertEqual([e["text"] for e in self.server.entries("max", date(2024, 5, 6))], ["Behalten"])
+
+    def test_subjects(self):
+        status, _, _ = self.run_cli(
+            "subjects", "sync", "--add", "Sport", "--delete", "Deutsch", "--rename", "Wirtschaftslehre=WL"
+        )
+        self.assertEqual(status, 0)
+        status, stdout, _ = self.run_cli("--quiet", "subjects", "list")
+        self.assertIn("\tSport", stdout)
+        self.assertIn("\tWL", stdout)
+        self.assertNotIn("\tDeutsch", stdout)
+
+        status, _, stderr = self.run_cli("subjects", "sync", "--rename", "Unbekannt=X")
+        self.assertEqual(status, 1)
+        self.assertIn("Unknown user-defined subject", stderr)
+
+    def test_verbose(self):
+        logger = logging.getLogger("azubiheftApi")
+        level, handlers = logger.level, list(logger.handlers)
+        status, _, stderr = self.run_cli("--verbose", "--quiet", "subjects", "list")
+        self.assertEqual(status, 0)
+        self.assertIn("azubiheft: GET " + self.server.url + "/Azubi/SetupSchulfach.aspx: 200 in", stderr)
+        # Calling main leaves the library's logging as it was
+        self.assertEqual(logger.level, level)
+        self.assertEqual(logger.handlers, handlers)
+
+    def test_expired_stored_session(self):
+        self.run_cli("--quiet", "subjects", "list")
+        self.server.expire_sessions()
+        with patch.dict(os.environ, {"AZUBIHEFT_PASSWORD": ""}), patch(
+            "getpass.getpass", return_value="secret"
+        ) as prompt:
+            del os.environ["AZUBIHEFT_PASSWORD"]
+            status, stdout, _ = self.run_cli("--quiet", "subjects", "list")
+        self.assertEqual(status, 0)
+        self.assertIn("Betrieb", stdout)
+        prompt.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
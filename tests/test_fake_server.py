@@ -0,0 +1,260 @@
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from azubiheftApi import parsing
+from azubiheftApi.azubiheftApi import Entry, Session
+from azubiheftApi.errors import AuthError, NotLoggedInError
+
+from tests import bench
+from tests.fake_server import FakeAzubiheft
+
+
+def setUpModule():
+    logging.disable(logging.INFO)
+
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+class TestAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAzubiheft().start()
+        self.addCleanup(self.server.stop)
+        self.session = Session(base_url=self.server.url)
+
+    def test_login(self):
+        self.session.login("max", "secret")
+        self.assertTrue(self.session.isLoggedIn(verify=True))
+        self.assertEqual(
+            self.server.requests[:3],
+            [("GET", "/Login.aspx"), ("POST", "/Login.aspx"), ("GET", "/Azubi/Default.aspx")],
+        )
+
+        self.session.logout()
+        other = Session(base_url=self.server.url)
+        with self.assertRaises(AuthError):
+            other.login("max", "wrong")
+
+    def test_write_read_delete(self):
+        self.session.login("max", "secret")
+        day = date(2024, 5, 10)
+        results = self.session.writeReports(
+            [Entry(day, "Code Review\nTests", "4:00", 1), Entry(day, "Normalformen", "02:30", 9)]
+        )
+        self.assertTrue(all(result.ok for result in results))
+
+        self.assertEqual(
+            self.session.getReport(day),
+            [
+                {"seq": "1", "type": "Betrieb", "duration": "04:00", "text": "Code Review Tests"},
+                {"seq": "2", "type": "Anwendungsentwicklung", "duration": "02:30", "text": "Normalformen"},
+            ],
+        )
+        self.assertEqual(
+            self.session.getReport(day, include_formatting=True)[0]["text"],
+            "<div>Code Review</div><div>Tests</div>",
+        )
+
+        self.server.reset_stats()
+        self.session.deleteReport(day, 1)
+        self.assertEqual([e["text"] for e in self.server.entries("max", day)], ["<div>Normalformen</div>"])
+        # The overview was cached by writeReports
+        self.assertEqual(self.server.request_count("/Azubi/Ausbildungsnachweise.aspx"), 0)
+        self.assertEqual(self.server.request_count("/Azubi/XMLHttpRequest.ashx"), 1)
+
+    def test_upsert_formatted_text(self):
+        self.session.login("max", "secret")
+        day = date(2024, 5, 10)
+        entries = [
+            Entry(day, "<b>Wichtig:</b> Tests &amp; Doku\nZweite   Zeile", "4:00", 1),
+            Entry(day, "Normalformen", "02:30", 9),
+        ]
+        plan = self.session.upsertReports(entries)
+        self.assertEqual(len(plan.inserts), 2)
+        self.assertEqual(self.session.getReport(day)[0]["text"], "Wichtig: Tests & Doku Zweite   Zeile")
+
+        self.server.reset_stats()
+        plan = self.session.upsertReports(entries)
+        self.assertEqual((len(plan.inserts), len(plan.deletes), len(plan.unchanged)), (0, 0, 2))
+        self.assertEqual(self.server.request_count("/Azubi/XMLHttpRequest.ashx"), 0)
+
+    def test_deleteReports(self):
+        self.session.login("max", "secret")
+        for day in (6, 7, 8, 13):
+            self.server.add_entry("max", date(2024, 5, day), "1", "08:00", "Generiert")
+            self.server.add_entry("max", date(2024, 5, day), "8", "01:00", "Behalten")
+        self.server.reset_stats()
+
+        results = self.session.deleteReports(
+            date(2024, 5, 6),
+            date(2024, 5, 12),
+            predicate=lambda day, entry: entry["text"] == "Generiert",
+            max_workers=3,
+        )
+        self.assertEqual([result.date for result in results], [date(2024, 5, 6), date(2024, 5, 7), date(2024, 5, 8)])
+        self.assertTrue(all(result.ok and result.action == "delete" for result in results))
+        self.assertEqual([e["text"] for e in self.server.entries("max", date(2024, 5, 7))], ["Behalten"])
+        self.assertEqual(len(self.server.entries("max", date(2024, 5, 13))), 2)
+        # 7 days, the overview and the subjects once, 3 deletions
+        self.assertEqual(self.server.request_count(), 7 + 2 + 3)
+
+        self.assertEqual(self.session.deleteReports(date(2024, 6, 1), date(2024, 6, 2)), [])
+
+    def test_parser_pool(self):
+        self.session.login("max", "secret")
+        self.server.add_entry("max", date(2024, 5, 7), "1", "08:00", "Tests")
+        expected = self.session.getReports(date(2024, 5, 6), date(2024, 5, 12))
+
+        with parsing.ParserPool(processes=2, min_size=0) as pool:
+            session = Session(base_url=self.server.url, parser_pool=pool)
+            session.login("max", "secret")
+            self.assertEqual(session.getReports(date(2024, 5, 6), date(2024, 5, 12), max_workers=4), expected)
+            self.assertEqual(session.getReportWeekId(date(2024, 5, 7)), self.session.getReportWeekId(date(2024, 5, 7)))
+            self.assertEqual(session.stats()["pages"]["report"]["parses"], 7)
+
+    def test_subjects(self):
+        self.session.login("max", "secret")
+        self.session.add_subject("Mathe")
+        self.assertIn({"id": "11", "name": "Mathe"}, self.session.getSubjects())
+        self.session.delete_subject("8")
+        self.assertNotIn("8", [s["id"] for s in self.session.getSubjects(refresh=True)])
+
+    def test_sync_subjects(self):
+        self.session.login("max", "secret")
+        self.server.reset_stats()
+        new_subjects = [f"Lernfeld {number}" for number in range(1, 16)]
+        self.session.sync_subjects(add=new_subjects)
+        self.assertEqual(self.server.request_count(), 2)
+        self.assertEqual(len(self.server.subjects["max"]), 18)
+        # The saved page is parsed, no further request for the new ids
+        self.assertIsNotNone(self.session.get_art_id_from_text("Lernfeld 15"))
+        self.assertEqual(self.server.request_count(), 2)
+
+        self.server.reset_stats()
+        self.session.sync_subjects(
+            add=["Lernfeld 1", "Sport"],
+            delete=["Deutsch", "8"],
+            rename={"anwendungsentwicklung": "AE"},
+        )
+        self.assertEqual(self.server.request_count("/Azubi/SetupSchulfach.aspx", "POST"), 1)
+        names = sorted(self.server.subjects["max"].values())
+        self.assertIn("AE", names)
+        self.assertIn("Sport", names)
+        self.assertNotIn("Deutsch", names)
+        self.assertNotIn("Wirtschaftslehre", names)
+        self.assertEqual(names.count("Lernfeld 1"), 1)
+
+        # Nothing to change: only the page is read
+        self.server.reset_stats()
+        self.session.sync_subjects(add=["Sport"])
+        self.assertEqual(self.server.request_count(), 1)
+        with self.assertRaises(ValueError):
+            self.session.sync_subjects(rename={"Lernfeld": "LF"})
+        # Built-in and unknown subjects are never sent for deletion
+        for key in ("1", "Betrieb", "99"):
+            with self.assertRaises(ValueError):
+                self.session.sync_subjects(delete=[key])
+        self.assertEqual(self.server.request_count("/Azubi/SetupSchulfach.aspx", "POST"), 0)
+
+    def test_expired_session(self):
+        self.session.login("max", "secret")
+        self.server.expire_sessions()
+        with self.assertRaises(NotLoggedInError):
+            self.session.getReport(date(2024, 5, 10))
+
+        session = Session(auto_relogin=True, base_url=self.server.url)
+        session.login("max", "secret")
+        self.server.add_entry("max", date(2024, 5, 10), "1", "08:00", "Urlaubsvertretung")
+        self.server.expire_sessions()
+        self.server.reset_stats()
+        self.assertEqual(session.getReport(date(2024, 5, 10))[0]["text"], "Urlaubsvertretung")
+        # Redirect to the login page, login, retried request
+        self.assertEqual(self.server.request_count(), 6)
+
+    def test_load_other_account(self):
+        self.server.accounts["anna"] = "pw"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sessions.json")
+            anna = Session(base_url=self.server.url)
+            anna.login("anna", "pw")
+            anna.save(path, key="anna")
+
+            session = Session(auto_relogin=True, base_url=self.server.url)
+            session.login("max", "secret")
+            self.assertTrue(session.load(path, key="anna"))
+        self.server.expire_sessions()
+        with self.assertRaises(NotLoggedInError):
+            session.writeReports([Entry(date(2024, 5, 10), "Annas Eintrag", "01:00", 1)])
+        self.assertEqual(self.server.entries("max", date(2024, 5, 10)), [])
+        self.assertEqual(self.server.request_count("/Login.aspx", "POST"), 2)
+
+
+class TestConcurrentUse(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAzubiheft(latency=0.02).start()
+        self.addCleanup(self.server.stop)
+        self.session = Session(auto_relogin=True, base_url=self.server.url)
+
+    def run_together(self, fn, count=8):
+        barrier = threading.Barrier(count)
+
+        def run(_):
+            barrier.wait()
+            return fn()
+
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            return list(executor.map(run, range(count)))
+
+    def test_single_flight(self):
+        self.session.login("max", "secret")
+        self.server.reset_stats()
+        week_ids = self.run_together(lambda: self.session.getReportWeekId(date(2024, 5, 7)))
+        self.assertEqual(len(set(week_ids)), 1)
+        self.assertEqual(self.server.request_count("/Azubi/Ausbildungsnachweise.aspx"), 1)
+
+        art_ids = self.run_together(lambda: self.session.get_art_id_from_text("Deutsch"))
+        self.assertEqual(set(art_ids), {"10"})
+        self.assertEqual(self.server.request_count("/Azubi/SetupSchulfach.aspx"), 1)
+
+    def test_single_relogin(self):
+        self.session.login("max", "secret")
+        self.server.add_entry("max", date(2024, 5, 7), "1", "08:00", "Tests")
+        self.server.expire_sessions()
+        self.server.reset_stats()
+        reports = self.run_together(lambda: self.session.getReport(date(2024, 5, 7)))
+        self.assertTrue(all(report[0]["text"] == "Tests" for report in reports))
+        self.assertEqual(self.server.request_count("/Login.aspx", "POST"), 1)
+
+    def test_concurrent_login(self):
+        def login():
+            try:
+                self.session.login("max", "secret")
+                return True
+            except AuthError:
+                return False
+
+        self.assertEqual(sorted(self.run_together(login, 4)), [False, False, False, True])
+        self.assertEqual(self.server.request_count("/Login.aspx", "POST"), 1)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_request_budgets(self):
+        for result in bench.run(latency=0):
+            with self.subTest(result.name):
+                self.assertLessEqual(result.requests, bench.REQUEST_BUDGETS[result.name])
+                self.assertGreater(result.parse_time, 0)
+
+    def test_import_is_light(self):
+        result = bench.import_time(runs=1)
+        self.assertEqual(result.loaded, [])
+        self.assertEqual(result.root_handlers, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import logging
+import threading
+import unittest
+import urllib.request
+from datetime import date
+
+from azubiheftApi.azubiheftApi import Entry, Session
+from azubiheftApi.instrumentation import Instrumentation, ParseEvent, RequestEvent, serve_metrics
+
+from tests.fake_server import FakeAzubiheft
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = Instrumentation()
+
+    def test_nested_operations(self):
+        with self.instrumentation.operation("writeReports"):
+            self.instrumentation.record_request("GET", "https://x/Azubi/A.aspx?T=1", 200, 100, 0.5)
+            with self.instrumentation.operation("getWeeks"):
+                self.instrumentation.record_request("GET", "https://x/Azubi/B.aspx", 200, 50, 0.25)
+                self.instrumentation.record_parse("overview", 0.1)
+
+        stats = self.instrumentation.stats()
+        outer = stats["operations"]["writeReports"]
+        inner = stats["operations"]["writeReports > getWeeks"]
+        self.assertEqual((outer["calls"], outer["requests"], outer["bytes"], outer["parses"]), (1, 2, 150, 1))
+        self.assertEqual((inner["calls"], inner["requests"], inner["latency"]), (1, 1, 0.25))
+        self.assertEqual(stats["totals"]["requests"], 2)
+        self.assertEqual(stats["endpoints"]["GET /Azubi/A.aspx"]["statuses"], {"200": 1})
+        self.assertEqual(stats["pages"]["overview"]["parses"], 1)
+
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.stats()["operations"], {})
+
+    def test_bind_to_worker_thread(self):
+        with self.instrumentation.operation("getReports"):
+            work = self.instrumentation.bind(
+                lambda: self.instrumentation.record_parse("report", 0.1)
+            )
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertEqual(self.instrumentation.stats()["operations"]["getReports"]["parses"], 1)
+
+    def test_listeners(self):
+        events = []
+        self.instrumentation.add_listener(events.append)
+        self.instrumentation.add_listener(lambda event: 1 / 0)
+        with self.instrumentation.operation("getReport"):
+            self.instrumentation.record_request("POST", "https://x/a", None, 0, 1.0, "ConnectionError")
+            self.instrumentation.record_parse("report", 0.1)
+        self.assertEqual(
+            events,
+            [
+                RequestEvent(("getReport",), "POST", "/a", None, 0, 1.0, "ConnectionError"),
+                ParseEvent(("getReport",), "report", 0.1),
+            ],
+        )
+        self.assertEqual(self.instrumentation.stats()["totals"]["request_errors"], 1)
+
+    def test_prometheus(self):
+        with self.instrumentation.operation('get"Report'):
+            self.instrumentation.record_request("GET", "https://x/a", 200, 10, 0.5)
+        text = self.instrumentation.to_prometheus()
+        self.assertIn('azubiheft_operation_requests_total{operation="get\\"Report"} 1', text)
+        self.assertIn('azubiheft_requests_total{method="GET",endpoint="/a",status="200"} 1', text)
+        self.assertIn("# TYPE azubiheft_response_bytes_total counter", text)
+
+        server = serve_metrics(self.instrumentation, port=0, address="127.0.0.1")
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            self.assertEqual(response.read().decode(), self.instrumentation.to_prometheus())
+
+
+class TestSessionInstrumentation(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.server = FakeAzubiheft().start()
+        self.addCleanup(self.server.stop)
+        self.session = Session(base_url=self.server.url)
+
+    def test_requests_grouped_by_operation(self):
+        self.session.login("max", "secret")
+        login = self.session.stats()["operations"]["login"]
+        self.assertEqual((login["requests"], login["parses"]), (3, 2))
+
+        self.session.instrumentation.reset()
+        self.server.reset_stats()
+        days = [date(2024, 5, 6), date(2024, 5, 7), date(2024, 5, 14)]
+        self.session.writeReports([Entry(day, "Tests", "08:00", 1) for day in days])
+
+        stats = self.session.stats()
+        self.assertEqual(stats["totals"]["requests"], self.server.request_count())
+        self.assertEqual(stats["operations"]["writeReports"]["requests"], 4)
+        self.assertEqual(stats["operations"]["writeReports > getReportWeekId"]["calls"], 2)
+        self.assertEqual(stats["operations"]["writeReports > getReportWeekId > getWeeks"]["requests"], 1)
+        self.assertEqual(stats["endpoints"]["POST /Azubi/XMLHttpRequest.ashx"]["statuses"], {"200": 3})
+
+    def test_concurrent_reads_grouped(self):
+        self.session.login("max", "secret")
+        self.session.getReports(date(2024, 5, 6), date(2024, 5, 12), max_workers=4)
+        stats = self.session.stats()["operations"]
+        self.assertEqual(stats["getReports"]["requests"], 7)
+        self.assertEqual(stats["getReports > iter_reports > getReport"]["calls"], 7)
+        self.assertEqual(stats["getReports > iter_reports > getReport"]["parses"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
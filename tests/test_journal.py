@@ -0,0 +1,107 @@
+import logging
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from azubiheftApi.azubiheftApi import Entry, Session
+from azubiheftApi.errors import RequestTimeoutError
+from azubiheftApi.journal import DONE, FAILED, PENDING, WriteJournal
+
+from tests.fake_server import FakeAzubiheft
+
+
+class Crash(Exception):
+    pass
+
+
+class TestWriteJournal(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.server = FakeAzubiheft().start()
+        self.addCleanup(self.server.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "journal.db")
+        self.session = Session(base_url=self.server.url)
+        self.session.login("max", "secret")
+        self.entries = [
+            Entry(datetime(2024, 5, 6), "Montag", "08:00", 1),
+            Entry(datetime(2024, 5, 7), "Dienstag", "04:00", 1),
+            Entry(datetime(2024, 5, 7), "Dienstag", "4:00", 1),
+            Entry(datetime(2024, 5, 8), "Mittwoch", "02:00", 2),
+        ]
+
+    def texts(self, day):
+        return [entry["text"] for entry in self.session.getReport(day)]
+
+    def test_keys(self):
+        keys = WriteJournal.keys(self.entries)
+        self.assertEqual(len(set(keys)), 4)
+        self.assertEqual(keys, WriteJournal.keys(self.entries))
+        self.assertEqual(WriteJournal.keys(self.entries[1:2]), keys[1:2])
+
+    def test_rerun_sends_nothing(self):
+        results = self.session.writeReports(self.entries, journal=self.path)
+        self.assertTrue(all(result.ok for result in results))
+        with WriteJournal(self.path) as journal:
+            self.assertEqual(journal.counts("max"), {PENDING: 0, DONE: 4, FAILED: 0})
+
+        self.server.reset_stats()
+        results = self.session.writeReports(self.entries, journal=self.path)
+        self.assertEqual([result.status_code for result in results], [200] * 4)
+        self.assertEqual(self.server.request_count(), 0)
+        self.assertEqual(self.texts(date(2024, 5, 7)), ["Dienstag", "Dienstag"])
+
+    def test_resume_after_crash(self):
+        post = self.session._post
+        calls = []
+
+        def crashing_post(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 2:
+                # The server got the entry, the answer was lost
+                post(url, **kwargs)
+                raise RequestTimeoutError("read timed out")
+            if len(calls) == 3:
+                raise Crash()
+            return post(url, **kwargs)
+
+        with patch.object(self.session, "_post", crashing_post):
+            with self.assertRaises(Crash):
+                self.session.writeReports(self.entries, max_workers=1, journal=self.path)
+        with WriteJournal(self.path) as journal:
+            self.assertEqual(journal.counts("max"), {PENDING: 2, DONE: 1, FAILED: 0})
+
+        self.server.reset_stats()
+        results = self.session.writeReports(self.entries, max_workers=1, journal=self.path)
+        self.assertTrue(all(result.ok for result in results))
+        # Only the day of the unconfirmed entries is read, only the lost one and the unsent one are posted
+        self.assertEqual(self.server.request_count("/Azubi/Tagesbericht.aspx"), 1)
+        self.assertEqual(self.server.request_count("/Azubi/XMLHttpRequest.ashx"), 2)
+        self.assertEqual(self.texts(date(2024, 5, 6)), ["Montag"])
+        self.assertEqual(self.texts(date(2024, 5, 7)), ["Dienstag", "Dienstag"])
+        self.assertEqual(self.texts(date(2024, 5, 8)), ["Mittwoch"])
+        with WriteJournal(self.path) as journal:
+            self.assertEqual(journal.counts("max"), {PENDING: 0, DONE: 4, FAILED: 0})
+
+    def test_rejected_entries_are_sent_again(self):
+        with WriteJournal(self.path) as journal:
+            keys = journal.keys(self.entries)
+            journal.record_intent("max", keys[0], self.entries[0].date)
+            journal.record_result("max", keys[0], self.entries[0].date, 500, "Fehler")
+            self.assertEqual(journal.counts(), {PENDING: 0, DONE: 0, FAILED: 1})
+
+            self.server.reset_stats()
+            self.session.writeReports(self.entries[:1], journal=journal)
+            self.assertEqual(self.server.request_count("/Azubi/Tagesbericht.aspx"), 0)
+            self.assertEqual(self.texts(date(2024, 5, 6)), ["Montag"])
+
+            journal.clear("max")
+            self.assertEqual(journal.counts(), {PENDING: 0, DONE: 0, FAILED: 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import MagicMock
+
+from azubiheftApi.azubiheftApi import TimeHelper
+from azubiheftApi.mirror import ReportMirror
+
+
+def fake_reports(start, end, include_formatting=False, max_workers=None):
+    return {
+        day: [{"seq": "1", "type": "Betrieb", "duration": "08:00", "text": f"Work on {day}"}]
+        if day.weekday() < 5 else []
+        for day in TimeHelper.dateRange(start, end)
+    }
+
+
+class TestReportMirror(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.session = MagicMock()
+        self.session.getWeeks.return_value = {
+            (2024, 17): {"id": "48121", "status": "Abgezeichnet"},
+            (2024, 18): {"id": "48377", "status": "Abgegeben"},
+            (2024, 20): {"id": "48903", "status": None},
+        }
+        self.session.getReports.side_effect = fake_reports
+        self.mirror = ReportMirror(self.session, os.path.join(tmp.name, "mirror.db"))
+        self.addCleanup(self.mirror.close)
+        self.today = date(2024, 5, 15)
+
+    def test_initial_sync(self):
+        result = self.mirror.sync(today=self.today)
+        self.assertEqual(result["weeks_synced"], 3)
+        self.assertEqual(result["days_fetched"], 21)
+        self.assertEqual(result["entries_stored"], 15)
+        # Weeks 17 and 18 are fetched as one range
+        self.assertEqual(
+            [call.args[:2] for call in self.session.getReports.call_args_list],
+            [(date(2024, 4, 22), date(2024, 5, 5)), (date(2024, 5, 13), date(2024, 5, 19))],
+        )
+
+        reports = self.mirror.getReports(date(2024, 4, 26), date(2024, 4, 29))
+        self.assertEqual(list(reports), [date(2024, 4, 26), date(2024, 4, 27), date(2024, 4, 28), date(2024, 4, 29)])
+        self.assertEqual(reports[date(2024, 4, 27)], [])
+        self.assertEqual(
+            self.mirror.getReport(date(2024, 4, 26)),
+            [{"seq": "1", "type": "Betrieb", "duration": "08:00", "text": "Work on 2024-04-26"}],
+        )
+        # Weeks never synced are not in the mirror
+        self.assertEqual(self.mirror.getReports(date(2024, 5, 6), date(2024, 5, 12)), {})
+
+    def test_incremental_sync(self):
+        self.mirror.sync(today=self.today)
+        self.session.getReports.reset_mock()
+
+        # Nothing changed: only the current week is fetched again
+        result = self.mirror.sync(today=self.today, recent_weeks=1)
+        self.assertEqual(result["weeks_synced"], 1)
+        self.assertEqual(self.session.getReports.call_count, 1)
+
+        # A changed status and a new week are picked up
+        self.session.getReports.reset_mock()
+        self.session.getWeeks.return_value[(2024, 18)] = {"id": "48377", "status": "Abgezeichnet"}
+        self.session.getWeeks.return_value[(2024, 19)] = {"id": "48652", "status": None}
+        result = self.mirror.sync(today=self.today, recent_weeks=0)
+        self.assertEqual(result["weeks_synced"], 2)
+        self.assertEqual(
+            [call.args[:2] for call in self.session.getReports.call_args_list],
+            [(date(2024, 4, 29), date(2024, 5, 12))],
+        )
+
+    def test_resync_replaces_entries(self):
+        self.mirror.sync(today=self.today)
+        self.session.getReports.side_effect = lambda start, end, **kwargs: {
+            day: [] for day in TimeHelper.dateRange(start, end)
+        }
+        self.mirror.sync(today=self.today, full=True)
+        self.assertEqual(
+            self.mirror.getReports(date(2024, 4, 22), date(2024, 5, 19), skip_empty=True), {}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
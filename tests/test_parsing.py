@@ -0,0 +1,101 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from azubiheftApi import parsing
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def parse_all():
+    """Run every page parser over the saved pages."""
+    return {
+        "tokens": parsing.extract_form_tokens(fixture("login.html")),
+        "logged_in": parsing.has_logout_marker(fixture("default.html")),
+        "logged_out": parsing.has_logout_marker(fixture("login.html")),
+        "weeks": parsing.parse_weeks(fixture("overview.html")),
+        "subjects": parsing.parse_subjects(fixture("setup.html")),
+        "report": parsing.parse_report(fixture("report.html")),
+        "formatted_report": parsing.parse_report(fixture("report.html"), True),
+    }
+
+
+class TestParsing(unittest.TestCase):
+    def setUp(self):
+        self.parser = parsing.parser
+        parsing.set_parser("html.parser")
+        # Reference result: the full document tree, as parsed before strainers
+        with patch.object(parsing, "_strainer", lambda name: None):
+            self.reference = parse_all()
+
+    def tearDown(self):
+        parsing.set_parser(self.parser)
+
+    def test_fixtures(self):
+        self.assertEqual(self.reference["tokens"]["__VIEWSTATEGENERATOR"], "C2EE9ABB")
+        self.assertTrue(self.reference["logged_in"])
+        self.assertFalse(self.reference["logged_out"])
+        self.assertEqual(
+            self.reference["weeks"][(2024, 19)], {"id": "48652", "status": "In Bearbeitung"}
+        )
+        self.assertEqual(self.reference["weeks"][(2024, 20)], {"id": "48903", "status": None})
+        self.assertEqual(len(self.reference["weeks"]), 4)
+        self.assertEqual(self.reference["subjects"][0], {"id": "8", "name": "Wirtschaftslehre"})
+        self.assertEqual(
+            [entry["seq"] for entry in self.reference["report"]], ["1", "2", "4"]
+        )
+        self.assertEqual(self.reference["report"][2]["text"], "Kaufvertrag & Mängelrüge")
+
+    def test_backends_match_reference(self):
+        for name in parsing.available_parsers():
+            with self.subTest(parser=name):
+                parsing.set_parser(name)
+                self.assertEqual(parse_all(), self.reference)
+
+    def test_missing_elements(self):
+        for name in parsing.available_parsers():
+            with self.subTest(parser=name):
+                parsing.set_parser(name)
+                self.assertEqual(parsing.parse_subjects(""), [])
+                self.assertEqual(parsing.parse_report("<html></html>"), [])
+                self.assertEqual(parsing.parse_weeks(fixture("report.html")), {})
+                self.assertEqual(
+                    parsing.extract_form_tokens(""),
+                    {"__VIEWSTATE": "", "__VIEWSTATEGENERATOR": "", "__EVENTVALIDATION": ""},
+                )
+
+    def test_rows(self):
+        rows = parsing.parse_report_rows(fixture("report.html"))
+        self.assertEqual([dict(zip(parsing.REPORT_FIELDS, row)) for row in rows], self.reference["report"])
+        self.assertIn((2024, 19, "48652", "In Bearbeitung"), parsing.parse_week_rows(fixture("overview.html")))
+
+    def test_parser_pool(self):
+        with parsing.ParserPool(processes=2, min_size=0) as pool:
+            for page, parse, args in [
+                ("report", parsing.parse_report, ()),
+                ("formatted_report", parsing.parse_report, (True,)),
+                ("weeks", parsing.parse_weeks, ()),
+                ("subjects", parsing.parse_subjects, ()),
+            ]:
+                with self.subTest(page):
+                    name = {"weeks": "overview", "subjects": "setup"}.get(page, "report")
+                    content = fixture(name + ".html").encode("utf-8")
+                    self.assertEqual(pool.parse(parse, content, "utf-8", *args), self.reference[page])
+        # Small pages stay in the calling thread
+        pool = parsing.ParserPool(processes=1, min_size=1 << 20)
+        pool.close()
+        self.assertEqual(pool.parse(parsing.parse_subjects, b"", None), [])
+
+    def test_set_parser(self):
+        self.assertIn("html.parser", parsing.available_parsers())
+        with self.assertRaises(ValueError):
+            parsing.set_parser("no-such-parser")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from azubiheftApi.azubiheftApi import Session
+from azubiheftApi.pool import SessionPool
+from azubiheftApi.scheduler import RequestScheduler
+
+
+def logged_in_http_session():
+    mock_session = MagicMock()
+    mock_session.get.return_value.text = ""
+    mock_session.post.return_value.text = '<div id="Abmelden"></div>'
+    return mock_session
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("requests.session", side_effect=lambda: logged_in_http_session())
+        self.mock_requests = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = SessionPool(
+            {"anna": ("anna", "secret"), "ben": ("ben", "secret")},
+            max_in_flight=2,
+        )
+
+    def test_lazy_login(self):
+        self.assertEqual(self.mock_requests.call_count, 0)
+        session = self.pool.get("anna")
+        self.assertIsInstance(session, Session)
+        self.assertTrue(session.isLoggedIn())
+        self.assertIs(self.pool.get("anna"), session)
+        self.assertEqual(self.mock_requests.call_count, 1)
+
+        with self.assertRaises(KeyError):
+            self.pool.get("unknown")
+
+    def test_shared_transport(self):
+        anna, ben = self.pool.get("anna"), self.pool.get("ben")
+        self.assertIs(anna.transport, ben.transport)
+        self.assertIs(anna.limiter, ben.limiter)
+        anna.session.mount.assert_any_call("https://", self.pool.transport.adapter)
+
+    def test_shared_scheduler(self):
+        scheduler = RequestScheduler(account_rate=100)
+        with SessionPool({"anna": ("anna", "secret")}, limiter=scheduler) as pool:
+            self.assertIs(pool.get("anna").limiter, scheduler)
+        self.assertEqual(scheduler.stats()["admitted"]["interactive"], 3)
+
+    def test_map(self):
+        self.pool.add("carl", "carl", "secret")
+        results = self.pool.map(self.pool.account_ids, lambda session: session.isLoggedIn())
+        self.assertEqual(results, {"anna": True, "ben": True, "carl": True})
+
+    def test_map_exceptions(self):
+        def fail_for_ben(session):
+            if session is self.pool.get("ben"):
+                raise ValueError("broken")
+            return "ok"
+
+        with self.assertRaises(ValueError):
+            self.pool.map(["anna", "ben"], fail_for_ben)
+        results = self.pool.map(["anna", "ben"], fail_for_ben, return_exceptions=True)
+        self.assertEqual(results["anna"], "ok")
+        self.assertIsInstance(results["ben"], ValueError)
+
+    def test_requests_in_flight_are_capped(self):
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_get(url, **kwargs):
+            with lock:
+                in_flight.append(url)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(url)
+            return MagicMock(text="")
+
+        self.pool.add("carl", "carl", "secret")
+        self.pool.add("dora", "dora", "secret")
+        for account_id in self.pool.account_ids:
+            self.pool.get(account_id).session.get.side_effect = slow_get
+
+        self.pool.map(self.pool.account_ids, lambda session: session.isLoggedIn(verify=True))
+        self.assertLessEqual(max(peak), 2)
+
+    def test_close(self):
+        session = self.pool.get("anna")
+        http_session = session.session
+        self.pool.close()
+        self.assertFalse(session.isLoggedIn())
+        self.assertTrue(http_session.get.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
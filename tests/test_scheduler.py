@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+import unittest
+from datetime import date
+
+from azubiheftApi.azubiheftApi import Session
+from azubiheftApi.scheduler import BACKGROUND, INTERACTIVE, NORMAL, RequestScheduler, TokenBucket
+
+from tests.fake_server import FakeAzubiheft
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class _Slot:
+    def __init__(self, scheduler, account, priority):
+        self.scheduler, self.account, self.priority = scheduler, account, priority
+
+    def __enter__(self):
+        self.scheduler.acquire(self.account, self.priority)
+
+    def __exit__(self, *exc_info):
+        self.scheduler.release()
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refill(self):
+        bucket = TokenBucket(rate=2, burst=2, now=0.0)
+        bucket.take(0.0)
+        bucket.take(0.0)
+        self.assertEqual(bucket.wait_time(0.0), 0.5)
+        self.assertEqual(bucket.wait_time(0.25), 0.25)
+        self.assertEqual(bucket.wait_time(10.0), 0.0)
+        self.assertEqual(bucket.tokens, 2)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def acquire_in_thread(self, scheduler, order, name, account=None, priority=NORMAL):
+        def run():
+            with _Slot(scheduler, account, priority):
+                order.append(name)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+        return thread
+
+    def test_rate(self):
+        scheduler = RequestScheduler(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(6):
+            with scheduler:
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        self.assertEqual(scheduler.stats()["admitted"]["normal"], 6)
+
+    def test_priorities(self):
+        scheduler = RequestScheduler(max_in_flight=1)
+        order = []
+        scheduler.acquire()
+        for waiting, (name, priority) in enumerate(
+            [("backfill", BACKGROUND), ("normal", NORMAL), ("click", INTERACTIVE)], 1
+        ):
+            self.acquire_in_thread(scheduler, order, name, priority=priority)
+            wait_for(lambda: sum(scheduler.stats()["queue_depth"].values()) == waiting)
+        self.assertEqual(scheduler.stats()["queue_depth"], {"interactive": 1, "normal": 1, "background": 1})
+        scheduler.release()
+        wait_for(lambda: len(order) == 3)
+        self.assertEqual(order, ["click", "normal", "backfill"])
+        stats = scheduler.stats()
+        self.assertEqual(stats["max_queue_depth"], 3)
+        self.assertGreater(stats["max_wait"]["background"], stats["max_wait"]["interactive"])
+        self.assertIn('azubiheft_scheduler_queue_depth{priority="background"} 0', scheduler.to_prometheus())
+
+    def test_accounts(self):
+        scheduler = RequestScheduler(account_rate=1, account_burst=1)
+        order = []
+        with scheduler.slot("anna"):
+            pass
+        # anna has to wait about a second, ben does not wait for her
+        self.acquire_in_thread(scheduler, order, "anna", account="anna", priority=INTERACTIVE)
+        wait_for(lambda: scheduler.stats()["queue_depth"]["interactive"] == 1)
+        self.acquire_in_thread(scheduler, order, "ben", account="ben", priority=BACKGROUND)
+        wait_for(lambda: len(order) == 1)
+        self.assertEqual(order, ["ben"])
+        wait_for(lambda: len(order) == 2)
+
+    def test_priority_of(self):
+        scheduler = RequestScheduler(priorities={"getWeeks": BACKGROUND})
+        self.assertEqual(scheduler.priority_of(("getReport",)), INTERACTIVE)
+        self.assertEqual(scheduler.priority_of(("getReports", "iter_reports", "getReport")), BACKGROUND)
+        self.assertEqual(scheduler.priority_of(("getWeeks",)), BACKGROUND)
+        self.assertEqual(scheduler.priority_of(("getSubjects",)), NORMAL)
+        self.assertEqual(scheduler.priority_of(()), NORMAL)
+
+
+class TestSessionScheduling(unittest.TestCase):
+    def test_session_requests(self):
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        server = FakeAzubiheft().start()
+        self.addCleanup(server.stop)
+        scheduler = RequestScheduler(rate=1000, account_rate=1000, max_in_flight=2)
+        session = Session(base_url=server.url, limiter=scheduler)
+
+        session.login("max", "secret")
+        self.assertEqual(scheduler.stats()["admitted"]["interactive"], 2)
+        session.getReports(date(2024, 5, 6), date(2024, 5, 12), max_workers=4)
+        stats = scheduler.stats()
+        self.assertEqual(stats["admitted"]["background"], 7)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertIn("max", scheduler._account_buckets)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from azubiheftApi.azubiheftApi import Session
+from azubiheftApi.errors import NotLoggedInError
+from azubiheftApi.store import FileSessionStore, SQLiteSessionStore
+
+
+def logged_in_session(username="username"):
+    session = Session()
+    session.session = requests.Session()
+    session.session.cookies.set(
+        ".ASPXAUTH", "auth-token", domain="www.azubiheft.de", path="/",
+        expires=int(time.time()) + 3600,
+    )
+    session.session.cookies.set("ASP.NET_SessionId", "abc", domain="www.azubiheft.de", path="/")
+    session._logged_in = True
+    session.username = username
+    session.logged_in_at = 1700000000.0
+    return session
+
+
+class TestStores(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def check_store(self, store):
+        self.assertIsNone(store.load("anna"))
+        store.save("anna", {"cookies": [], "username": "anna"})
+        store.save("ben", {"cookies": [], "username": "ben"})
+        self.assertEqual(store.load("anna")["username"], "anna")
+        store.delete("anna")
+        self.assertIsNone(store.load("anna"))
+        self.assertEqual(store.load("ben")["username"], "ben")
+
+    def test_file_store(self):
+        path = os.path.join(self.tmp.name, "sessions", "store.json")
+        self.check_store(FileSessionStore(path))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_sqlite_store(self):
+        self.check_store(SQLiteSessionStore(os.path.join(self.tmp.name, "store.db")))
+
+
+class TestSessionPersistence(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "session.json")
+
+    def test_save_and_load(self):
+        logged_in_session().save(self.path)
+
+        session = Session()
+        with patch.object(requests.Session, "send") as send:
+            self.assertTrue(session.load(self.path))
+            self.assertFalse(send.called)
+        self.assertTrue(session.isLoggedIn())
+        self.assertEqual(session.username, "username")
+        self.assertEqual(session.logged_in_at, 1700000000.0)
+        self.assertEqual(session.session.cookies.get(".ASPXAUTH"), "auth-token")
+        self.assertEqual(session.session.cookies.get("ASP.NET_SessionId"), "abc")
+
+    def test_save_requires_login(self):
+        with self.assertRaises(NotLoggedInError):
+            Session().save(self.path)
+
+    def test_load_missing_or_expired(self):
+        self.assertFalse(Session().load(self.path))
+
+        session = logged_in_session()
+        session.session.cookies.clear()
+        session.session.cookies.set(
+            ".ASPXAUTH", "old", domain="www.azubiheft.de", path="/", expires=int(time.time()) - 10
+        )
+        session.save(self.path)
+        self.assertFalse(Session().load(self.path))
+
+    def test_load_from_sqlite_store(self):
+        store = SQLiteSessionStore(os.path.join(self.tmp.name, "store.db"))
+        logged_in_session("anna").save(store, key="anna")
+        session = Session()
+        self.assertTrue(session.load(store, key="anna"))
+        self.assertEqual(session.username, "anna")
+
+    @patch("requests.session")
+    def test_rejected_session_logs_in_again(self, mock_requests):
+        logged_in_session().save(self.path)
+
+        relogin = MagicMock()
+        relogin.get.return_value = MagicMock(url="https://www.azubiheft.de/Azubi/Tagesbericht.aspx", text="")
+        relogin.post.return_value.text = '<div id="Abmelden"></div>'
+        restored = MagicMock()
+        restored.get.return_value = MagicMock(url="https://www.azubiheft.de/Login.aspx", text="")
+        mock_requests.side_effect = [restored, relogin]
+
+        session = Session(auto_relogin=True)
+        self.assertTrue(session.load(self.path, password="password"))
+        self.assertEqual(session.getReport(datetime(2024, 5, 10)), [])
+        self.assertIs(session.session, relogin)
+        relogin.post.assert_called_once()
+        self.assertEqual(
+            relogin.post.call_args[1]["data"]["ctl00$ContentPlaceHolder1$txt_Benutzername"],
+            "username",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
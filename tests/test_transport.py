@@ -0,0 +1,135 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from azubiheftApi.azubiheftApi import Session
+from azubiheftApi.errors import (
+    ConnectionFailedError,
+    HTTPStatusError,
+    RequestTimeoutError,
+    ServerError,
+)
+from azubiheftApi.transport import KeepAliveAdapter, Transport
+
+
+def response(status_code=200, headers=None):
+    return MagicMock(status_code=status_code, headers=headers or {}, text="")
+
+
+def not_connected():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(MagicMock(reason=reason))
+
+
+@patch("time.sleep")
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.transport = Transport(retries=2, backoff=0.1)
+
+    def test_timeout_is_set(self, mock_sleep):
+        send = MagicMock(return_value=response())
+        self.transport.send(send, "GET", "https://example.org")
+        send.assert_called_once_with("https://example.org", timeout=(5.0, 30.0))
+
+    def test_get_retries_server_errors(self, mock_sleep):
+        send = MagicMock(side_effect=[response(503), requests.ReadTimeout(), response(200)])
+        self.assertEqual(self.transport.send(send, "GET", "url").status_code, 200)
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertTrue(all(0 <= call.args[0] <= 0.2 for call in mock_sleep.call_args_list))
+
+    def test_get_gives_up(self, mock_sleep):
+        send = MagicMock(return_value=response(502))
+        with self.assertRaises(ServerError) as context:
+            self.transport.send(send, "GET", "url")
+        self.assertEqual(context.exception.status_code, 502)
+        self.assertEqual(send.call_count, 3)
+
+        send = MagicMock(side_effect=requests.ReadTimeout())
+        with self.assertRaises(RequestTimeoutError):
+            self.transport.send(send, "GET", "url")
+
+    def test_retry_after(self, mock_sleep):
+        send = MagicMock(side_effect=[response(429, {"Retry-After": "3"}), response(200)])
+        self.transport.send(send, "GET", "url")
+        mock_sleep.assert_called_once_with(3.0)
+
+    def test_retry_after_is_not_cut_short(self, mock_sleep):
+        send = MagicMock(side_effect=[response(429, {"Retry-After": "45"}), response(200)])
+        self.transport.send(send, "GET", "url")
+        mock_sleep.assert_called_once_with(45.0)
+
+        mock_sleep.reset_mock()
+        send = MagicMock(return_value=response(429, {"Retry-After": "120"}))
+        with self.assertRaises(ServerError) as context:
+            self.transport.send(send, "GET", "url")
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(send.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_post_is_not_repeated(self, mock_sleep):
+        send = MagicMock(return_value=response(500))
+        self.assertEqual(self.transport.send(send, "POST", "url").status_code, 500)
+        self.assertEqual(send.call_count, 1)
+
+        send = MagicMock(side_effect=requests.ReadTimeout())
+        with self.assertRaises(RequestTimeoutError):
+            self.transport.send(send, "POST", "url")
+        self.assertEqual(send.call_count, 1)
+
+        send = MagicMock(side_effect=requests.ConnectionError("Connection reset"))
+        with self.assertRaises(ConnectionFailedError):
+            self.transport.send(send, "POST", "url")
+        self.assertEqual(send.call_count, 1)
+
+    def test_post_retried_when_not_sent(self, mock_sleep):
+        send = MagicMock(side_effect=[not_connected(), requests.ConnectTimeout(), response(200)])
+        self.assertEqual(self.transport.send(send, "POST", "url").status_code, 200)
+        self.assertEqual(send.call_count, 3)
+
+    def test_idempotent_post(self, mock_sleep):
+        send = MagicMock(side_effect=[response(500), response(200)])
+        self.transport.send(send, "POST", "url", idempotent=True)
+        self.assertEqual(send.call_count, 2)
+
+    def test_adapter(self, mock_sleep):
+        transport = Transport(pool_maxsize=25, pool_block=True)
+        self.assertIsInstance(transport.adapter, KeepAliveAdapter)
+        self.assertEqual(transport.adapter._pool_maxsize, 25)
+        self.assertTrue(transport.adapter._pool_block)
+        self.assertNotIsInstance(Transport(keepalive_interval=None).adapter, KeepAliveAdapter)
+
+        session = requests.Session()
+        transport.mount(session)
+        self.assertIs(session.get_adapter("https://www.azubiheft.de/"), transport.adapter)
+
+
+class TestSessionErrors(unittest.TestCase):
+    def setUp(self):
+        self.session = Session(transport=Transport(retries=0))
+        self.mock_session = MagicMock()
+        self.session.session = self.mock_session
+        self.session.isLoggedIn = MagicMock(return_value=True)
+
+    def test_failed_page_raises(self):
+        self.mock_session.get.return_value = MagicMock(ok=False, status_code=404, text="")
+        with self.assertRaises(HTTPStatusError) as context:
+            self.session.getSubjects()
+        self.assertEqual(context.exception.status_code, 404)
+
+    def test_failed_subject_change_raises(self):
+        self.mock_session.get.return_value.text = (
+            '<div id="divSchulfach"><input data-default="8" value="Mathematik" /></div>'
+        )
+        self.mock_session.post.return_value.status_code = 500
+        self.mock_session.post.return_value.text = ""
+        with self.assertRaises(HTTPStatusError):
+            self.session.add_subject("Physik")
+        with self.assertRaises(HTTPStatusError):
+            self.session.delete_subject("8")
+
+
+if __name__ == "__main__":
+    unittest.main()